@@ -1,13 +1,41 @@
 import hashlib
 import secrets
 
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router
 from rest_framework import authentication, exceptions
 
+from core import ratelimit
 from core.models import UserProfile
+from core.utils import get_client_ip
+
+API_KEY_CACHE_TIMEOUT = 60
+FAILED_AUTH_LIMIT = 20
+FAILED_AUTH_WINDOW = 300
+
+
+def api_key_cache_key(key_hash):
+    return f'apikey:{key_hash}'
+
+
+def invalidate_api_key(*key_hashes):
+    """Drop cached lookups for the given key hashes."""
+    keys = [api_key_cache_key(key_hash) for key_hash in key_hashes if key_hash]
+    if keys:
+        cache.delete_many(keys)
 
 
 class APIKeyAuthentication(authentication.BaseAuthentication):
-    """Bearer token authentication using API keys."""
+    """
+    Bearer token authentication using API keys.
+
+    Lookups are cached by key hash for ``API_KEY_CACHE_TIMEOUT`` seconds as
+    ``(user_id, is_active)``; the user's other fields load on first access.
+    ``api.signals`` invalidates entries when a key is rotated or its user is
+    changed. A client with ``FAILED_AUTH_LIMIT`` unknown keys in
+    ``FAILED_AUTH_WINDOW`` seconds is throttled before the database lookup.
+    """
 
     def authenticate(self, request):
         auth_header = request.META.get('HTTP_AUTHORIZATION', '')
@@ -19,11 +47,32 @@ class APIKeyAuthentication(authentication.BaseAuthentication):
             return None
 
         key_hash = hashlib.sha256(api_key.encode('utf-8')).hexdigest()
-        try:
-            profile = UserProfile.objects.select_related('user').get(api_key_hash=key_hash)
-            return (profile.user, None)
-        except UserProfile.DoesNotExist:
-            raise exceptions.AuthenticationFailed('Invalid API key.')
+        cache_key = api_key_cache_key(key_hash)
+        cached = cache.get(cache_key)
+        if cached is None:
+            client = f'ip:{get_client_ip(request)}'
+            throttle = ratelimit.peek('apikey-failed', client, FAILED_AUTH_LIMIT, FAILED_AUTH_WINDOW)
+            if not throttle.allowed:
+                raise exceptions.Throttled(wait=throttle.retry_after)
+            cached = (
+                UserProfile.objects.filter(api_key_hash=key_hash)
+                .values_list('user_id', 'user__is_active').first()
+            )
+            if cached is None:
+                ratelimit.hit('apikey-failed', client, FAILED_AUTH_LIMIT, FAILED_AUTH_WINDOW)
+                raise exceptions.AuthenticationFailed('Invalid API key.')
+            cache.set(cache_key, cached, API_KEY_CACHE_TIMEOUT)
+
+        user_id, is_active = cached
+        if not is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        return (self.get_user(user_id, is_active), None)
+
+    @staticmethod
+    def get_user(user_id, is_active):
+        """The user, with every field but ``id`` and ``is_active`` deferred."""
+        User = get_user_model()
+        return User.from_db(router.db_for_read(User), ['id', 'is_active'], [user_id, is_active])
 
     @staticmethod
     def generate_api_key():
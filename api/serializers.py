@@ -1,4 +1,7 @@
+from django.utils import timezone
 from rest_framework import serializers
+from core import qr
+from core.dimensions import decode_rows, query_fields
 from core.models import Link, Click
 
 
@@ -7,9 +10,12 @@ class LinkSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Link
+        # click_sample_rate (0 = automatic, N = store one raw click in N) is
+        # public on purpose: owners read it here and set it through
+        # LinkUpdateSerializer.
         fields = [
             'id', 'short_code', 'custom_slug', 'original_url', 'title',
-            'is_active', 'click_count', 'short_url', 'created_at', 'updated_at',
+            'is_active', 'click_count', 'click_sample_rate', 'short_url', 'created_at', 'updated_at',
         ]
         read_only_fields = ['id', 'short_code', 'click_count', 'short_url', 'created_at', 'updated_at']
 
@@ -28,14 +34,23 @@ class LinkUpdateSerializer(serializers.Serializer):
     title = serializers.CharField(max_length=255, required=False, allow_blank=True)
     is_active = serializers.BooleanField(required=False)
     custom_slug = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    click_sample_rate = serializers.IntegerField(min_value=0, max_value=10000, required=False)
 
 
 class ClickSerializer(serializers.ModelSerializer):
+    # Click stores these as Dimension ids; serialize the strings as before.
+    referrer = serializers.CharField(source='referrer.value', default='')
+    country = serializers.CharField(source='country.value', default='')
+    city = serializers.CharField(source='city.value', default='')
+    device_type = serializers.CharField(source='device_type.value', default='')
+    browser = serializers.CharField(source='browser.value', default='')
+    os = serializers.CharField(source='os.value', default='')
+
     class Meta:
         model = Click
         fields = [
             'id', 'clicked_at', 'referrer', 'country', 'city',
-            'device_type', 'browser', 'os',
+            'device_type', 'browser', 'os', 'weight',
         ]
 
 
@@ -47,3 +62,78 @@ class BulkCreateItemSerializer(serializers.Serializer):
 
 class BulkCreateSerializer(serializers.Serializer):
     links = BulkCreateItemSerializer(many=True, max_length=100)
+
+
+class QRBatchSerializer(serializers.Serializer):
+    links = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    urls = serializers.ListField(child=serializers.URLField(max_length=2048), required=False, default=list)
+    fg = serializers.CharField(required=False, allow_blank=True, default=qr.DEFAULT_FG)
+    bg = serializers.CharField(required=False, allow_blank=True, default=qr.DEFAULT_BG)
+    format = serializers.ChoiceField(choices=list(qr.QR_CONTENT_TYPES), required=False, default='png')
+    box_size = serializers.IntegerField(required=False, default=qr.DEFAULT_BOX_SIZE)
+
+    def validate(self, attrs):
+        total = len(attrs['links']) + len(attrs['urls'])
+        if not total:
+            raise serializers.ValidationError('Provide at least one link id or URL.')
+        if total > qr.QR_BATCH_MAX:
+            raise serializers.ValidationError(
+                f'At most {qr.QR_BATCH_MAX} QR codes per batch; use `manage.py generate_qr_batch` for more.'
+            )
+        return attrs
+
+
+# Fast path for the list/detail endpoints: plain dicts built from values()
+# rows, equal field for field to LinkSerializer/ClickSerializer output
+# (`manage.py bench_serializers` checks this and times both).
+
+LINK_VALUES = [
+    'id', 'short_code', 'custom_slug', 'original_url', 'title',
+    'is_active', 'click_count', 'click_sample_rate', 'created_at', 'updated_at',
+]
+CLICK_FIELDS = ClickSerializer.Meta.fields
+CLICK_VALUES = query_fields(CLICK_FIELDS)
+
+
+def _datetime(value, tz):
+    # DRF's ISO 8601 DateTimeField representation.
+    if not value:
+        return None
+    value = value.astimezone(tz).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def link_values(link):
+    """A ``values(*LINK_VALUES)`` row for a Link instance."""
+    return {name: getattr(link, name) for name in LINK_VALUES}
+
+
+def link_rows(rows, base_url):
+    """LinkSerializer data for ``values(*LINK_VALUES)`` rows; ``base_url`` as from get_site_base_url()."""
+    tz = timezone.get_current_timezone()
+    prefix = base_url.rstrip('/')
+    return [
+        {
+            'id': row['id'],
+            'short_code': row['short_code'],
+            'custom_slug': row['custom_slug'],
+            'original_url': row['original_url'],
+            'title': row['title'],
+            'is_active': row['is_active'],
+            'click_count': row['click_count'],
+            'click_sample_rate': row['click_sample_rate'],
+            'short_url': f"{prefix}/{row['custom_slug'] or row['short_code']}",
+            'created_at': _datetime(row['created_at'], tz),
+            'updated_at': _datetime(row['updated_at'], tz),
+        }
+        for row in rows
+    ]
+
+
+def click_rows(db, rows):
+    """ClickSerializer data for ``values(*CLICK_VALUES)`` rows read from ``db``."""
+    tz = timezone.get_current_timezone()
+    data = decode_rows(db, rows, CLICK_FIELDS)
+    for row in data:
+        row['clicked_at'] = _datetime(row['clicked_at'], tz)
+    return data
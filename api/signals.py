@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.models import UserProfile
+
+from .authentication import invalidate_api_key
+
+
+@receiver(pre_save, sender=UserProfile)
+def invalidate_rotated_api_key(sender, instance, **kwargs):
+    old_hash = ''
+    if instance.pk:
+        old_hash = (
+            UserProfile.objects.filter(pk=instance.pk)
+            .values_list('api_key_hash', flat=True)
+            .first()
+        ) or ''
+    if old_hash != instance.api_key_hash:
+        invalidate_api_key(old_hash)
+
+
+@receiver(post_delete, sender=UserProfile)
+def invalidate_deleted_api_key(sender, instance, **kwargs):
+    invalidate_api_key(instance.api_key_hash)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_api_key(sender, instance, created, update_fields=None, **kwargs):
+    # Logins save only last_login; anything else may change the cached is_active.
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    invalidate_api_key(*UserProfile.objects.filter(user=instance).values_list('api_key_hash', flat=True))
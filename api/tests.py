@@ -1,3 +1,82 @@
-from django.test import TestCase
+import hashlib
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+
+from core import dimensions
+from core.dimensions import encode_click
+from core.models import Click, Link, UserProfile, get_site_base_url
+
+from .authentication import FAILED_AUTH_LIMIT, APIKeyAuthentication, api_key_cache_key
+from .serializers import CLICK_VALUES, LINK_VALUES, ClickSerializer, LinkSerializer, click_rows, link_rows
+
+
+class APIKeyAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('owner', 'owner@example.com', 'pw-12345-x')
+        self.api_key, self.key_hash, prefix = APIKeyAuthentication.generate_api_key()
+        UserProfile.objects.create(user=self.user, api_key_hash=self.key_hash, api_key_prefix=prefix[:8])
+
+    def get(self, api_key, **extra):
+        return self.client.get('/api/v1/links', HTTP_AUTHORIZATION=f'Bearer {api_key}', **extra)
+
+    def test_caches_only_user_id_and_active_flag(self):
+        self.assertEqual(self.get(self.api_key).status_code, 200)
+        self.assertEqual(cache.get(api_key_cache_key(self.key_hash)), (self.user.pk, True))
+        with self.assertNumQueries(0):
+            user = APIKeyAuthentication.get_user(self.user.pk, True)
+        self.assertEqual(user.email, 'owner@example.com')
+
+    def test_deactivated_user_is_rejected(self):
+        self.get(self.api_key)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get(self.api_key).status_code, 403)
+
+    def test_failed_keys_are_throttled_per_client(self):
+        for _ in range(FAILED_AUTH_LIMIT):
+            self.assertEqual(self.get('fatty_wrong', REMOTE_ADDR='203.0.113.5').status_code, 403)
+        self.assertEqual(self.get('fatty_wrong', REMOTE_ADDR='203.0.113.5').status_code, 429)
+        self.assertEqual(self.get(self.api_key, REMOTE_ADDR='203.0.113.9').status_code, 200)
+
+    def test_unknown_keys_are_not_cached(self):
+        self.get('fatty_wrong')
+        self.assertIsNone(cache.get(api_key_cache_key(hashlib.sha256(b'fatty_wrong').hexdigest())))
+
+
+class FastSerializerTests(TestCase):
+    """The values()-based rows must match the DRF serializers field for field, in order."""
+
+    def setUp(self):
+        self.addCleanup(dimensions._values.clear)
+        self.addCleanup(dimensions._ids.clear)
+        self.link = Link.objects.create(original_url='https://example.com/a', title='A', click_sample_rate=5)
+        Link.objects.create(original_url='https://example.com/b', custom_slug='my-slug', is_active=False)
+
+    def assertSameData(self, drf, fast):
+        self.assertEqual([list(row.items()) for row in drf], [list(row.items()) for row in fast])
+
+    def test_link_rows(self):
+        links = Link.objects.order_by('id')
+        for request in (RequestFactory().get('/api/v1/links'), None):
+            with self.subTest(request=request):
+                self.assertSameData(
+                    LinkSerializer(links, many=True, context={'request': request}).data,
+                    link_rows(links.values(*LINK_VALUES), get_site_base_url(request)),
+                )
+
+    def test_click_rows(self):
+        fields = {
+            'referrer': 'https://ref.example/', 'country': 'US', 'city': 'Boston',
+            'device_type': 'desktop', 'browser': 'Firefox', 'os': 'Linux', 'ip_hash': 'a' * 64,
+        }
+        Click.objects.create(link=self.link, weight=3, **encode_click('default', fields))
+        Click.objects.create(link=self.link, **encode_click('default', {'browser': 'Safari'}))
+        clicks = Click.objects.filter(link=self.link).order_by('id')
+        related = clicks.select_related('referrer', 'country', 'city', 'device_type', 'browser', 'os')
+        self.assertSameData(
+            ClickSerializer(related, many=True).data,
+            click_rows('default', list(clicks.values(*CLICK_VALUES))),
+        )
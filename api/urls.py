@@ -6,6 +6,8 @@ urlpatterns = [
     path('links', views.list_links, name='api_list_links'),
     path('links/<int:pk>', views.link_detail, name='api_link_detail'),
     path('links/<int:pk>/clicks', views.link_clicks, name='api_link_clicks'),
+    path('clicks/export', views.export_clicks, name='api_export_clicks'),
     path('bulk', views.bulk_create, name='api_bulk_create'),
+    path('qr/batch', views.qr_batch, name='api_qr_batch'),
     path('export', views.export_csv, name='api_export_csv'),
 ]
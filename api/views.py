@@ -1,18 +1,26 @@
 import csv
 
-from django.db.models import Q
-from django.http import HttpResponse
+from django.db.models import OuterRef, Q
+from django.http import HttpResponse, StreamingHttpResponse
 
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from core.models import Link, Click
+from core import qr, sharding
+from core.conditional import (
+    clicks_version, link_version, make_etag, query_key, revalidated, user_links_version,
+)
+from core.exports import (
+    EXPORT_FORMATS, click_export_querysets, parse_export_bound, stream_click_export,
+)
+from core.models import Link, Click, get_site_base_url
+from core.routers import replica_reads
 from core.utils import validate_url, validate_slug
 from .serializers import (
-    LinkSerializer, LinkCreateSerializer, LinkUpdateSerializer,
-    ClickSerializer, BulkCreateSerializer,
+    CLICK_VALUES, LINK_VALUES, LinkSerializer, LinkCreateSerializer, LinkUpdateSerializer,
+    BulkCreateSerializer, QRBatchSerializer, click_rows, link_rows, link_values,
 )
 
 
@@ -32,7 +40,7 @@ def shorten(request):
         valid, error = validate_slug(custom_slug)
         if not valid:
             return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
-        if Link.objects.filter(Q(short_code=custom_slug) | Q(custom_slug=custom_slug)).exists():
+        if Link.objects.for_code(custom_slug).filter(Q(short_code=custom_slug) | Q(custom_slug=custom_slug)).exists():
             return Response({'error': 'This slug is already taken.'}, status=status.HTTP_409_CONFLICT)
 
     link = Link(
@@ -50,39 +58,53 @@ def shorten(request):
     )
 
 
+def _links_etag(request):
+    return make_etag(request.user.pk, user_links_version(request.user), query_key(request))
+
+
+def _link_etag(request, pk):
+    version = link_version(request.user, pk)
+    return version and make_etag(pk, *version)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@revalidated(etag_func=_links_etag)
 def list_links(request):
     """List user's links."""
-    links = Link.objects.filter(user=request.user)
-
     q = request.query_params.get('q', '').strip()
-    if q:
-        links = links.filter(
-            Q(original_url__icontains=q) |
-            Q(custom_slug__icontains=q) |
-            Q(title__icontains=q) |
-            Q(short_code__icontains=q)
-        )
+
+    def build(db):
+        links = Link.objects.using(db).filter(user=request.user)
+        if q:
+            links = links.filter(
+                Q(original_url__icontains=q) |
+                Q(custom_slug__icontains=q) |
+                Q(title__icontains=q) |
+                Q(short_code__icontains=q)
+            )
+        return links.values(*LINK_VALUES)
+
+    links = sharding.sharded_queryset(build, '-created_at', values=True)
 
     from rest_framework.pagination import PageNumberPagination
     paginator = PageNumberPagination()
     page = paginator.paginate_queryset(links, request)
-    serializer = LinkSerializer(page, many=True, context={'request': request})
-    return paginator.get_paginated_response(serializer.data)
+    return paginator.get_paginated_response(link_rows(page, get_site_base_url(request)))
 
 
 @api_view(['GET', 'PATCH', 'DELETE'])
 @permission_classes([IsAuthenticated])
+@revalidated(etag_func=_link_etag)
 def link_detail(request, pk):
     """Get, update, or delete a single link."""
     try:
-        link = Link.objects.get(pk=pk, user=request.user)
+        link = Link.objects.for_id(pk).get(pk=pk, user=request.user)
     except Link.DoesNotExist:
         return Response({'error': 'Link not found.'}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == 'GET':
-        return Response(LinkSerializer(link, context={'request': request}).data)
+        return Response(link_rows([link_values(link)], get_site_base_url(request))[0])
 
     elif request.method == 'PATCH':
         serializer = LinkUpdateSerializer(data=request.data)
@@ -101,51 +123,120 @@ def link_detail(request, pk):
         if 'is_active' in serializer.validated_data:
             link.is_active = serializer.validated_data['is_active']
 
+        if 'click_sample_rate' in serializer.validated_data:
+            link.click_sample_rate = serializer.validated_data['click_sample_rate']
+
         if 'custom_slug' in serializer.validated_data:
             slug = serializer.validated_data['custom_slug'].strip()
             if slug:
                 valid, error = validate_slug(slug)
                 if not valid:
                     return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
-                if Link.objects.filter(
+                if Link.objects.for_code(slug).filter(
                     Q(short_code=slug) | Q(custom_slug=slug)
                 ).exclude(pk=link.pk).exists():
                     return Response({'error': 'Slug already taken.'}, status=status.HTTP_409_CONFLICT)
+                if not sharding.code_fits_link(slug, link.pk):
+                    # Moving a link between shards would change its id and short code.
+                    return Response(
+                        {'error': 'This slug is not available for this link.'},
+                        status=status.HTTP_409_CONFLICT,
+                    )
                 link.custom_slug = slug
             else:
                 link.custom_slug = None
 
         link.save()
-        return Response(LinkSerializer(link, context={'request': request}).data)
+        return Response(link_rows([link_values(link)], get_site_base_url(request))[0])
 
     elif request.method == 'DELETE':
         link.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+def _filter_clicks(request, clicks):
+    from_date = request.query_params.get('from')
+    to_date = request.query_params.get('to')
+    if from_date:
+        clicks = clicks.filter(clicked_at__gte=from_date)
+    if to_date:
+        clicks = clicks.filter(clicked_at__lte=to_date)
+    return clicks
+
+
+def _link_clicks_version(request, pk):
+    # Shared by both validators, so it runs one query per request.
+    if not hasattr(request, '_clicks_version'):
+        clicks = _filter_clicks(request, Click.objects.filter(link=OuterRef('pk')))
+        request._clicks_version = clicks_version(request.user, pk, clicks)
+    return request._clicks_version
+
+
+def _link_clicks_etag(request, pk):
+    version = _link_clicks_version(request, pk)
+    return version and make_etag(pk, *version, query_key(request))
+
+
+def _link_clicks_last_modified(request, pk):
+    version = _link_clicks_version(request, pk)
+    return version and version[2]
+
+
+@replica_reads
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@revalidated(etag_func=_link_clicks_etag, last_modified_func=_link_clicks_last_modified)
 def link_clicks(request, pk):
     """Paginated click log for a link."""
     try:
-        link = Link.objects.get(pk=pk, user=request.user)
+        link = Link.objects.for_id(pk).get(pk=pk, user=request.user)
     except Link.DoesNotExist:
         return Response({'error': 'Link not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-    clicks = Click.objects.filter(link=link)
-
-    from_date = request.query_params.get('from')
-    to_date = request.query_params.get('to')
-    if from_date:
-        clicks = clicks.filter(clicked_at__gte=from_date)
-    if to_date:
-        clicks = clicks.filter(clicked_at__lte=to_date)
+    clicks = _filter_clicks(request, Click.objects.for_link(link)).values(*CLICK_VALUES)
 
     from rest_framework.pagination import PageNumberPagination
     paginator = PageNumberPagination()
     page = paginator.paginate_queryset(clicks, request)
-    serializer = ClickSerializer(page, many=True)
-    return paginator.get_paginated_response(serializer.data)
+    return paginator.get_paginated_response(click_rows(clicks.db, page))
+
+
+@replica_reads
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_clicks(request):
+    """Stream the user's click log (optionally one link) as gzip NDJSON or columnar chunks."""
+    link = None
+    link_id = request.query_params.get('link')
+    if link_id:
+        try:
+            link = Link.objects.for_id(int(link_id)).get(pk=int(link_id), user=request.user)
+        except (ValueError, Link.DoesNotExist):
+            return Response({'error': 'Link not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+    # ``format`` is reserved by DRF for renderer negotiation.
+    fmt = request.query_params.get('output', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return Response(
+            {'error': f"output must be one of: {', '.join(EXPORT_FORMATS)}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        since = parse_export_bound(request.query_params.get('from'))
+        until = parse_export_bound(request.query_params.get('to'), end=True)
+        cursor = int(request.query_params.get('cursor') or 0)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    clicks = click_export_querysets(user=request.user, link=link, since=since, until=until)
+    response = StreamingHttpResponse(
+        stream_click_export(clicks, fmt=fmt, cursor=cursor),
+        content_type='application/gzip',
+    )
+    extension = 'ndjson' if fmt == 'ndjson' else 'columnar.ndjson'
+    response['Content-Disposition'] = f'attachment; filename="fattyurl-clicks.{extension}.gz"'
+    return response
 
 
 @api_view(['POST'])
@@ -175,7 +266,9 @@ def bulk_create(request):
             if not slug_valid:
                 results.append({'url': url, 'error': slug_error})
                 continue
-            if Link.objects.filter(Q(short_code=custom_slug) | Q(custom_slug=custom_slug)).exists():
+            if Link.objects.for_code(custom_slug).filter(
+                Q(short_code=custom_slug) | Q(custom_slug=custom_slug)
+            ).exists():
                 results.append({'url': url, 'error': 'Slug already taken.'})
                 continue
             link.custom_slug = custom_slug
@@ -186,11 +279,47 @@ def bulk_create(request):
     return Response({'results': results}, status=status.HTTP_201_CREATED)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def qr_batch(request):
+    """Render QR codes for many links/URLs off the web worker and stream them back as a ZIP."""
+    serializer = QRBatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+
+    link_ids = data['links']
+    links = sharding.links_in_bulk(link_ids, user=request.user)
+    missing = [pk for pk in link_ids if pk not in links]
+    if missing:
+        return Response(
+            {'error': f"Links not found: {', '.join(map(str, missing))}"},
+            status=status.HTTP_404_NOT_FOUND,
+        )
+
+    items = [(links[pk].get_display_code(), links[pk].get_short_url(request=request)) for pk in link_ids]
+    items += [(f'qr-{i}', url) for i, url in enumerate(data['urls'], start=1)]
+
+    fmt = data['format']
+    response = StreamingHttpResponse(
+        qr.stream_qr_zip(
+            items,
+            fg=qr.normalize_hex_color(data['fg'], qr.DEFAULT_FG),
+            bg=qr.normalize_hex_color(data['bg'], qr.DEFAULT_BG),
+            fmt=fmt,
+            box_size=qr.normalize_box_size(data['box_size']),
+            pool=qr.web_render_pool(),
+        ),
+        content_type='application/zip',
+    )
+    response['Content-Disposition'] = f'attachment; filename="fattyurl-qr-{fmt}.zip"'
+    return response
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def export_csv(request):
     """Export user's links as CSV."""
-    links = Link.objects.filter(user=request.user)
+    links = sharding.sharded_queryset(lambda db: Link.objects.using(db).filter(user=request.user), '-created_at')
 
     response = HttpResponse(content_type='text/csv')
     response['Content-Disposition'] = 'attachment; filename="fattyurl-links.csv"'
@@ -1,10 +1,10 @@
 from django.contrib import admin
-from .models import Link, Click, UserProfile
+from .models import Link, Click, UserProfile, SiteCounter
 
 
 @admin.register(Link)
 class LinkAdmin(admin.ModelAdmin):
-    list_display = ['short_code', 'custom_slug', 'original_url_truncated', 'user', 'click_count', 'is_active', 'created_at']
+    list_display = ['short_code', 'custom_slug', 'original_url_truncated', 'user', 'click_count', 'click_sample_rate', 'is_active', 'created_at']
     list_filter = ['is_active', 'created_at']
     search_fields = ['short_code', 'custom_slug', 'original_url', 'title']
     date_hierarchy = 'created_at'
@@ -18,11 +18,19 @@ class LinkAdmin(admin.ModelAdmin):
 
 @admin.register(Click)
 class ClickAdmin(admin.ModelAdmin):
-    list_display = ['link', 'clicked_at', 'country', 'city', 'device_type', 'browser', 'os']
-    list_filter = ['device_type', 'browser', 'os', 'country']
-    search_fields = ['link__short_code', 'link__custom_slug', 'country', 'city']
+    list_display = ['link', 'clicked_at', 'country', 'city', 'device_type', 'browser', 'os', 'weight']
+    list_select_related = ['link', 'country', 'city', 'device_type', 'browser', 'os']
+    search_fields = ['link__short_code', 'link__custom_slug', 'country__value', 'city__value']
     date_hierarchy = 'clicked_at'
-    readonly_fields = ['link', 'clicked_at', 'referrer', 'user_agent', 'country', 'city', 'device_type', 'browser', 'os', 'ip_hash']
+    readonly_fields = [
+        'link', 'clicked_at', 'referrer', 'user_agent', 'country', 'city', 'device_type', 'browser', 'os',
+        'ip_hash_hex', 'weight',
+    ]
+    exclude = ['ip_hash']
+
+    def ip_hash_hex(self, obj):
+        return bytes(obj.ip_hash).hex() if obj.ip_hash else ''
+    ip_hash_hex.short_description = 'IP hash'
 
 
 @admin.register(UserProfile)
@@ -30,3 +38,10 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['user', 'api_key_prefix', 'created_at']
     search_fields = ['user__email']
     readonly_fields = ['api_key_hash', 'created_at']
+
+
+@admin.register(SiteCounter)
+class SiteCounterAdmin(admin.ModelAdmin):
+    list_display = ['name', 'value', 'updated_at']
+    search_fields = ['name']
+    readonly_fields = ['updated_at']
@@ -0,0 +1,150 @@
+import hashlib
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import F
+
+from .dimensions import aencode_click, click_db, encode_click
+from .models import Click, Link
+from .ratelimit import aincr_counter, incr_counter
+
+logger = logging.getLogger(__name__)
+
+_click_executor = None
+_click_slots = None
+_click_stats = {'queued': 0, 'inline': 0, 'failed': 0}
+
+
+def _get_click_executor():
+    global _click_executor, _click_slots
+    if _click_executor is None:
+        _click_slots = threading.BoundedSemaphore(settings.CLICK_LOG_WORKERS + settings.CLICK_LOG_QUEUE_SIZE)
+        _click_executor = ThreadPoolExecutor(
+            max_workers=settings.CLICK_LOG_WORKERS, thread_name_prefix='click-log',
+        )
+    return _click_executor
+
+
+def click_log_metrics():
+    """This process's background click writes: queued, written inline because the queue was full, failed."""
+    return dict(_click_stats)
+
+
+DEDUP_SUPPRESSED_KEY = 'clickdedup:suppressed'
+
+
+def _dedup_key(link_id, fields):
+    ip_hash = fields.get('ip_hash')
+    if not settings.CLICK_DEDUP_WINDOW or not ip_hash:
+        return None
+    ua = hashlib.blake2b(fields.get('user_agent', '').encode('utf-8'), digest_size=8).hexdigest()
+    return f'clickdedup:{link_id}:{ip_hash}:{ua}'
+
+
+def is_duplicate_click(link_id, fields):
+    """
+    True if the same visitor (ip_hash and user agent) already clicked
+    ``link_id`` within CLICK_DEDUP_WINDOW seconds; such clicks are not recorded.
+    """
+    key = _dedup_key(link_id, fields)
+    if key is None or cache.add(key, 1, settings.CLICK_DEDUP_WINDOW):
+        return False
+    incr_counter(DEDUP_SUPPRESSED_KEY, None)
+    return True
+
+
+async def ais_duplicate_click(link_id, fields):
+    key = _dedup_key(link_id, fields)
+    if key is None or await cache.aadd(key, 1, settings.CLICK_DEDUP_WINDOW):
+        return False
+    await aincr_counter(DEDUP_SUPPRESSED_KEY, None)
+    return True
+
+
+def dedup_metrics():
+    """Duplicate clicks suppressed so far (shared across workers with a shared cache)."""
+    return {
+        'window': settings.CLICK_DEDUP_WINDOW,
+        'suppressed': cache.get(DEDUP_SUPPRESSED_KEY, 0),
+    }
+
+
+def _rate_key(link_id):
+    return f'clickrate:{link_id}:{int(time.time())}'
+
+
+def _weight(sample_rate, seen=None):
+    """
+    Weight to store a click with, or 0 to count it without a raw row.
+
+    A fixed ``sample_rate`` keeps a random one click in N. In automatic mode
+    ``seen`` is the link's clicks so far this second: the first
+    CLICK_SAMPLING_THRESHOLD are stored as-is, and after that a random one
+    in CLICK_SAMPLE_RATE is stored, weighted to stand for the others.
+    """
+    if seen is not None and seen > settings.CLICK_SAMPLING_THRESHOLD:
+        sample_rate = settings.CLICK_SAMPLE_RATE
+    if sample_rate > 1:
+        return sample_rate if random.randrange(sample_rate) == 0 else 0
+    return 1
+
+
+def _auto_sampling(sample_rate):
+    return sample_rate == 0 and settings.CLICK_SAMPLING_THRESHOLD > 0
+
+
+def record_click(link_id, sample_rate=0, **fields):
+    """
+    Count one click and store it (string fields, see core.dimensions) unless
+    it is sampled out. ``click_count`` is exact either way.
+    """
+    seen = incr_counter(_rate_key(link_id), 2) if _auto_sampling(sample_rate) else None
+    weight = _weight(sample_rate, seen)
+    if weight:
+        db = click_db(link_id)
+        Click.objects.using(db).create(link_id=link_id, weight=weight, **encode_click(db, fields))
+    Link.objects.for_id(link_id).filter(pk=link_id).update(click_count=F('click_count') + 1)
+
+
+async def arecord_click(link_id, sample_rate=0, **fields):
+    seen = await aincr_counter(_rate_key(link_id), 2) if _auto_sampling(sample_rate) else None
+    weight = _weight(sample_rate, seen)
+    if weight:
+        db = click_db(link_id)
+        await Click.objects.using(db).acreate(link_id=link_id, weight=weight, **await aencode_click(db, fields))
+    await Link.objects.for_id(link_id).filter(pk=link_id).aupdate(click_count=F('click_count') + 1)
+
+
+def _record_click_job(link_id, sample_rate, fields):
+    # Worker threads outlive requests, so apply CONN_MAX_AGE/health checks
+    # (or return pooled connections) the way request_finished would.
+    close_old_connections()
+    try:
+        record_click(link_id, sample_rate, **fields)
+    except Exception:
+        _click_stats['failed'] += 1
+        logger.exception('Recording a click on link %s failed', link_id)
+    finally:
+        close_old_connections()
+        _click_slots.release()
+
+
+def enqueue_click(link_id, sample_rate=0, **fields):
+    """
+    Record a click on the background writer pool. With CLICK_LOG_QUEUE_SIZE
+    clicks already waiting, it is written inline instead, so a slow database
+    slows redirects down rather than growing the queue without bound.
+    """
+    executor = _get_click_executor()
+    if _click_slots.acquire(blocking=False):
+        _click_stats['queued'] += 1
+        executor.submit(_record_click_job, link_id, sample_rate, fields)
+    else:
+        _click_stats['inline'] += 1
+        record_click(link_id, sample_rate, **fields)
@@ -5,4 +5,12 @@ class CoreConfig(AppConfig):
     name = 'core'
 
     def ready(self):
-        from . import signals  # noqa: F401
+        from django.db.backends.signals import connection_created
+
+        from . import checks, signals  # noqa: F401
+        from . import qr
+        from .db import count_connection
+
+        connection_created.connect(count_connection, dispatch_uid='core.db.count_connection')
+
+        qr.warm_up()
@@ -0,0 +1,162 @@
+"""
+Click retention: whole months of raw clicks older than CLICK_RETENTION_DAYS
+are written to gzip NDJSON files (the core.exports format) and replaced by
+daily ClickRollup rows, so link analytics still cover archived periods.
+"""
+import os
+from collections import Counter
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import partitions, sharding
+from .dimensions import dimension_values
+from .exports import stream_click_export
+from .models import Click, ClickRollup
+
+
+def click_databases():
+    return sharding.shard_aliases() or ['default']
+
+
+def retention_cutoff(retention_days=None, now=None):
+    """
+    First month that stays in the hot table, or None when retention is off.
+
+    Retention is rounded up to whole months: a month is archived only once
+    all of it is older than the retention window.
+    """
+    days = settings.CLICK_RETENTION_DAYS if retention_days is None else retention_days
+    if not days:
+        return None
+    now = now or timezone.now()
+    return partitions.month_start(timezone.localdate(now - timedelta(days=days)))
+
+
+def expired_months(db, cutoff):
+    oldest = Click.objects.using(db).aggregate(oldest=Min('clicked_at'))['oldest']
+    months = []
+    if oldest is None or cutoff is None:
+        return months
+    month = partitions.month_start(timezone.localdate(oldest))
+    while month < cutoff:
+        months.append(month)
+        month = partitions.next_month(month)
+    return months
+
+
+def build_rollups(clicks):
+    day = TruncDate('clicked_at')
+    rollups = [
+        ClickRollup(link_id=row['link_id'], day=row['day'], clicks=row['clicks'], visitors=row['visitors'])
+        for row in clicks.annotate(day=day).values('link_id', 'day').annotate(
+            clicks=Sum('weight'), visitors=Count('ip_hash', distinct=True),
+        ).order_by()
+    ]
+    for dimension in ClickRollup.DIMENSIONS:
+        column = f'{dimension}_id'
+        rows = list(
+            clicks.exclude(**{column: None})
+            .annotate(day=day)
+            .values('link_id', 'day', column)
+            .annotate(clicks=Sum('weight'))
+            .order_by()
+        )
+        values = dimension_values(clicks.db, {row[column] for row in rows})
+        rollups += [
+            ClickRollup(
+                link_id=row['link_id'], day=row['day'], dimension=dimension,
+                value=values[row[column]], clicks=row['clicks'],
+            )
+            for row in rows
+        ]
+    return rollups
+
+
+def archive_path(directory, db, month):
+    return Path(directory) / f'clicks-{db}-{month:%Y-%m}.ndjson.gz'
+
+
+def archive_month(db, month, directory):
+    """
+    Move one month of clicks on ``db`` to an archive file and rollups.
+
+    The file is written (and fsynced) before anything is deleted, and the
+    rollups replace the raw rows in one transaction, so a failed run can
+    simply be repeated. Returns the number of clicks archived.
+    """
+    start, end = partitions.month_bounds(month)
+    clicks = Click.objects.using(db).filter(clicked_at__gte=start, clicked_at__lt=end)
+    connection = connections[db]
+    count = clicks.count()
+    if not count:
+        if partitions.is_partitioned(connection):
+            partitions.drop_month_partition(connection, month)
+        return 0
+
+    path = archive_path(directory, db, month)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as out:
+        for data in stream_click_export([clicks]):
+            out.write(data)
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, path)
+
+    with transaction.atomic(using=db):
+        rollups = ClickRollup.objects.using(db)
+        rollups.filter(day__gte=month, day__lt=partitions.next_month(month)).delete()
+        rollups.bulk_create(build_rollups(clicks), batch_size=1000)
+        if partitions.is_partitioned(connection):
+            partitions.drop_month_partition(connection, month)
+        # Whatever is left (no partition, or rows in the default partition).
+        clicks.delete()
+    return count
+
+
+# -- analytics over hot clicks plus rollups --
+# Raw clicks are counted by weight so sampled links scale back up.
+
+def daily_counts(clicks, rollups):
+    """``{date: clicks}`` from raw clicks and archived daily totals."""
+    counts = Counter({
+        row['date']: row['count']
+        for row in clicks.annotate(date=TruncDate('clicked_at')).values('date').annotate(count=Sum('weight')).order_by()
+    })
+    for row in rollups.filter(dimension='').values('day', 'clicks'):
+        counts[row['day']] += row['clicks']
+    return dict(sorted(counts.items()))
+
+
+def breakdown(clicks, rollups, field, limit=None, archived=True):
+    """Top ``field`` values as ``[{field: value, 'count': n}]``, most clicked first."""
+    column = f'{field}_id'
+    hot = clicks.exclude(**{column: None}).values(column).annotate(count=Sum('weight')).order_by('-count')
+    hot = list(hot[:limit] if limit and not archived else hot)
+    values = dimension_values(clicks.db, {row[column] for row in hot})
+    if not archived:
+        return [{field: values[row[column]], 'count': row['count']} for row in hot]
+    counts = Counter({values[row[column]]: row['count'] for row in hot})
+    for row in rollups.filter(dimension=field).values('value').annotate(count=Sum('clicks')).order_by():
+        counts[row['value']] += row['count']
+    return [{field: value, 'count': count} for value, count in counts.most_common(limit)]
+
+
+def totals(clicks, rollups):
+    """
+    ``(clicks, unique_visitors)``. Archived visitors are the sum of daily
+    distinct counts, so a visitor who came back on another day (archived or
+    not) counts once per day: with rollups, visitors are an upper bound. They
+    only count stored clicks, so they are also too low for sampled links.
+    """
+    archived = rollups.filter(dimension='').aggregate(clicks=Sum('clicks'), visitors=Sum('visitors'))
+    return (
+        (clicks.aggregate(n=Sum('weight'))['n'] or 0) + (archived['clicks'] or 0),
+        clicks.values('ip_hash').distinct().count() + (archived['visitors'] or 0),
+    )
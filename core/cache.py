@@ -0,0 +1,285 @@
+import math
+import random
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+_MISSING = object()
+
+# Django builds one cache instance per thread, but the L1 LocMemCache storage
+# is per process, so the invalidation-log position must be too.
+_sync_state = {}
+_sync_lock = threading.Lock()
+
+
+class TieredCache(BaseCache):
+    """
+    A small per-process LocMemCache (L1) in front of a shared cache alias (L2).
+
+    Reads are served from L1 when possible and filled from L2 with a short
+    L1 timeout. Writes and ``touch`` go to L2 first, then drop the key from
+    this process's L1 and append it to an invalidation log kept in L2 (a sequence counter
+    plus one entry per message). Every process replays new log entries at
+    most once per ``POLL_INTERVAL`` seconds, so peers stop serving a stale
+    L1 entry within that interval rather than only after the L1 timeout.
+
+    ``add``/``incr``/``decr`` go to L2 and only drop the local L1 entry
+    without logging: ``add`` only succeeds when L2 has no value, and counters
+    are written far more often than they are read through ``get``. Peers
+    may see those keys stale for at most ``L1_TIMEOUT`` seconds.
+
+    Configure with ``OPTIONS = {'L2': '<alias>', 'L1_TIMEOUT': 5,
+    'L1_MAX_ENTRIES': 1000, 'POLL_INTERVAL': 1}``.
+    """
+
+    SEQ_KEY = 'tiered:seq'
+    LOG_KEY = 'tiered:inval:%d'
+    LOG_TIMEOUT = 300
+    MAX_REPLAY = 500
+
+    def __init__(self, location, params):
+        options = params.get('OPTIONS', {})
+        super().__init__(params)
+        self._l2_alias = options['L2']
+        self._l1_timeout = options.get('L1_TIMEOUT', 5)
+        self._poll_interval = options.get('POLL_INTERVAL', 1)
+        l1_name = f'tiered-l1:{location or self._l2_alias}'
+        self._l1 = LocMemCache(l1_name, {
+            'TIMEOUT': self._l1_timeout,
+            'OPTIONS': {'MAX_ENTRIES': options.get('L1_MAX_ENTRIES', 1000)},
+        })
+        self._state = _sync_state.setdefault(l1_name, {'seq': None, 'last_sync': 0.0})
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    # -- invalidation log --
+
+    def _l1_timeout_for(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return self._l1_timeout
+        return max(0, min(timeout - time.time(), self._l1_timeout))
+
+    def _publish(self, keys):
+        try:
+            seq = self.l2.incr(self.SEQ_KEY)
+        except ValueError:
+            if self.l2.add(self.SEQ_KEY, 1, None):
+                seq = 1
+            else:
+                seq = self.l2.incr(self.SEQ_KEY)
+        self.l2.set(self.LOG_KEY % seq, list(keys), self.LOG_TIMEOUT)
+
+    def _sync(self):
+        state = self._state
+        now = time.monotonic()
+        if now - state['last_sync'] < self._poll_interval:
+            return
+        with _sync_lock:
+            if now - state['last_sync'] < self._poll_interval:
+                return
+            state['last_sync'] = now
+            seq = self.l2.get(self.SEQ_KEY)
+            seen = state['seq']
+            if seq == seen:
+                return
+            state['seq'] = seq
+            if seen is None:
+                # First sync in this process: L1 is empty, nothing to replay.
+                return
+            if seq is None or seq < seen:
+                # L2 lost the counter (flushed or restarted): the log is gone.
+                self._l1.clear()
+                return
+            log_keys = [self.LOG_KEY % n for n in range(seen + 1, seq + 1)]
+            messages = self.l2.get_many(log_keys) if len(log_keys) <= self.MAX_REPLAY else {}
+            if len(messages) != len(log_keys):
+                # Fell too far behind: drop everything.
+                self._l1.clear()
+                return
+            for log_key in log_keys:
+                for key, version in messages[log_key]:
+                    self._l1.delete(key, version=version)
+
+    def _invalidate(self, keys, version):
+        version = self.version if version is None else version
+        pairs = [(key, version) for key in keys]
+        for key, v in pairs:
+            self._l1.delete(key, version=v)
+        self._publish(pairs)
+
+    # -- cache API --
+
+    def get(self, key, default=None, version=None):
+        self._sync()
+        value = self._l1.get(key, _MISSING, version=version)
+        if value is not _MISSING:
+            return value
+        value = self.l2.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        self._l1.set(key, value, self._l1_timeout, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found = {}
+        missing = []
+        for key in keys:
+            value = self._l1.get(key, _MISSING, version=version)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            fetched = self.l2.get_many(missing, version=version)
+            for key, value in fetched.items():
+                self._l1.set(key, value, self._l1_timeout, version=version)
+            found.update(fetched)
+        return found
+
+    def has_key(self, key, version=None):
+        self._sync()
+        return self._l1.has_key(key, version=version) or self.l2.has_key(key, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout, version=version)
+        self._invalidate([key], version)
+        self._l1.set(key, value, self._l1_timeout_for(timeout), version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.l2.add(key, value, timeout, version=version)
+        if added:
+            self._l1.delete(key, version=version)
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.l2.set_many(data, timeout, version=version)
+        self._invalidate(list(data), version)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        touched = self.l2.touch(key, timeout, version=version)
+        if touched:
+            # Peers may hold the value longer than its new expiry.
+            self._invalidate([key], version)
+        return touched
+
+    def delete(self, key, version=None):
+        deleted = self.l2.delete(key, version=version)
+        self._invalidate([key], version)
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.l2.delete_many(keys, version=version)
+        self._invalidate(keys, version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.l2.incr(key, delta, version=version)
+        self._l1.delete(key, version=version)
+        return value
+
+    def decr(self, key, delta=1, version=None):
+        value = self.l2.decr(key, delta, version=version)
+        self._l1.delete(key, version=version)
+        return value
+
+    def clear(self):
+        self.l2.clear()
+        self._l1.clear()
+        self._state['seq'] = None
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+
+def is_shared(alias='default'):
+    """Whether every worker sees the same ``alias`` cache (not per-process locmem or dummy)."""
+    backend = caches[alias]
+    if isinstance(backend, TieredCache):
+        return is_shared(backend._l2_alias)
+    return not isinstance(backend, (LocMemCache, DummyCache))
+
+
+# How long a cold miss waits for another caller's compute when there is no
+# earlier compute time to go by.
+COLD_WAIT = 1.0
+
+
+def get_or_compute(key, compute, timeout, stale_timeout=None, lock_timeout=30, beta=1.0):
+    """
+    Return the cached value for ``key``, recomputing it with ``compute()``
+    without letting concurrent callers stampede the backing store.
+
+    - Single flight: only the caller that wins ``cache.add`` on a lock key
+      recomputes; everyone else keeps serving the previous value.
+    - Probabilistic early refresh: as expiry approaches, each read has a
+      growing chance (scaled by how long ``compute`` took and ``beta``) to
+      refresh ahead of time, so popular keys rarely expire at all.
+    - Stale-while-revalidate: values stay readable for ``stale_timeout``
+      seconds after ``timeout`` (default: ``timeout`` again) while one caller
+      refreshes them.
+
+    On a cold key, callers that lose the lock wait about as long as the last
+    compute took (``COLD_WAIT`` if unknown), then return that last value or,
+    if there is none, compute it themselves.
+    """
+    if stale_timeout is None:
+        stale_timeout = timeout
+    lock_key = f'{key}:lock'
+
+    entry = cache.get(key)
+    if entry is not None:
+        now = time.time()
+        # XFetch: refresh early when now - delta * beta * ln(rand) passes expiry.
+        early = now - entry['delta'] * beta * math.log(random.random() or 1e-12)
+        if early < entry['expires'] or not cache.add(lock_key, 1, lock_timeout):
+            return entry['value']
+        return _recompute(key, lock_key, compute, timeout, stale_timeout)
+
+    last = None
+    while not cache.add(lock_key, 1, lock_timeout):
+        if last is None:
+            last = cache.get(f'{key}:last', {})
+            wait = min(2 * last['delta'] + 0.05 if last else COLD_WAIT, lock_timeout)
+            deadline = time.monotonic() + wait
+        if time.monotonic() >= deadline:
+            return last['value'] if last else compute()
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry['value']
+    return _recompute(key, lock_key, compute, timeout, stale_timeout)
+
+
+def _recompute(key, lock_key, compute, timeout, stale_timeout):
+    try:
+        start = time.time()
+        value = compute()
+        delta = time.time() - start
+        entry = {'value': value, 'expires': start + delta + timeout, 'delta': delta}
+        # The ``last`` copy outlives the entry, as a fallback for cold misses.
+        cache.set(key, entry, timeout + stale_timeout)
+        cache.set(f'{key}:last', entry, None)
+        return value
+    finally:
+        cache.delete(lock_key)
+
+
+async def aget_or_compute(key, compute, timeout, **kwargs):
+    """
+    Async ``get_or_compute``: a fresh cached value costs one awaited cache read;
+    refreshes and cold misses run the sync path in a worker thread.
+    """
+    entry = await cache.aget(key)
+    if entry is not None and time.time() < entry['expires']:
+        return entry['value']
+    return await sync_to_async(get_or_compute)(key, compute, timeout, **kwargs)
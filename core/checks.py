@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+from .cache import is_shared
+
+
+@register()
+def check_link_snapshot(app_configs, **kwargs):
+    if not settings.LINK_SNAPSHOT_PATH:
+        return []
+    errors = []
+    if not is_shared():
+        errors.append(Error(
+            'LINK_SNAPSHOT_PATH needs a cache shared by every worker.',
+            hint='Point CACHE_URL at a shared backend (redis, dbcache), or unset LINK_SNAPSHOT_PATH.',
+            id='core.E001',
+        ))
+    if settings.LINK_SNAPSHOT_MAX_AGE >= settings.LINK_SNAPSHOT_DELTA_TIMEOUT:
+        errors.append(Error(
+            'LINK_SNAPSHOT_MAX_AGE must be shorter than LINK_SNAPSHOT_DELTA_TIMEOUT.',
+            hint='Snapshots older than LINK_SNAPSHOT_DELTA_TIMEOUT are ignored.',
+            id='core.E002',
+        ))
+    return errors
+
+
+@register()
+def check_click_sampling(app_configs, **kwargs):
+    if settings.CLICK_SAMPLE_RATE < 1:
+        return [Error(
+            'CLICK_SAMPLE_RATE must be at least 1.',
+            hint='It is the N in "store one click in N"; 1 stores every click.',
+            id='core.E003',
+        )]
+    return []
+
+
+@register()
+def check_asgi_connections(app_configs, **kwargs):
+    if settings.SERVER_PROFILE != 'asgi':
+        return []
+    persistent = [alias for alias, db in settings.DATABASES.items() if db.get('CONN_MAX_AGE')]
+    if persistent:
+        return [Warning(
+            f"CONN_MAX_AGE is set under SERVER_PROFILE=asgi ({', '.join(persistent)}).",
+            hint='Each async worker thread keeps its own connection open; set CONN_MAX_AGE=0 '
+                 'and use DATABASE_POOL on PostgreSQL.',
+            id='core.W001',
+        )]
+    return []
@@ -0,0 +1,100 @@
+"""
+Validators for conditional GETs on per-user link data.
+
+Each one costs an aggregate query per shard, or one indexed row for a
+single link, rather than a full render, so ``revalidated`` views answer
+If-None-Match / If-Modified-Since with a 304 before doing any heavy work.
+``updated_at`` alone is not enough: counting a click bumps ``click_count``
+without saving the link, so link validators fold the click counts in.
+Last-Modified is only sent where it changes with the content, i.e. for
+click logs. ETags of list pages include the query string, so a page,
+search or sort never revalidates against another.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max, Subquery, Sum
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from . import pagecache, sharding
+from .models import Link
+
+
+def make_etag(*parts):
+    return hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+
+
+def query_key(request):
+    """``request``'s query parameters in a canonical order, for ETags."""
+    return sorted(request.GET.lists())
+
+
+def user_links_version(user):
+    """(count, latest updated_at, total clicks) of ``user``'s links on every shard."""
+    def shard_version(db):
+        return Link.objects.using(db).filter(user=user).aggregate(
+            count=Count('id'), updated=Max('updated_at'), clicks=Sum('click_count'),
+        )
+
+    parts = sharding.fan_out(shard_version)
+    updated = [part['updated'] for part in parts if part['updated'] is not None]
+    return (
+        sum(part['count'] for part in parts),
+        max(updated) if updated else None,
+        sum(part['clicks'] or 0 for part in parts),
+    )
+
+
+def link_version(user, pk):
+    """(updated_at, click_count) of ``user``'s link ``pk``, or None."""
+    return Link.objects.for_id(pk).filter(pk=pk, user=user).values_list('updated_at', 'click_count').first()
+
+
+def clicks_version(user, pk, clicks):
+    """
+    (updated_at, click_count, latest clicked_at) of ``user``'s link ``pk``, or
+    None. ``clicks`` filters ``Click.objects.filter(link=OuterRef('pk'))``;
+    only its newest row is read, through the (link, clicked_at) index.
+    """
+    latest = clicks.order_by('-clicked_at').values('clicked_at')[:1]
+    return (
+        Link.objects.for_id(pk).filter(pk=pk, user=user)
+        .annotate(latest=Subquery(latest))
+        .values_list('updated_at', 'click_count', 'latest')
+        .first()
+    )
+
+
+def dashboard_etag(request, *args, **kwargs):
+    # The page embeds the CSRF token and any pending messages: a new CSRF
+    # secret changes the tag, and pages with messages are always rendered.
+    if len(get_messages(request)):
+        return None
+    return make_etag(
+        request.user.pk, user_links_version(request.user),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME), pagecache.template_version(),
+        query_key(request),
+    )
+
+
+def revalidated(etag_func=None, last_modified_func=None):
+    """
+    ``condition(etag_func, last_modified_func)`` that also marks GET responses
+    ``private, no-cache`` so clients keep them but always revalidate.
+    """
+    def decorator(view):
+        conditional_view = condition(etag_func, last_modified_func)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,79 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import sharding
+from .models import Link, SiteCounter
+
+LINKS_TOTAL = 'links:total'
+
+
+def links_day_key(day):
+    return f'links:day:{day.isoformat()}'
+
+
+def bump(name, delta=1):
+    """Atomically add ``delta`` to a counter, creating it on first use."""
+    if SiteCounter.objects.filter(name=name).update(value=F('value') + delta):
+        return
+    try:
+        with transaction.atomic():
+            SiteCounter.objects.create(name=name, value=delta)
+    except IntegrityError:
+        SiteCounter.objects.filter(name=name).update(value=F('value') + delta)
+
+
+def record_links_created(created_at, count=1):
+    bump(LINKS_TOTAL, count)
+    bump(links_day_key(timezone.localdate(created_at)), count)
+
+
+def record_links_deleted(created_at, count=1):
+    record_links_created(created_at, -count)
+
+
+def read_link_counts(day=None):
+    """Return ``(total_links, links_created_on_day)`` with one indexed lookup."""
+    day = day or timezone.localdate()
+    day_key = links_day_key(day)
+    values = dict(
+        SiteCounter.objects.filter(name__in=[LINKS_TOTAL, day_key]).values_list('name', 'value')
+    )
+    return values.get(LINKS_TOTAL, 0), values.get(day_key, 0)
+
+
+def reconcile_link_counters():
+    """
+    Recompute the link counters from ``core_link`` and overwrite drifted values.
+
+    Returns the number of counters that were corrected.
+    """
+    def shard_counts(db):
+        return list(
+            Link.objects.using(db).annotate(day=TruncDate('created_at'))
+            .values('day')
+            .annotate(count=Count('id'))
+            .order_by()
+        )
+
+    expected = {LINKS_TOTAL: 0}
+    for per_day in sharding.fan_out(shard_counts):
+        for row in per_day:
+            key = links_day_key(row['day'])
+            expected[key] = expected.get(key, 0) + row['count']
+            expected[LINKS_TOTAL] += row['count']
+
+    current = dict(
+        SiteCounter.objects.filter(name__startswith='links:').values_list('name', 'value')
+    )
+    corrected = 0
+    with transaction.atomic():
+        for name, value in expected.items():
+            if current.get(name) != value:
+                SiteCounter.objects.update_or_create(name=name, defaults={'value': value})
+                corrected += 1
+        stale = [name for name in current if name not in expected and current[name] != 0]
+        if stale:
+            corrected += SiteCounter.objects.filter(name__in=stale).update(value=0)
+    return corrected
@@ -0,0 +1,29 @@
+import threading
+
+from django.db import connections
+
+_lock = threading.Lock()
+_connects = {}
+
+
+def count_connection(sender, connection, **kwargs):
+    """``connection_created`` receiver: count new or pool-checked-out connections per alias."""
+    with _lock:
+        _connects[connection.alias] = _connects.get(connection.alias, 0) + 1
+
+
+def connection_metrics():
+    """Per-alias connect counts for this process, plus psycopg pool stats when pooled."""
+    metrics = {}
+    for alias in connections:
+        conn = connections[alias]
+        entry = {
+            'connects': _connects.get(alias, 0),
+            'conn_max_age': conn.settings_dict.get('CONN_MAX_AGE'),
+        }
+        if conn.settings_dict.get('OPTIONS', {}).get('pool'):
+            pool = conn.pool
+            if pool is not None:
+                entry['pool'] = pool.get_stats()
+        metrics[alias] = entry
+    return metrics
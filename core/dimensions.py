@@ -0,0 +1,151 @@
+"""
+Dictionary encoding for Click rows.
+
+Each click database has its own Dimension table. Ingest maps strings to
+dimension ids through a per-process cache, so steady traffic (the same few
+browsers, countries and user agents) needs no lookups. Reads decode ids
+back to strings in one query per batch.
+"""
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.db import router, transaction
+
+from .models import Click, Dimension
+
+DIMENSION_FIELDS = list(Dimension.KINDS)
+CACHE_MAX_ENTRIES = 50000
+
+# (db, field, value) -> id and (db, id) -> value. Dimension rows are never
+# updated, so entries only go away when the cache is reset for size. Ids
+# are only remembered once committed: a rolled-back row may be reused.
+_ids = {}
+_values = {}
+
+
+def dimension_digest(field, value):
+    return hashlib.blake2b(f'{Dimension.KINDS[field]}:{value}'.encode('utf-8'), digest_size=16).digest()
+
+
+def click_db(link_id):
+    """The database alias clicks for ``link_id`` are written to."""
+    return router.db_for_write(Click, instance=Click(link_id=link_id))
+
+
+def _remember(db, field, value, pk):
+    if len(_ids) >= CACHE_MAX_ENTRIES:
+        _ids.clear()
+        _values.clear()
+    _ids[(db, field, value)] = pk
+    _values[(db, pk)] = value
+
+
+def dimension_ids(db, pairs):
+    """``{(field, value): id}`` for ``pairs``, creating dimensions that do not exist yet."""
+    found = {}
+    missing = {}
+    for field, value in pairs:
+        pk = _ids.get((db, field, value))
+        if pk is None:
+            missing[dimension_digest(field, value)] = (field, value)
+        else:
+            found[(field, value)] = pk
+    if not missing:
+        return found
+
+    dimensions = Dimension.objects.using(db)
+    rows = {bytes(d): pk for d, pk in dimensions.filter(digest__in=list(missing)).values_list('digest', 'id')}
+    new = [
+        Dimension(kind=Dimension.KINDS[field], digest=digest, value=value)
+        for digest, (field, value) in missing.items()
+        if digest not in rows
+    ]
+    if new:
+        # Another process may insert the same values concurrently.
+        dimensions.bulk_create(new, ignore_conflicts=True)
+        rows.update(
+            (bytes(d), pk)
+            for d, pk in dimensions.filter(digest__in=[d.digest for d in new]).values_list('digest', 'id')
+        )
+    remembered = []
+    for digest, pk in rows.items():
+        field, value = missing[digest]
+        remembered.append((db, field, value, pk))
+        found[(field, value)] = pk
+    transaction.on_commit(lambda: [_remember(*entry) for entry in remembered], using=db)
+    return found
+
+
+def _encode(fields, ids):
+    encoded = {name: value for name, value in fields.items() if name not in Dimension.KINDS}
+    for name in DIMENSION_FIELDS:
+        value = fields.get(name)
+        if value:
+            encoded[f'{name}_id'] = ids[(name, value)]
+    ip_hash = fields.get('ip_hash')
+    encoded['ip_hash'] = bytes.fromhex(ip_hash) if ip_hash else None
+    return encoded
+
+
+def _pairs(fields):
+    return [(name, fields[name]) for name in DIMENSION_FIELDS if fields.get(name)]
+
+
+def encode_click(db, fields):
+    """Turn string click fields into Click kwargs (``<field>_id``, binary ``ip_hash``) for ``db``."""
+    return _encode(fields, dimension_ids(db, _pairs(fields)))
+
+
+async def aencode_click(db, fields):
+    pairs = _pairs(fields)
+    ids = {pair: _ids.get((db, *pair)) for pair in pairs}
+    if None in ids.values():
+        ids = await sync_to_async(dimension_ids)(db, pairs)
+    return _encode(fields, ids)
+
+
+def dimension_values(db, ids):
+    """``{id: value}`` for dimension ids on ``db`` (``None`` ids are skipped)."""
+    values = {}
+    missing = set()
+    for pk in ids:
+        if pk is None:
+            continue
+        value = _values.get((db, pk))
+        if value is None:
+            missing.add(pk)
+        else:
+            values[pk] = value
+    if missing:
+        if len(_values) >= CACHE_MAX_ENTRIES:
+            _values.clear()
+        for pk, value in Dimension.objects.using(db).filter(pk__in=missing).values_list('id', 'value'):
+            _values[(db, pk)] = value
+            values[pk] = value
+    return values
+
+
+def query_fields(fields):
+    """``values()`` arguments that fetch ``fields`` from Click without joining Dimension."""
+    return [f'{name}_id' if name in Dimension.KINDS else name for name in fields]
+
+
+def decode_rows(db, rows, fields):
+    """
+    Rows from ``values(*query_fields(fields))`` as dicts keyed by ``fields``,
+    with dimension strings ('' when unset) and ``ip_hash`` as hex.
+    """
+    dims = [name for name in fields if name in Dimension.KINDS]
+    values = dimension_values(db, {row[f'{name}_id'] for row in rows for name in dims})
+    decoded = []
+    for row in rows:
+        out = {}
+        for name in fields:
+            if name in Dimension.KINDS:
+                out[name] = values.get(row[f'{name}_id'], '')
+            elif name == 'ip_hash':
+                out[name] = bytes(row[name]).hex() if row[name] else ''
+            else:
+                out[name] = row[name]
+        decoded.append(out)
+    return decoded
@@ -0,0 +1,149 @@
+import heapq
+import json
+import zlib
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import sharding
+from .dimensions import decode_rows, query_fields
+from .models import Click
+
+EXPORT_FORMATS = ('ndjson', 'columnar')
+EXPORT_CHUNK_SIZE = 5000
+
+EXPORT_FIELDS = [
+    'id', 'link_id', 'clicked_at', 'referrer', 'user_agent', 'country', 'city',
+    'device_type', 'browser', 'os', 'ip_hash', 'weight',
+]
+
+# Repetitive string columns that are dictionary-encoded in the columnar format.
+DIMENSION_FIELDS = ['referrer', 'user_agent', 'country', 'city', 'device_type', 'browser', 'os']
+
+
+def parse_export_bound(value, end=False):
+    """Parse a ``from``/``to`` bound given as an ISO date or datetime."""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date: {value}")
+        parsed = datetime.combine(day, time.max if end else time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.get_default_timezone())
+    return parsed
+
+
+def click_export_querysets(user=None, link=None, since=None, until=None):
+    """One click queryset per database holding matching clicks (one per shard when sharded)."""
+    def build(db):
+        clicks = Click.objects.using(db)
+        if link is not None:
+            clicks = clicks.filter(link=link)
+        if user is not None:
+            clicks = clicks.filter(link__user=user)
+        if since is not None:
+            clicks = clicks.filter(clicked_at__gte=since)
+        if until is not None:
+            clicks = clicks.filter(clicked_at__lte=until)
+        return clicks
+
+    if link is not None:
+        return [build(sharding.shard_for_link_id(link.pk))]
+    return [build(db) for db in (sharding.shard_aliases() or [None])]
+
+
+def iter_click_chunks(querysets, cursor=0, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield lists of click rows in ascending id order, resuming after ``cursor``.
+
+    Uses keyset pagination on the primary key so each chunk is an index range
+    scan and memory stays bounded by ``chunk_size`` regardless of export size.
+    With several querysets (shards), each chunk is the lowest ``chunk_size``
+    ids across all of them; click ids are unique across shards.
+    """
+    last_id = cursor or 0
+    while True:
+        parts = [
+            decode_rows(queryset.db, list(
+                queryset.filter(id__gt=last_id)
+                .order_by('id')
+                .values(*query_fields(EXPORT_FIELDS))[:chunk_size]
+            ), EXPORT_FIELDS)
+            for queryset in querysets
+        ]
+        rows = parts[0] if len(parts) == 1 else list(heapq.merge(*parts, key=lambda row: row['id']))[:chunk_size]
+        if not rows:
+            return
+        for row in rows:
+            row['clicked_at'] = row['clicked_at'].isoformat()
+        yield rows
+        last_id = rows[-1]['id']
+        if len(rows) < chunk_size:
+            return
+
+
+def _encode_ndjson(chunks):
+    for rows in chunks:
+        yield ''.join(json.dumps(row, separators=(',', ':')) + '\n' for row in rows)
+
+
+def _encode_columnar(chunks):
+    """
+    One JSON record per chunk holding column arrays.
+
+    Dimension columns hold integer codes. Each chunk's ``dictionaries`` lists
+    only the values first seen in that chunk, so a reader appends them to the
+    dictionary it has built so far; codes are positions in that dictionary.
+    The first chunk of every export, including a resumed one, has
+    ``"reset": true``: the reader starts new, empty dictionaries there.
+    """
+    dictionaries = {field: {} for field in DIMENSION_FIELDS}
+    first = True
+    for rows in chunks:
+        columns = {}
+        new_values = {}
+        for field in EXPORT_FIELDS:
+            values = [row[field] for row in rows]
+            if field in dictionaries:
+                mapping = dictionaries[field]
+                added = []
+                codes = []
+                for value in values:
+                    code = mapping.get(value)
+                    if code is None:
+                        code = mapping[value] = len(mapping)
+                        added.append(value)
+                    codes.append(code)
+                values = codes
+                if added:
+                    new_values[field] = added
+            columns[field] = values
+        yield json.dumps({
+            'cursor': rows[-1]['id'],
+            'rows': len(rows),
+            'reset': first,
+            'dictionaries': new_values,
+            'columns': columns,
+        }, separators=(',', ':')) + '\n'
+        first = False
+
+
+def stream_click_export(querysets, fmt='ndjson', cursor=0, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield gzip-compressed export bytes for ``querysets`` (see click_export_querysets).
+
+    Every chunk is sync-flushed, so a truncated download still decompresses up
+    to the last complete chunk and can be resumed from the last id (NDJSON) or
+    ``cursor`` (columnar) it contains.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    encode = _encode_columnar if fmt == 'columnar' else _encode_ndjson
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for text in encode(iter_click_chunks(querysets, cursor=cursor, chunk_size=chunk_size)):
+        yield compressor.compress(text.encode('utf-8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
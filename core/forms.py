@@ -35,7 +35,8 @@ class ShortenerForm(forms.Form):
         valid, error = validate_slug(slug)
         if not valid:
             raise forms.ValidationError(error)
-        if Link.objects.filter(short_code=slug).exists() or Link.objects.filter(custom_slug=slug).exists():
+        links = Link.objects.for_code(slug)
+        if links.filter(short_code=slug).exists() or links.filter(custom_slug=slug).exists():
             raise forms.ValidationError("This slug is already taken.")
         return slug
 
@@ -0,0 +1,164 @@
+"""
+Server-side IP geolocation from a local range database.
+
+GEOIP_DATABASE is a CSV with a header row and either ``start,end`` or
+``network`` (CIDR) columns plus ``country`` and ``city``. It is loaded into
+sorted arrays of range starts/ends (IPv4 as 32-bit ints, IPv6 as Python
+ints) with an index into a deduplicated location table, and looked up with
+``bisect``. Ranges must not overlap.
+
+The file is re-read when its mtime changes (checked at most every
+GEOIP_RELOAD_INTERVAL seconds), so it can be swapped in place with a
+rename; the new index is built on a background thread and lookups keep
+using the previous one until it is ready.
+"""
+import csv
+import ipaddress
+import logging
+import os
+import socket
+import threading
+import time
+from array import array
+from bisect import bisect_right
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class GeoIndex:
+    def __init__(self, rows):
+        locations = {}
+        ranges = {4: [], 6: []}
+        for first, last, country, city in rows:
+            location = locations.setdefault((country[:100], city[:100]), len(locations))
+            ranges[first.version].append((int(first), int(last), location))
+        for entries in ranges.values():
+            entries.sort()
+
+        self.locations = [{'country': country, 'city': city} for country, city in locations]
+        location_type = 'H' if len(self.locations) <= 0xFFFF else 'I'
+        self.tables = {}
+        for version, entries in ranges.items():
+            self.tables[version] = (
+                array('I', [e[0] for e in entries]) if version == 4 else [e[0] for e in entries],
+                array('I', [e[1] for e in entries]) if version == 4 else [e[1] for e in entries],
+                array(location_type, [e[2] for e in entries]),
+            )
+
+    def __len__(self):
+        return sum(len(starts) for starts, _, _ in self.tables.values())
+
+    def lookup(self, ip):
+        try:
+            # inet_pton is several times faster than ipaddress for the IPv4 case.
+            version, n = 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big')
+        except OSError:
+            try:
+                address = ipaddress.ip_address(ip)
+            except ValueError:
+                return None
+            if address.version == 6 and address.ipv4_mapped is not None:
+                address = address.ipv4_mapped
+            version, n = address.version, int(address)
+        starts, ends, locations = self.tables[version]
+        i = bisect_right(starts, n) - 1
+        if i < 0 or n > ends[i]:
+            return None
+        return self.locations[locations[i]]
+
+
+def read_ranges(path):
+    """Yield ``(first, last, country, city)`` from a range CSV."""
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if row.get('network'):
+                network = ipaddress.ip_network(row['network'].strip(), strict=False)
+                first, last = network.network_address, network.broadcast_address
+            else:
+                first = ipaddress.ip_address(row['start'].strip())
+                last = ipaddress.ip_address(row['end'].strip())
+            yield first, last, row.get('country', '').strip(), row.get('city', '').strip()
+
+
+def load(path):
+    return GeoIndex(read_ranges(path))
+
+
+# -- process-wide index with hot reload --
+
+_lock = threading.Lock()
+_index = None
+_loaded = (None, None)  # (path, mtime) last read
+_next_check = 0.0
+_reloader = None  # thread building the next index, if any
+
+
+def _database_path():
+    return settings.GEOIP_DATABASE or None
+
+
+def is_enabled():
+    return _database_path() is not None
+
+
+def _build(path):
+    try:
+        return load(path)
+    except (OSError, ValueError, KeyError):
+        logger.exception('Could not load GEOIP_DATABASE %s', path)
+        return None
+
+
+def _reload(path, mtime):
+    global _index, _loaded, _reloader
+    index = _build(path)
+    with _lock:
+        if _loaded[0] == path:
+            # On failure keep the last good index and wait for the file to change again.
+            if index is not None:
+                _index = index
+            _loaded = (path, mtime)
+        _reloader = None
+
+
+def get_index():
+    """
+    The current index; None when disabled. A changed database file is parsed
+    on a background thread while the previous index keeps answering lookups.
+    """
+    global _index, _loaded, _next_check, _reloader
+    path = _database_path()
+    if path is None:
+        return None
+    now = time.monotonic()
+    if _loaded[0] == path and now < _next_check:
+        return _index
+    with _lock:
+        if _loaded[0] == path and now < _next_check:
+            return _index
+        _next_check = now + settings.GEOIP_RELOAD_INTERVAL
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            logger.exception('Could not load GEOIP_DATABASE %s', path)
+            mtime = None
+        if _loaded[0] != path:
+            # Nothing to fall back on yet: load in place.
+            _index = _build(path) if mtime is not None else None
+            _loaded = (path, mtime if _index is not None else None)
+        elif mtime is not None and mtime != _loaded[1] and _reloader is None:
+            _reloader = threading.Thread(target=_reload, args=(path, mtime), name='geoip-reload', daemon=True)
+            _reloader.start()
+    return _index
+
+
+def locate_ip(ip):
+    """``{'country', 'city'}`` for ``ip`` from the local database, or None if unknown."""
+    if not ip:
+        return None
+    index = get_index()
+    if index is None:
+        return None
+    return index.lookup(ip)
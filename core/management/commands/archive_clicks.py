@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import archive, partitions
+from core.models import Click
+
+
+class Command(BaseCommand):
+    help = "Archive clicks older than the retention window to gzip files, keeping daily rollups."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention-days", type=int, default=None,
+            help="Override CLICK_RETENTION_DAYS for this run.",
+        )
+        parser.add_argument(
+            "--output-dir", type=str, default=None,
+            help="Directory for archive files (default: CLICK_ARCHIVE_DIR).",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be archived.")
+
+    def handle(self, *args, **options):
+        cutoff = archive.retention_cutoff(options["retention_days"])
+        directory = options["output_dir"] or settings.CLICK_ARCHIVE_DIR
+        if cutoff is None:
+            raise CommandError("Retention is disabled: set CLICK_RETENTION_DAYS or pass --retention-days.")
+
+        total = 0
+        for db in archive.click_databases():
+            connection = connections[db]
+            if partitions.is_partitioned(connection) and not options["dry_run"]:
+                partitions.ensure_month_partitions(connection)
+            for month in archive.expired_months(db, cutoff):
+                if options["dry_run"]:
+                    start, end = partitions.month_bounds(month)
+                    count = Click.objects.using(db).filter(clicked_at__gte=start, clicked_at__lt=end).count()
+                    self.stdout.write(f"{db} {month:%Y-%m}: {count} clicks would be archived")
+                    continue
+                count = archive.archive_month(db, month, directory)
+                total += count
+                self.stdout.write(f"{db} {month:%Y-%m}: archived {count} clicks")
+
+        if not options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"Archived {total} clicks older than {cutoff:%Y-%m} to {directory}."
+            ))
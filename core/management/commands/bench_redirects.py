@@ -0,0 +1,79 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Link
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the redirect path of one or more running servers and compare them, "
+        "e.g. --target wsgi=http://127.0.0.1:8000 --target asgi=http://127.0.0.1:8001."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target", action="append", required=True,
+            help="name=base_url of a running server (repeatable).",
+        )
+        parser.add_argument("--code", type=str, help="Short code to request (default: create a bench link).")
+        parser.add_argument("--requests", type=int, default=2000, help="Requests per target.")
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--analytics", action="store_true", help="Also POST /push-analytics/ for each redirect.")
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options["target"]:
+            name, sep, base_url = target.partition("=")
+            if not sep:
+                raise CommandError(f"Expected name=base_url, got: {target}")
+            targets.append((name, base_url.rstrip("/")))
+
+        code = options["code"]
+        if not code:
+            link, _ = Link.objects.for_code("bench-redirect").get_or_create(
+                custom_slug="bench-redirect",
+                defaults={"original_url": "https://example.com/bench"},
+            )
+            code = link.get_display_code()
+
+        rows = []
+        for name, base_url in targets:
+            rows.append((name, *self.run_target(base_url, code, options)))
+
+        self.stdout.write(f"{'target':<12}{'ok':>8}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        for name, ok, errors, rps, p50, p99 in rows:
+            self.stdout.write(f"{name:<12}{ok:>8}{errors:>8}{rps:>10.1f}{p50:>10.2f}{p99:>10.2f}")
+
+    def run_target(self, base_url, code, options):
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=options["concurrency"])
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        redirect_url = f"{base_url}/{code}/"
+        analytics_url = f"{base_url}/push-analytics/"
+
+        def one(_):
+            start = time.perf_counter()
+            try:
+                ok = session.get(redirect_url, allow_redirects=False).status_code == 200
+                if ok and options["analytics"]:
+                    ok = session.post(analytics_url, json={"postcode": code, "data": {}}).status_code == 200
+            except requests.RequestException:
+                ok = False
+            return ok, time.perf_counter() - start
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+            results = list(pool.map(one, range(options["requests"])))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(duration * 1000 for ok, duration in results if ok)
+        ok = len(latencies)
+        if not latencies:
+            return 0, len(results), 0.0, 0.0, 0.0
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        return ok, len(results) - ok, ok / elapsed, statistics.median(latencies), p99
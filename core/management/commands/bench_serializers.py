@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.serializers import (
+    CLICK_VALUES, LINK_VALUES, ClickSerializer, LinkSerializer, click_rows, link_rows,
+)
+from core import sharding
+from core.models import Click, Link, get_site_base_url
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare rows/sec of the API's values()-based serializers with LinkSerializer and "
+        "ClickSerializer on existing links and clicks, and check both produce the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="Rows per run.")
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per serializer (best is reported).")
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+        results = []
+
+        def links(db):
+            return Link.objects.using(db)
+
+        base_url = get_site_base_url()
+        drf, drf_time = self.best(repeat, lambda: LinkSerializer(
+            sharding.sharded_queryset(links, '-created_at')[:rows], many=True,
+        ).data)
+        fast, fast_time = self.best(repeat, lambda: link_rows(
+            sharding.sharded_queryset(lambda db: links(db).values(*LINK_VALUES), '-created_at', values=True)[:rows],
+            base_url,
+        ))
+        results.append(("links", drf, fast, drf_time, fast_time))
+
+        # Clicks are read one shard at a time, as link_clicks does.
+        db = next((db for db in sharding.shard_aliases() or [None] if Click.objects.using(db).exists()), None)
+        clicks = Click.objects.using(db).order_by('-id')
+        drf, drf_time = self.best(repeat, lambda: ClickSerializer(
+            clicks.select_related('referrer', 'country', 'city', 'device_type', 'browser', 'os')[:rows], many=True,
+        ).data)
+        fast, fast_time = self.best(repeat, lambda: click_rows(clicks.db, list(clicks.values(*CLICK_VALUES)[:rows])))
+        results.append(("clicks", drf, fast, drf_time, fast_time))
+
+        self.stdout.write(f"{'rows':<8}{'count':>8}{'drf rows/s':>14}{'fast rows/s':>14}{'speedup':>10}")
+        for name, drf, fast, drf_time, fast_time in results:
+            if [dict(row) for row in drf] != fast:
+                raise CommandError(f"Fast {name} serializer output differs from the DRF serializer.")
+            count = len(fast)
+            if not count:
+                self.stdout.write(f"{name:<8}{0:>8}  (no rows to benchmark)")
+                continue
+            self.stdout.write(
+                f"{name:<8}{count:>8}{count / drf_time:>14.0f}{count / fast_time:>14.0f}"
+                f"{drf_time / fast_time:>9.1f}x"
+            )
+
+    def best(self, repeat, fn):
+        best = float("inf")
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            result = fn()
+            best = min(best, time.perf_counter() - started)
+        return result, best
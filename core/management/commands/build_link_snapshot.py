@@ -0,0 +1,23 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import snapshot
+
+
+class Command(BaseCommand):
+    help = "Rebuild the mmapped code -> link snapshot used by the redirect resolver (core.snapshot)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", help="Output file (default: LINK_SNAPSHOT_PATH).")
+
+    def handle(self, *args, **options):
+        path = options["path"] or settings.LINK_SNAPSHOT_PATH
+        if not path:
+            raise CommandError("No snapshot path: set LINK_SNAPSHOT_PATH or pass --path.")
+        started = time.monotonic()
+        count = snapshot.build_snapshot(path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {count} codes to {path} in {time.monotonic() - started:.2f}s"
+        ))
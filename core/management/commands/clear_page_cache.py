@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core import pagecache
+
+
+class Command(BaseCommand):
+    help = "Drop every page in the anonymous page cache (core.pagecache). Run on deploy."
+
+    def handle(self, *args, **options):
+        pagecache.clear()
+        self.stdout.write(self.style.SUCCESS("Page cache cleared"))
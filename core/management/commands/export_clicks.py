@@ -0,0 +1,73 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from core.exports import (
+    EXPORT_CHUNK_SIZE, EXPORT_FORMATS, click_export_querysets, parse_export_bound,
+    stream_click_export,
+)
+from core.models import Link
+
+
+class Command(BaseCommand):
+    help = "Stream click logs for a user or link as gzip NDJSON or columnar chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=str, help="Email of the user whose clicks to export.")
+        parser.add_argument("--link", type=str, help="Link id, short code or custom slug.")
+        parser.add_argument("--from", dest="since", type=str, help="Start date/datetime (inclusive).")
+        parser.add_argument("--to", dest="until", type=str, help="End date/datetime (inclusive).")
+        parser.add_argument("--format", dest="fmt", choices=EXPORT_FORMATS, default="ndjson")
+        parser.add_argument("--cursor", type=int, default=0, help="Resume after this click id.")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+        parser.add_argument(
+            "--output", "-o", type=str,
+            help="Output file (default: stdout). Resumed exports are appended as a new gzip member.",
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        link = None
+        if options["user"]:
+            User = get_user_model()
+            try:
+                user = User.objects.get(email=options["user"])
+            except User.DoesNotExist:
+                raise CommandError(f"No user found with email: {options['user']}")
+        if options["link"]:
+            value = options["link"]
+            links = Link.objects.for_code(value).filter(Q(short_code=value) | Q(custom_slug=value))
+            if not links.exists() and value.isdigit():
+                links = Link.objects.for_id(int(value)).filter(pk=int(value))
+            link = links.first()
+            if link is None:
+                raise CommandError(f"No link found for: {value}")
+            if user is not None and link.user_id != user.pk:
+                raise CommandError(f"Link {value} does not belong to {options['user']}.")
+        if user is None and link is None:
+            raise CommandError("Pass --user or --link.")
+
+        try:
+            since = parse_export_bound(options["since"])
+            until = parse_export_bound(options["until"], end=True)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        clicks = click_export_querysets(user=user, link=link, since=since, until=until)
+        chunks = stream_click_export(
+            clicks, fmt=options["fmt"], cursor=options["cursor"], chunk_size=options["chunk_size"],
+        )
+
+        if options["output"]:
+            mode = "ab" if options["cursor"] else "wb"
+            with open(options["output"], mode) as out:
+                for data in chunks:
+                    out.write(data)
+            self.stderr.write(self.style.SUCCESS(f"Export written to {options['output']}"))
+        else:
+            out = sys.stdout.buffer
+            for data in chunks:
+                out.write(data)
+            out.flush()
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import qr, sharding
+
+
+class Command(BaseCommand):
+    help = "Render QR codes for links and/or URLs into a ZIP archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--link", dest="links", type=int, action="append", default=[], help="Link id (repeatable).")
+        parser.add_argument("--url", dest="urls", action="append", default=[], help="URL to encode (repeatable).")
+        parser.add_argument("--url-file", type=str, help="File with one URL per line.")
+        parser.add_argument("--fg", type=str, default=qr.DEFAULT_FG)
+        parser.add_argument("--bg", type=str, default=qr.DEFAULT_BG)
+        parser.add_argument("--format", dest="fmt", choices=list(qr.QR_CONTENT_TYPES), default="png")
+        parser.add_argument("--box-size", type=int, default=qr.DEFAULT_BOX_SIZE)
+        parser.add_argument("--output", "-o", type=str, required=True, help="Path of the ZIP file to write.")
+
+    def handle(self, *args, **options):
+        urls = list(options["urls"])
+        if options["url_file"]:
+            with open(options["url_file"], encoding="utf-8") as f:
+                urls.extend(line.strip() for line in f if line.strip())
+
+        links = sharding.links_in_bulk(options["links"])
+        missing = [pk for pk in options["links"] if pk not in links]
+        if missing:
+            raise CommandError(f"Links not found: {', '.join(map(str, missing))}")
+
+        items = [(links[pk].get_display_code(), links[pk].get_short_url()) for pk in options["links"]]
+        items += [(f"qr-{i}", url) for i, url in enumerate(urls, start=1)]
+        if not items:
+            raise CommandError("Pass at least one --link, --url or --url-file.")
+
+        pool = qr.render_pool()
+        try:
+            with open(options["output"], "wb") as out:
+                for data in qr.stream_qr_zip(
+                    items,
+                    fg=qr.normalize_hex_color(options["fg"], qr.DEFAULT_FG),
+                    bg=qr.normalize_hex_color(options["bg"], qr.DEFAULT_BG),
+                    fmt=options["fmt"],
+                    box_size=qr.normalize_box_size(options["box_size"]),
+                    pool=pool,
+                ):
+                    out.write(data)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(items)} QR codes to {options['output']}"))
@@ -0,0 +1,68 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+
+class PurgeHandler(BaseHTTPRequestHandler):
+    def _reply(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        keys = self.headers.get("Surrogate-Key", "").split()
+        if self.path != "/purge" or not keys:
+            self._reply(400, {"error": "POST /purge with a Surrogate-Key header"})
+            return
+        self.server.purged.extend(keys)
+        self.server.requests.append(dict(self.headers))
+        if self.server.stdout is not None:
+            self.server.stdout.write(f"purged {' '.join(keys)}")
+        self._reply(200, {"status": "ok", "purged": keys})
+
+    def do_GET(self):
+        if self.path != "/purged":
+            self._reply(404, {"error": "not found"})
+            return
+        self._reply(200, {"purged": self.server.purged})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class PurgeServer(ThreadingHTTPServer):
+    """The stand-in purge API; ``purged`` lists every key received, ``requests`` their headers."""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, stdout=None):
+        super().__init__((host, port), PurgeHandler)
+        self.purged = []
+        self.requests = []
+        self.stdout = stdout
+        self.url = f"http://{host}:{self.server_address[1]}/purge"
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local stand-in for the CDN purge API: POST /purge with a Surrogate-Key "
+        "header records the keys, GET /purged lists them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8089)
+
+    def handle(self, *args, **options):
+        server = PurgeServer(options["host"], options["port"], stdout=self.stdout)
+        self.stdout.write(f"Purge server listening on {server.url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
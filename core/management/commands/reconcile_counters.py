@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.counters import reconcile_link_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute maintained site counters from the link table (run periodically)."
+
+    def handle(self, *args, **options):
+        corrected = reconcile_link_counters()
+        self.stdout.write(self.style.SUCCESS(f"Reconciled site counters ({corrected} corrected)."))
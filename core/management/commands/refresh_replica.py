@@ -0,0 +1,28 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.routers import PRIMARY_DB, REPLICA_DB
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database onto the replica file (local stand-in for replication)."
+
+    def handle(self, *args, **options):
+        if REPLICA_DB not in connections.settings:
+            raise CommandError("No replica database configured (set REPLICA_DATABASE_URL).")
+        primary = connections[PRIMARY_DB]
+        replica = connections[REPLICA_DB]
+        if primary.vendor != "sqlite" or replica.vendor != "sqlite":
+            raise CommandError("refresh_replica only supports SQLite; real replicas use database replication.")
+
+        target = str(replica.settings_dict["NAME"])
+        tmp = f"{target}.tmp"
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        with primary.cursor() as cursor:
+            cursor.execute("VACUUM INTO %s", [tmp])
+        replica.close()
+        os.replace(tmp, target)
+        self.stdout.write(self.style.SUCCESS(f"Replica refreshed from primary: {target}"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core.warmup import warm_link_cache
+
+
+class Command(BaseCommand):
+    help = "Preload the hottest links into the redirect resolve cache (core.warmup)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, help="Links to load (default: LINK_WARMUP_COUNT).")
+        parser.add_argument("--seconds", type=float, help="Time budget (default: LINK_WARMUP_SECONDS).")
+
+    def handle(self, *args, **options):
+        report = warm_link_cache(limit=options["limit"], seconds=options["seconds"], force=True)
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {report['links']} links ({report['codes']} codes, {report['bytes']} bytes) "
+            f"in {report['seconds']}s" + (f", stopped early ({report['stopped']})" if report["stopped"] else "")
+        ))
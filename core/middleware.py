@@ -1,10 +1,28 @@
+import re
 import time
-from django.core.cache import cache
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
 from django.http import JsonResponse
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+from . import ratelimit, routers
+from .pending import clear_claimed_links
+
+try:
+    import brotli
+except ImportError:  # the "brotli" extra
+    brotli = None
+
+re_accepts_br = re.compile(r'\bbr\b')
 
 
 class RateLimitMiddleware:
-    """Simple rate limiting middleware using Django cache."""
+    """Sliding-window rate limiting keyed by route prefix, using Django cache."""
+
+    sync_capable = True
+    async_capable = True
 
     RATE_LIMITS = {
         '/shorten/': {'anonymous': 100, 'authenticated': 1000, 'window': 3600},
@@ -16,33 +34,178 @@ class RateLimitMiddleware:
 
     def __init__(self, get_response):
         self.get_response = get_response
+        self.matcher = ratelimit.PrefixMatcher(self.RATE_LIMITS)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _identity(self, request, user, limit_config):
+        if user.is_authenticated:
+            return f"user:{user.id}", limit_config['authenticated']
+        ip = request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')[0].strip() or request.META.get('REMOTE_ADDR', '')
+        return f"ip:{ip}", limit_config['anonymous']
+
+    def _limited_response(self, result):
+        response = JsonResponse(
+            {'error': 'Rate limit exceeded. Please try again later.'},
+            status=429,
+        )
+        response['Retry-After'] = str(result.retry_after)
+        return response
+
+    def _add_headers(self, response, result):
+        response['X-RateLimit-Limit'] = str(result.limit)
+        response['X-RateLimit-Remaining'] = str(result.remaining)
+        response['X-RateLimit-Reset'] = str(result.reset)
+        return response
 
     def __call__(self, request):
-        path = request.path
-        limit_config = None
-        for prefix, config in self.RATE_LIMITS.items():
-            if path.startswith(prefix):
-                limit_config = config
-                break
-
-        if limit_config:
-            if request.user.is_authenticated:
-                key = f"ratelimit:{request.user.id}:{path}"
-                max_requests = limit_config['authenticated']
-            else:
-                ip = request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')[0].strip() or request.META.get('REMOTE_ADDR', '')
-                key = f"ratelimit:{ip}:{path}"
-                max_requests = limit_config['anonymous']
-
-            window = limit_config['window']
-            current = cache.get(key, 0)
-
-            if current >= max_requests:
-                return JsonResponse(
-                    {'error': 'Rate limit exceeded. Please try again later.'},
-                    status=429,
-                )
-
-            cache.set(key, current + 1, window)
-
-        return self.get_response(request)
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        prefix = self.matcher.match(request.path)
+        if prefix is None:
+            return self.get_response(request)
+
+        limit_config = self.RATE_LIMITS[prefix]
+        identity, max_requests = self._identity(request, request.user, limit_config)
+        result = ratelimit.hit(prefix, identity, max_requests, limit_config['window'])
+        if result.allowed:
+            response = self.get_response(request)
+        else:
+            response = self._limited_response(result)
+        return self._add_headers(response, result)
+
+    async def __acall__(self, request):
+        prefix = self.matcher.match(request.path)
+        if prefix is None:
+            return await self.get_response(request)
+
+        limit_config = self.RATE_LIMITS[prefix]
+        identity, max_requests = self._identity(request, await request.auser(), limit_config)
+        result = await ratelimit.ahit(prefix, identity, max_requests, limit_config['window'])
+        if result.allowed:
+            response = await self.get_response(request)
+        else:
+            response = self._limited_response(result)
+        return self._add_headers(response, result)
+
+
+class ReplicaPinMiddleware:
+    """
+    Read-your-writes for PrimaryReplicaRouter.
+
+    A request that writes to the primary sets a short-lived cookie. Later
+    requests carrying it read from the primary until replicas have caught up
+    (``REPLICA_PIN_SECONDS``), so editing a link and then viewing it never
+    shows stale data.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    COOKIE_NAME = 'pin_primary'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pin_seconds = settings.REPLICA_PIN_SECONDS
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def _is_pinned(self, request):
+        try:
+            return float(request.COOKIES.get(self.COOKIE_NAME, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def _finish(self, request, response, token):
+        if routers.end_request(token):
+            response.set_cookie(
+                self.COOKIE_NAME,
+                str(time.time() + self.pin_seconds),
+                max_age=self.pin_seconds,
+                secure=request.is_secure(),
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = routers.begin_request(self._is_pinned(request))
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            routers.end_request(token)
+            raise
+        return self._finish(request, response, token)
+
+    async def __acall__(self, request):
+        token = routers.begin_request(self._is_pinned(request))
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            routers.end_request(token)
+            raise
+        return self._finish(request, response, token)
+
+
+class PendingLinksMiddleware:
+    """Delete the pending-links cookie once signup has claimed its links."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return clear_claimed_links(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return clear_claimed_links(request, await self.get_response(request))
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compress responses of at least COMPRESS_MIN_SIZE bytes: Brotli for JSON
+    when the client accepts it and the "brotli" extra is installed, gzip
+    otherwise. HTML embeds the CSRF token next to reflected input, so it
+    always takes the gzip path with GZipMiddleware's random-length padding
+    against BREACH; Brotli has no header to pad. Streaming responses are
+    gzipped as they go; bodies that are already compressed (gzip exports,
+    ZIPs, images) are passed through.
+    """
+
+    BROTLI_QUALITY = 5
+    BROTLI_TYPES = ('application/json',)
+    PRECOMPRESSED_TYPES = ('application/gzip', 'application/zip', 'image/')
+
+    def process_response(self, request, response):
+        if response.get('Content-Type', '').startswith(self.PRECOMPRESSED_TYPES):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESS_MIN_SIZE:
+            return response
+        if (
+            brotli is None or response.streaming or response.has_header('Content-Encoding')
+            or not response.get('Content-Type', '').startswith(self.BROTLI_TYPES)
+            or not re_accepts_br.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        ):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=self.BROTLI_QUALITY)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        # Same as GZipMiddleware: a compressed body only keeps a weak ETag.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
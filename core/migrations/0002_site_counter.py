@@ -0,0 +1,39 @@
+# Generated by Django 6.1.2 on 2026-10-19 07:17
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def seed_link_counters(apps, schema_editor):
+    Link = apps.get_model('core', 'Link')
+    SiteCounter = apps.get_model('core', 'SiteCounter')
+    db = schema_editor.connection.alias
+    counters = [SiteCounter(name='links:total', value=Link.objects.using(db).count())]
+    per_day = (
+        Link.objects.using(db).annotate(day=TruncDate('created_at'))
+        .values('day').annotate(count=Count('id')).order_by()
+    )
+    for row in per_day:
+        counters.append(SiteCounter(name=f"links:day:{row['day'].isoformat()}", value=row['count']))
+    SiteCounter.objects.using(db).bulk_create(counters)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(seed_link_counters, migrations.RunPython.noop),
+    ]
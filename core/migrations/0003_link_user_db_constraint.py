@@ -0,0 +1,37 @@
+# Generated by Django 6.1.2 on 2026-10-19 07:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class AlterFieldWhenSharded(migrations.AlterField):
+    """
+    Sharded links point at users on the default database, so the foreign
+    key cannot be enforced there. Single-database deployments keep the
+    constraint; only the migration state changes for them.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if settings.LINK_SHARDS:
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if settings.LINK_SHARDS:
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_site_counter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AlterFieldWhenSharded(
+            model_name='link',
+            name='user',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='links', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
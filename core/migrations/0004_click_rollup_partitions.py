@@ -0,0 +1,38 @@
+# Generated by Django 6.1.2 on 2026-10-19 07:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def partition_clicks(apps, schema_editor):
+    # Native partitioning is PostgreSQL-only; elsewhere months stay logical.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from core.partitions import partition_click_table
+    partition_click_table(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_link_user_db_constraint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClickRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('dimension', models.CharField(blank=True, default='', max_length=20)),
+                ('value', models.CharField(blank=True, default='', max_length=2048)),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('visitors', models.PositiveIntegerField(default=0)),
+                ('link', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='core.link')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['link', 'dimension', 'day'], name='core_clickr_link_id_68872d_idx')],
+            },
+        ),
+        migrations.RunPython(partition_clicks, migrations.RunPython.noop),
+    ]
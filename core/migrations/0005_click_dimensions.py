@@ -0,0 +1,42 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+DIMENSION_FIELDS = ['referrer', 'user_agent', 'country', 'city', 'device_type', 'browser', 'os']
+
+
+def _dimension_field():
+    return models.ForeignKey(
+        blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT,
+        related_name='+', to='core.dimension',
+    )
+
+
+# Dimension-encoded clicks in three steps: add the new columns here, fill them
+# in 0006, swap them in for the old ones in 0007. On PostgreSQL, core_click
+# cannot be altered in the transaction that wrote the deferred foreign keys.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_click_rollup_partitions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Dimension',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.PositiveSmallIntegerField()),
+                ('digest', models.BinaryField(max_length=16, unique=True)),
+                ('value', models.TextField()),
+            ],
+        ),
+        *[
+            migrations.AddField(model_name='click', name=f'{field}_ref', field=_dimension_field())
+            for field in DIMENSION_FIELDS
+        ],
+        migrations.AddField(
+            model_name='click',
+            name='ip_digest',
+            field=models.BinaryField(blank=True, max_length=32, null=True),
+        ),
+    ]
@@ -0,0 +1,80 @@
+import hashlib
+
+from django.db import migrations
+
+DIMENSION_KINDS = {
+    'referrer': 1, 'user_agent': 2, 'country': 3, 'city': 4,
+    'device_type': 5, 'browser': 6, 'os': 7,
+}
+BATCH_SIZE = 2000
+
+
+def _digest(field, value):
+    return hashlib.blake2b(f'{DIMENSION_KINDS[field]}:{value}'.encode('utf-8'), digest_size=16).digest()
+
+
+def _dimension_ids(Dimension, db, pairs, known):
+    missing = {_digest(field, value): (field, value) for field, value in pairs if (field, value) not in known}
+    if not missing:
+        return
+    dimensions = Dimension.objects.using(db)
+    dimensions.bulk_create(
+        [Dimension(kind=DIMENSION_KINDS[field], digest=digest, value=value) for digest, (field, value) in missing.items()],
+        ignore_conflicts=True,
+    )
+    for digest, pk in dimensions.filter(digest__in=list(missing)).values_list('digest', 'id'):
+        known[missing[bytes(digest)]] = pk
+
+
+def encode_clicks(apps, schema_editor):
+    """Fill the new id/binary columns from the old text columns in id order."""
+    Click = apps.get_model('core', 'Click')
+    Dimension = apps.get_model('core', 'Dimension')
+    db = schema_editor.connection.alias
+    known = {}
+    last_id = 0
+    while True:
+        batch = list(Click.objects.using(db).filter(id__gt=last_id).order_by('id')[:BATCH_SIZE])
+        if not batch:
+            return
+        _dimension_ids(Dimension, db, {
+            (field, getattr(click, field)) for click in batch for field in DIMENSION_KINDS if getattr(click, field)
+        }, known)
+        for click in batch:
+            for field in DIMENSION_KINDS:
+                value = getattr(click, field)
+                setattr(click, f'{field}_ref_id', known[(field, value)] if value else None)
+            click.ip_digest = bytes.fromhex(click.ip_hash) if click.ip_hash else None
+        Click.objects.using(db).bulk_update(
+            batch, [f'{field}_ref' for field in DIMENSION_KINDS] + ['ip_digest'], batch_size=500,
+        )
+        last_id = batch[-1].id
+
+
+def decode_clicks(apps, schema_editor):
+    Click = apps.get_model('core', 'Click')
+    Dimension = apps.get_model('core', 'Dimension')
+    db = schema_editor.connection.alias
+    values = dict(Dimension.objects.using(db).values_list('id', 'value'))
+    last_id = 0
+    while True:
+        batch = list(Click.objects.using(db).filter(id__gt=last_id).order_by('id')[:BATCH_SIZE])
+        if not batch:
+            return
+        for click in batch:
+            for field in DIMENSION_KINDS:
+                setattr(click, field, values.get(getattr(click, f'{field}_ref_id'), ''))
+            click.ip_hash = bytes(click.ip_digest).hex() if click.ip_digest else ''
+        Click.objects.using(db).bulk_update(batch, list(DIMENSION_KINDS) + ['ip_hash'], batch_size=500)
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_click_dimensions'),
+    ]
+
+    operations = [
+        migrations.RunPython(encode_clicks, decode_clicks),
+    ]
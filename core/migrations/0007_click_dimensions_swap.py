@@ -0,0 +1,20 @@
+from django.db import migrations
+
+DIMENSION_FIELDS = ['referrer', 'user_agent', 'country', 'city', 'device_type', 'browser', 'os']
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_click_dimensions_backfill'),
+    ]
+
+    operations = [
+        *[migrations.RemoveField(model_name='click', name=field) for field in DIMENSION_FIELDS],
+        migrations.RemoveField(model_name='click', name='ip_hash'),
+        *[
+            migrations.RenameField(model_name='click', old_name=f'{field}_ref', new_name=field)
+            for field in DIMENSION_FIELDS
+        ],
+        migrations.RenameField(model_name='click', old_name='ip_digest', new_name='ip_hash'),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.1.2 on 2026-10-19 07:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_click_dimensions_swap'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='click',
+            name='weight',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='link',
+            name='click_sample_rate',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -5,6 +5,8 @@ from django.conf import settings
 from django.db import models
 from django.contrib.sites.models import Site
 
+from . import sharding
+
 
 def get_site_base_url(request=None):
     if request is not None:
@@ -23,10 +25,63 @@ def generate_short_code():
     chars = string.ascii_letters + string.digits
     while True:
         code = ''.join(secrets.choice(chars) for _ in range(7))
-        if not Link.objects.filter(short_code=code).exists():
+        if not Link.objects.for_code(code).filter(short_code=code).exists():
             return code
 
 
+class LinkQuerySet(models.QuerySet):
+    """
+    When sharded, a queryset that has not picked a shard with ``using()``
+    would write to the default database, so ``create`` goes through
+    ``Link.save`` (which places the link) and the bulk helpers refuse.
+    """
+
+    def _check_placed(self, method):
+        if self._db is None and sharding.is_sharded():
+            raise TypeError(f'Link.objects.{method}() cannot pick a shard; use Link.objects.for_code(code).{method}().')
+
+    def create(self, **kwargs):
+        if self._db is None and sharding.is_sharded():
+            link = self.model(**kwargs)
+            link.save(force_insert=True)
+            return link
+        return super().create(**kwargs)
+
+    def get_or_create(self, defaults=None, **kwargs):
+        self._check_placed('get_or_create')
+        return super().get_or_create(defaults, **kwargs)
+
+    def update_or_create(self, defaults=None, create_defaults=None, **kwargs):
+        self._check_placed('update_or_create')
+        return super().update_or_create(defaults, create_defaults, **kwargs)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        self._check_placed('bulk_create')
+        return super().bulk_create(objs, *args, **kwargs)
+
+
+class LinkManager(models.Manager.from_queryset(LinkQuerySet)):
+    def for_code(self, code):
+        """Links on the shard that owns ``code`` (every link when unsharded)."""
+        return self.using(sharding.shard_for_code(code))
+
+    def for_id(self, pk):
+        """Links on the shard that owns id ``pk`` (none if no shard can)."""
+        shard = sharding.shard_for_link_id(pk)
+        if shard is None and sharding.is_sharded():
+            return self.none()
+        return self.using(shard)
+
+
+class ClickManager(models.Manager):
+    def for_link(self, link):
+        link_id = getattr(link, 'pk', link)
+        shard = sharding.shard_for_link_id(link_id)
+        if shard is None and sharding.is_sharded():
+            return self.none()
+        return self.using(shard).filter(link_id=link_id)
+
+
 class Link(models.Model):
     short_code = models.CharField(max_length=10, unique=True, db_index=True, default=generate_short_code)
     custom_slug = models.CharField(max_length=100, unique=True, null=True, blank=True, db_index=True)
@@ -34,13 +89,20 @@ class Link(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.SET_NULL,
         null=True, blank=True, related_name='links', db_index=True,
+        # Users live on the default database; links may live on a shard.
+        db_constraint=False,
     )
     title = models.CharField(max_length=255, blank=True, default='')
     is_active = models.BooleanField(default=True)
     click_count = models.PositiveIntegerField(default=0)
+    # 0 = sample automatically above CLICK_SAMPLING_THRESHOLD, 1 = store every
+    # click, N = store one raw click in N (see core.analytics).
+    click_sample_rate = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = LinkManager()
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -60,18 +122,69 @@ class Link(models.Model):
     def get_display_code(self):
         return self.custom_slug or self.short_code
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Codes as loaded, so a changed slug can be retired (core.snapshot).
+        codes = {instance.__dict__.get('short_code'), instance.__dict__.get('custom_slug')}
+        instance._loaded_codes = codes - {None, ''}
+        return instance
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and sharding.is_sharded():
+            sharding.prepare_new_link(self)
+        super().save(*args, **kwargs)
+
+
+class Dimension(models.Model):
+    """
+    A distinct string referenced by Click rows (see core.dimensions).
+
+    ``digest`` is a 16-byte hash of ``(kind, value)``, which keeps the unique
+    index small however long the value (user agents, referrers) is.
+    """
+    KINDS = {
+        'referrer': 1, 'user_agent': 2, 'country': 3, 'city': 4,
+        'device_type': 5, 'browser': 6, 'os': 7,
+    }
+
+    kind = models.PositiveSmallIntegerField()
+    digest = models.BinaryField(max_length=16, unique=True)
+    value = models.TextField()
+
+    def __str__(self):
+        return self.value
+
+
+def _dimension_field():
+    return models.ForeignKey(
+        Dimension, on_delete=models.PROTECT, null=True, blank=True,
+        related_name='+', db_index=False,
+    )
+
 
 class Click(models.Model):
+    """
+    One redirect. Repeated strings are stored once in Dimension and referenced
+    by id; ``ip_hash`` is the raw 32-byte SHA-256 digest. Use
+    core.dimensions to write clicks and to decode ``values()`` rows.
+
+    A sampled click stands for ``weight`` clicks, so counts are
+    ``Sum('weight')`` rather than ``Count('id')``.
+    """
     link = models.ForeignKey(Link, on_delete=models.CASCADE, related_name='clicks', db_index=True)
     clicked_at = models.DateTimeField(auto_now_add=True, db_index=True)
-    referrer = models.URLField(max_length=2048, blank=True, default='')
-    user_agent = models.TextField(blank=True, default='')
-    country = models.CharField(max_length=100, blank=True, default='')
-    city = models.CharField(max_length=100, blank=True, default='')
-    device_type = models.CharField(max_length=20, blank=True, default='')
-    browser = models.CharField(max_length=50, blank=True, default='')
-    os = models.CharField(max_length=50, blank=True, default='')
-    ip_hash = models.CharField(max_length=64, blank=True, default='')
+    referrer = _dimension_field()
+    user_agent = _dimension_field()
+    country = _dimension_field()
+    city = _dimension_field()
+    device_type = _dimension_field()
+    browser = _dimension_field()
+    os = _dimension_field()
+    ip_hash = models.BinaryField(max_length=32, null=True, blank=True)
+    weight = models.PositiveIntegerField(default=1)
+
+    objects = ClickManager()
 
     class Meta:
         ordering = ['-clicked_at']
@@ -82,6 +195,39 @@ class Click(models.Model):
     def __str__(self):
         return f"Click on {self.link.get_display_code()} at {self.clicked_at}"
 
+    def save(self, *args, **kwargs):
+        if self._state.adding and sharding.is_sharded():
+            sharding.prepare_new_click(self)
+        super().save(*args, **kwargs)
+
+
+class ClickRollup(models.Model):
+    """
+    Daily click counts for one link, kept after its raw clicks are archived.
+
+    ``dimension`` is '' for the day's totals (``visitors`` counts distinct
+    ``ip_hash`` values that day; summing days overcounts returning
+    visitors), otherwise a Click field name with one row per non-empty value.
+    """
+    DIMENSIONS = ['country', 'city', 'device_type', 'browser', 'os', 'referrer']
+
+    link = models.ForeignKey(Link, on_delete=models.CASCADE, related_name='rollups')
+    day = models.DateField()
+    dimension = models.CharField(max_length=20, blank=True, default='')
+    value = models.CharField(max_length=2048, blank=True, default='')
+    clicks = models.PositiveIntegerField(default=0)
+    visitors = models.PositiveIntegerField(default=0)
+
+    objects = ClickManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['link', 'dimension', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.link_id} {self.day} {self.dimension or 'total'}={self.value}: {self.clicks}"
+
 
 class UserProfile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='profile')
@@ -91,3 +237,13 @@ class UserProfile(models.Model):
 
     def __str__(self):
         return f"Profile for {self.user.email}"
+
+
+class SiteCounter(models.Model):
+    """Maintained site-wide counters, read instead of COUNT(*) (see core.counters)."""
+    name = models.CharField(max_length=64, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
@@ -0,0 +1,120 @@
+"""
+Full-page cache for pages that look the same to every anonymous visitor.
+
+``cache_anonymous_page`` serves a view from the cache when the request is a
+GET/HEAD with no session or messages cookie and no Authorization header,
+and its query string is empty or only tracking parameters. Other cookies
+(csrftoken, analytics) cannot change what these views render. Such
+requests get ``request.cacheable_page = True``; base.html then leaves the
+CSRF token out of the page and app.js fetches it from /csrf/ before the
+first htmx POST.
+
+Keys are built from the scheme, host and path, a fingerprint of the
+template files and static manifest (computed once per process, so a deploy
+that changes either one misses the old entries), and a generation counter
+that ``manage.py clear_page_cache`` bumps. Responses always get
+``Vary: Cookie``. Only 200s that set no cookies and vary on nothing else
+are stored.
+"""
+import hashlib
+import os
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.template import engines
+from django.utils.cache import patch_vary_headers
+from django.utils.http import split_header_value
+
+KEY_PREFIX = 'pagecache:'
+GENERATION_KEY = 'pagecache:generation'
+TRACKING_PARAMS = frozenset({'gclid', 'fbclid', 'msclkid', 'ref'})
+STORABLE_VARY = frozenset({'cookie', 'accept-encoding'})
+
+_version = None
+
+
+def template_version():
+    """Fingerprint of every template file and the static manifest."""
+    global _version
+    if _version is None:
+        digest = hashlib.blake2b(digest_size=8)
+        for engine in engines.all():
+            for directory in engine.template_dirs:
+                for root, dirs, files in os.walk(directory):
+                    dirs.sort()
+                    for name in sorted(files):
+                        path = os.path.join(root, name)
+                        st = os.stat(path)
+                        digest.update(f'{path}:{st.st_mtime_ns}:{st.st_size}\n'.encode())
+        read_manifest = getattr(staticfiles_storage, 'read_manifest', None)
+        if read_manifest is not None:
+            digest.update((read_manifest() or '').encode())
+        _version = digest.hexdigest()
+    return _version
+
+
+def clear():
+    """Orphan every cached page; entries expire on their own."""
+    cache.set(GENERATION_KEY, time.time_ns(), None)
+
+
+def _is_tracking(name):
+    return name.startswith('utm_') or name in TRACKING_PARAMS
+
+
+def _cacheable_request(request):
+    if request.method not in ('GET', 'HEAD') or 'HTTP_AUTHORIZATION' in request.META:
+        return False
+    if settings.SESSION_COOKIE_NAME in request.COOKIES or CookieStorage.cookie_name in request.COOKIES:
+        return False
+    return all(_is_tracking(name) for name in request.GET)
+
+
+def _cacheable_response(response):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    cache_control = response.get('Cache-Control', '').lower()
+    if any(word in cache_control for word in ('private', 'no-store', 'no-cache')):
+        return False
+    vary = {header.lower() for header in split_header_value(response.get('Vary', ''))}
+    return vary <= STORABLE_VARY
+
+
+def page_cache_key(request):
+    generation = cache.get(GENERATION_KEY, 0)
+    location = hashlib.blake2b(
+        f'{request.scheme}://{request.get_host()}{request.path}'.encode(), digest_size=16,
+    ).hexdigest()
+    return f'{KEY_PREFIX}{template_version()}:{generation}:{location}'
+
+
+def cache_anonymous_page(view):
+    """Serve ``view`` to anonymous visitors from the page cache (PAGE_CACHE_TIMEOUT)."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        timeout = settings.PAGE_CACHE_TIMEOUT
+        if not timeout or not _cacheable_request(request):
+            response = view(request, *args, **kwargs)
+            patch_vary_headers(response, ['Cookie'])
+            return response
+
+        key = page_cache_key(request)
+        response = cache.get(key)
+        if response is not None:
+            return response
+
+        request.cacheable_page = True
+        response = view(request, *args, **kwargs)
+        patch_vary_headers(response, ['Cookie'])
+        if _cacheable_response(response):
+            if hasattr(response, 'render') and callable(response.render):
+                response.add_post_render_callback(lambda r: cache.set(key, r, timeout))
+            else:
+                cache.set(key, response, timeout)
+        return response
+
+    return wrapper
@@ -0,0 +1,121 @@
+"""
+Monthly range partitions of ``core_click`` on PostgreSQL.
+
+Migration 0004 turns ``core_click`` into a table partitioned by
+``clicked_at``: one ``core_click_YYYYMM`` partition per month, plus a
+default partition for anything outside them. ``manage.py archive_clicks``
+keeps partitions a few months ahead (so the default stays empty) and
+drops whole months once they are archived. On other databases a month is
+only a logical partition: archival deletes its rows by ``clicked_at`` range.
+"""
+from datetime import date, datetime
+
+from django.utils import timezone
+
+CLICK_TABLE = 'core_click'
+MONTHS_AHEAD = 3
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def month_bounds(month):
+    """Aware datetimes ``[start, end)`` covering ``month`` in the default timezone."""
+    tz = timezone.get_default_timezone()
+    return (
+        timezone.make_aware(datetime.combine(month, datetime.min.time()), tz),
+        timezone.make_aware(datetime.combine(next_month(month), datetime.min.time()), tz),
+    )
+
+
+def partition_name(month):
+    return f'{CLICK_TABLE}_{month:%Y%m}'
+
+
+def is_partitioned(connection):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid '
+            'WHERE c.relname = %s AND pg_table_is_visible(c.oid)',
+            [CLICK_TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def create_month_partition(connection, month, parent=CLICK_TABLE):
+    start, end = month_bounds(month)
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {qn(partition_name(month))} '
+            f'PARTITION OF {qn(parent)} FOR VALUES FROM (%s) TO (%s)',
+            [start, end],
+        )
+
+
+def ensure_month_partitions(connection, first_month=None, months_ahead=MONTHS_AHEAD, parent=CLICK_TABLE):
+    """Create monthly partitions from ``first_month`` (default: this month) through ``months_ahead``."""
+    month = first_month or month_start(timezone.localdate())
+    last = month_start(timezone.localdate())
+    for _ in range(months_ahead):
+        last = next_month(last)
+    created = []
+    while month <= last:
+        create_month_partition(connection, month, parent)
+        created.append(month)
+        month = next_month(month)
+    return created
+
+
+def drop_month_partition(connection, month):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {connection.ops.quote_name(partition_name(month))}')
+
+
+def partition_click_table(connection):
+    """
+    Rebuild ``core_click`` as a partitioned table, keeping its rows and ids.
+
+    PostgreSQL requires the partition key in the primary key, so the table's
+    key becomes ``(id, clicked_at)``. Ids still come from one sequence, so
+    ``id`` stays unique and Django keeps treating it as the primary key.
+
+    Foreign keys are checked per statement while copying: with the deferred
+    link FK, the CREATE INDEX after the copy would otherwise fail with
+    "pending trigger events".
+    """
+    qn = connection.ops.quote_name
+    old, new, seq = f'{CLICK_TABLE}_unpartitioned', f'{CLICK_TABLE}_partitioned', f'{CLICK_TABLE}_pk_seq'
+    with connection.cursor() as cursor:
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        cursor.execute('SELECT min(clicked_at) FROM core_click')
+        (oldest,) = cursor.fetchone()
+        cursor.execute(f'ALTER TABLE {qn(CLICK_TABLE)} RENAME TO {qn(old)}')
+        cursor.execute(
+            f'CREATE TABLE {qn(new)} (LIKE {qn(old)} INCLUDING DEFAULTS) PARTITION BY RANGE (clicked_at)'
+        )
+        cursor.execute(f'CREATE SEQUENCE {qn(seq)}')
+        cursor.execute(f'SELECT setval(%s, COALESCE((SELECT max(id) FROM {qn(old)}), 0) + 1, false)', [seq])
+        cursor.execute(f"ALTER TABLE {qn(new)} ALTER COLUMN id SET DEFAULT nextval('{seq}')")
+        cursor.execute(f'ALTER TABLE {qn(new)} ADD PRIMARY KEY (id, clicked_at)')
+        cursor.execute(
+            f'ALTER TABLE {qn(new)} ADD CONSTRAINT core_click_link_id_fk_core_link_id '
+            f'FOREIGN KEY (link_id) REFERENCES core_link (id) DEFERRABLE INITIALLY DEFERRED'
+        )
+        cursor.execute(f'CREATE TABLE {qn(CLICK_TABLE + "_default")} PARTITION OF {qn(new)} DEFAULT')
+        first = month_start(timezone.localtime(oldest).date()) if oldest else None
+        ensure_month_partitions(connection, first, parent=new)
+        cursor.execute(f'INSERT INTO {qn(new)} SELECT * FROM {qn(old)}')
+        cursor.execute(f'DROP TABLE {qn(old)}')
+        cursor.execute(f'ALTER TABLE {qn(new)} RENAME TO {qn(CLICK_TABLE)}')
+        cursor.execute(f'ALTER SEQUENCE {qn(seq)} OWNED BY {qn(CLICK_TABLE)}.id')
+        cursor.execute(f'CREATE INDEX core_click_link_id_351f2a_idx ON {qn(CLICK_TABLE)} (link_id, clicked_at)')
+        cursor.execute(f'CREATE INDEX core_click_clicked_at_idx ON {qn(CLICK_TABLE)} (clicked_at)')
+        cursor.execute('SET CONSTRAINTS ALL DEFERRED')
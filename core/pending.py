@@ -0,0 +1,66 @@
+"""
+Links shortened by anonymous visitors, remembered so they can be claimed on signup.
+
+They are kept in a signed cookie rather than the session, so anonymous
+shortening never creates or writes a database session row. Once claimed,
+PendingLinksMiddleware deletes the cookie.
+"""
+
+PENDING_LINKS_COOKIE = 'pending_links'
+PENDING_LINKS_SALT = 'core.pending_links'
+PENDING_LINKS_MAX = 20
+PENDING_LINKS_MAX_AGE = 60 * 60 * 24 * 30
+
+
+def _parse_ids(values):
+    ids = []
+    for value in values:
+        try:
+            ids.append(int(value))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
+def get_pending_link_ids(request):
+    raw = request.get_signed_cookie(
+        PENDING_LINKS_COOKIE, default='', salt=PENDING_LINKS_SALT, max_age=PENDING_LINKS_MAX_AGE,
+    )
+    return _parse_ids(raw.split(',')) if raw else []
+
+
+def add_pending_link(request, response, link_id):
+    """Remember ``link_id`` on ``response``, keeping only the most recent ids."""
+    ids = [pk for pk in get_pending_link_ids(request) if pk != link_id]
+    ids.append(link_id)
+    response.set_signed_cookie(
+        PENDING_LINKS_COOKIE,
+        ','.join(map(str, ids[-PENDING_LINKS_MAX:])),
+        salt=PENDING_LINKS_SALT,
+        max_age=PENDING_LINKS_MAX_AGE,
+        secure=request.is_secure(),
+        httponly=True,
+        samesite='Lax',
+    )
+
+
+def pop_pending_link_ids(request):
+    """
+    Return the pending ids from the cookie and any left in a legacy session,
+    and mark the cookie for deletion on this request's response.
+    """
+    ids = get_pending_link_ids(request)
+    if PENDING_LINKS_COOKIE in request.COOKIES:
+        request.pending_links_claimed = True
+    session = getattr(request, 'session', None)
+    if session is not None:
+        legacy = session.pop('pending_link_ids', None)
+        if isinstance(legacy, list):
+            ids.extend(_parse_ids(legacy))
+    return ids
+
+
+def clear_claimed_links(request, response):
+    if getattr(request, 'pending_links_claimed', False):
+        response.delete_cookie(PENDING_LINKS_COOKIE, samesite='Lax')
+    return response
@@ -0,0 +1,106 @@
+"""
+CDN purging by surrogate key.
+
+Redirect pages are tagged with ``link_surrogate_key(link_id)`` (see
+core.views) so the edge can cache them; when a link changes or goes away
+its key is purged through CDN_PURGE_BACKEND. Purges run on a background
+thread after the transaction commits, so a slow CDN API never holds up the
+request, and failures are logged, never raised: a missed purge only means
+the edge serves the old page until its TTL runs out.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_backend = None
+_backend_lock = threading.Lock()
+_executor = None
+
+
+def link_surrogate_key(link_id):
+    return f'link-{link_id}'
+
+
+class PurgeBackend:
+    def purge(self, keys):
+        raise NotImplementedError
+
+
+class NullPurgeBackend(PurgeBackend):
+    """No CDN in front of the site."""
+
+    def purge(self, keys):
+        pass
+
+
+class LocMemPurgeBackend(PurgeBackend):
+    """Records purged keys in ``purged`` (for tests and development)."""
+
+    def __init__(self):
+        self.purged = []
+
+    def purge(self, keys):
+        self.purged.extend(keys)
+
+
+class HTTPPurgeBackend(PurgeBackend):
+    """
+    POSTs to CDN_PURGE_URL with the keys in a space-separated
+    ``Surrogate-Key`` header (the Fastly convention; ``manage.py
+    purge_server`` accepts the same requests locally). CDN_PURGE_TOKEN, if
+    set, is sent as ``Fastly-Key``.
+    """
+
+    def __init__(self):
+        self.url = settings.CDN_PURGE_URL
+        self.session = requests.Session()
+        if settings.CDN_PURGE_TOKEN:
+            self.session.headers['Fastly-Key'] = settings.CDN_PURGE_TOKEN
+
+    def purge(self, keys):
+        response = self.session.post(
+            self.url, headers={'Surrogate-Key': ' '.join(keys)}, timeout=settings.CDN_PURGE_TIMEOUT,
+        )
+        response.raise_for_status()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(settings.CDN_PURGE_BACKEND)()
+    return _backend
+
+
+def purge_keys(keys):
+    keys = list(keys)
+    if not keys:
+        return
+    try:
+        get_backend().purge(keys)
+    except Exception:
+        logger.exception('CDN purge failed for %s', ' '.join(keys))
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _backend_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='cdn-purge')
+    return _executor
+
+
+def purge_link(link_id, using=None):
+    """Purge ``link_id``'s cached redirect in the background once the transaction on ``using`` commits."""
+    transaction.on_commit(
+        lambda: _get_executor().submit(purge_keys, [link_surrogate_key(link_id)]), using=using,
+    )
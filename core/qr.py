@@ -0,0 +1,191 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import qrcode
+from django.conf import settings
+from django.core.cache import caches
+from PIL import Image
+from qrcode.image.svg import SvgPathImage
+
+QR_CACHE_ALIAS = 'qr'
+QR_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+QR_CONTENT_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+DEFAULT_FG = '#000000'
+DEFAULT_BG = '#ffffff'
+DEFAULT_BOX_SIZE = 10
+MAX_BOX_SIZE = 40
+# Per API request; larger batches go through `manage.py generate_qr_batch`.
+QR_BATCH_MAX = 100
+
+_web_pool = None
+_web_pool_lock = threading.Lock()
+
+
+def warm_up():
+    """Load Pillow's image plugins up front so the first request doesn't pay for it."""
+    Image.init()
+
+
+def normalize_hex_color(value: str, fallback: str) -> str:
+    color = (value or '').strip().lower()
+    if not color:
+        return fallback
+    if color.startswith('#'):
+        color = color[1:]
+    if len(color) == 3:
+        if all(c in '0123456789abcdef' for c in color):
+            color = ''.join(ch + ch for ch in color)
+        else:
+            return fallback
+    elif len(color) != 6:
+        return fallback
+    elif not all(c in '0123456789abcdef' for c in color):
+        return fallback
+    return f'#{color}'
+
+
+def normalize_box_size(value) -> int:
+    try:
+        box_size = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_BOX_SIZE
+    return min(max(box_size, 1), MAX_BOX_SIZE)
+
+
+def qr_cache_key(url, fg, bg, fmt, box_size):
+    """Content address of a rendered QR code; also used as its strong ETag."""
+    if fmt == 'svg':
+        # SVG output is rendered without colours, so they must not split the cache.
+        fg, bg = DEFAULT_FG, DEFAULT_BG
+    raw = '\x00'.join([url, fg, bg, fmt, str(box_size)])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def render_qr(url, fg=DEFAULT_FG, bg=DEFAULT_BG, fmt='png', box_size=DEFAULT_BOX_SIZE):
+    """Render a QR code and return the encoded PNG or SVG bytes."""
+    qr = qrcode.QRCode(box_size=box_size, border=4)
+    qr.add_data(url)
+    qr.make(fit=True)
+    if fmt == 'svg':
+        img = qr.make_image(image_factory=SvgPathImage)
+    else:
+        img = qr.make_image(fill_color=fg, back_color=bg)
+    buffer = io.BytesIO()
+    img.save(buffer)
+    return buffer.getvalue()
+
+
+def get_qr(url, fg=DEFAULT_FG, bg=DEFAULT_BG, fmt='png', box_size=DEFAULT_BOX_SIZE):
+    """Return ``(key, content)`` from the QR cache, rendering on a miss."""
+    key = qr_cache_key(url, fg, bg, fmt, box_size)
+    cache = caches[QR_CACHE_ALIAS]
+    content = cache.get(key)
+    if content is None:
+        content = render_qr(url, fg, bg, fmt, box_size)
+        cache.set(key, content, QR_CACHE_TIMEOUT)
+    return key, content
+
+
+def render_pool():
+    """
+    A process pool for ``render_many``, or None to render in-process.
+
+    For offline batches (generate_qr_batch); web requests use web_render_pool.
+    """
+    workers = min(settings.QR_RENDER_WORKERS, os.cpu_count() or 1)
+    return ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+
+def web_render_pool():
+    """
+    This web worker's long-lived pool for the batch API, or None to render
+    in the request (QR_WEB_RENDER_WORKERS=0). Its processes are spawned
+    rather than forked, which is safe from a threaded worker, and started
+    up front; gunicorn.conf.py does so before the worker takes requests.
+    """
+    global _web_pool
+    workers = min(settings.QR_WEB_RENDER_WORKERS, os.cpu_count() or 1)
+    if workers < 1:
+        return None
+    with _web_pool_lock:
+        if _web_pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            for future in [pool.submit(warm_up) for _ in range(workers)]:
+                future.result()
+            _web_pool = pool
+    return _web_pool
+
+
+def _render_args(args):
+    return render_qr(*args)
+
+
+def render_many(urls, fg=DEFAULT_FG, bg=DEFAULT_BG, fmt='png', box_size=DEFAULT_BOX_SIZE, pool=None):
+    """
+    Yield the encoded QR code for each of ``urls``, in order.
+
+    Cache hits are served with a single ``get_many``; misses are rendered (on
+    ``pool`` if given, see render_pool) and written back to the QR cache.
+    """
+    cache = caches[QR_CACHE_ALIAS]
+    keys = [qr_cache_key(url, fg, bg, fmt, box_size) for url in urls]
+    cached = cache.get_many(keys)
+    misses = [(url, fg, bg, fmt, box_size) for url, key in zip(urls, keys) if key not in cached]
+    if pool is not None and misses:
+        rendered = iter(pool.map(_render_args, misses, chunksize=8))
+    else:
+        rendered = map(_render_args, misses)
+
+    for key in keys:
+        content = cached.get(key)
+        if content is None:
+            content = next(rendered)
+            cache.set(key, content, QR_CACHE_TIMEOUT)
+            cached[key] = content
+        yield content
+
+
+class _ZipStream(io.RawIOBase):
+    """Unseekable sink that lets ``zipfile`` write an archive incrementally."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def pop(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_qr_zip(items, fg=DEFAULT_FG, bg=DEFAULT_BG, fmt='png', box_size=DEFAULT_BOX_SIZE, pool=None):
+    """Yield a ZIP archive of QR codes for ``items``, a list of ``(name, url)`` pairs."""
+    sink = _ZipStream()
+    # PNGs are already deflated; only SVG text benefits from compression.
+    compression = zipfile.ZIP_DEFLATED if fmt == 'svg' else zipfile.ZIP_STORED
+    with zipfile.ZipFile(sink, 'w', compression=compression) as archive:
+        names = set()
+        for (name, url), content in zip(items, render_many([url for _, url in items], fg, bg, fmt, box_size, pool)):
+            filename = f'{name}.{fmt}'
+            suffix = 1
+            while filename in names:
+                suffix += 1
+                filename = f'{name}-{suffix}.{fmt}'
+            names.add(filename)
+            archive.writestr(filename, content)
+            yield sink.pop()
+    yield sink.pop()
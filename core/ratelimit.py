@@ -0,0 +1,132 @@
+import math
+import re
+import time
+from collections import namedtuple
+
+from django.core.cache import cache
+
+RateLimitResult = namedtuple('RateLimitResult', ['allowed', 'limit', 'remaining', 'reset', 'retry_after'])
+
+
+class PrefixMatcher:
+    """Match a path against a set of prefixes with one precompiled regex."""
+
+    def __init__(self, prefixes):
+        # Longest first so the most specific prefix wins the alternation.
+        self.prefixes = sorted(prefixes, key=len, reverse=True)
+        self.pattern = re.compile('|'.join(
+            f'(?P<p{i}>{re.escape(prefix)})' for i, prefix in enumerate(self.prefixes)
+        )) if self.prefixes else None
+
+    def match(self, path):
+        if self.pattern is None:
+            return None
+        m = self.pattern.match(path)
+        if m is None:
+            return None
+        return self.prefixes[int(m.lastgroup[1:])]
+
+
+def incr_counter(key, timeout):
+    """Increment ``key`` with the cache's ``incr``, creating it with ``timeout`` if missing."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout):
+            return 1
+        return cache.incr(key)
+
+
+async def aincr_counter(key, timeout):
+    try:
+        return await cache.aincr(key)
+    except ValueError:
+        if await cache.aadd(key, 1, timeout):
+            return 1
+        return await cache.aincr(key)
+
+
+def _uncount(key):
+    try:
+        cache.decr(key)
+    except ValueError:  # the window expired in between
+        pass
+
+
+async def _auncount(key):
+    try:
+        await cache.adecr(key)
+    except ValueError:
+        pass
+
+
+def _window(bucket, identity, window, now):
+    now = time.time() if now is None else now
+    index, offset = divmod(now, window)
+    index = int(index)
+    prefix = f'ratelimit:{bucket}:{identity}'
+    return f'{prefix}:{index}', f'{prefix}:{index - 1}', offset
+
+
+def _result(current, previous, offset, limit, window):
+    weight = 1 - offset / window
+    estimate = previous * weight + current
+    allowed = estimate <= limit
+    reset = max(1, math.ceil(window - offset))
+
+    retry_after = 0
+    if not allowed:
+        if current > limit or not previous:
+            retry_after = reset
+        else:
+            # Seconds until the decaying share of the previous window makes room.
+            retry_after = math.ceil((estimate - limit) / previous * window)
+            retry_after = min(max(1, retry_after), reset)
+
+    return RateLimitResult(
+        allowed=allowed,
+        limit=limit,
+        remaining=max(0, limit - math.ceil(estimate)),
+        reset=reset,
+        retry_after=retry_after,
+    )
+
+
+def hit(bucket, identity, limit, window, now=None):
+    """
+    Count one request against a sliding window and report whether it is allowed.
+
+    Uses the sliding-window counter approximation: one counter per fixed window,
+    with the previous window's count weighted by how much of it still overlaps
+    the sliding window. Only allowed requests stay counted, so a client that
+    keeps retrying while limited gets back in as the window slides.
+
+    The current counter is bumped with the cache's ``incr``. That is atomic on
+    Redis and locmem, so concurrent requests cannot overshoot ``limit``;
+    DatabaseCache implements it as get + set, so there bursts can slip a few
+    requests past the limit.
+    """
+    current_key, previous_key, offset = _window(bucket, identity, window, now)
+    current = incr_counter(current_key, window * 2)
+    previous = cache.get(previous_key, 0) if current <= limit else 0
+    result = _result(current, previous, offset, limit, window)
+    if not result.allowed:
+        _uncount(current_key)
+    return result
+
+
+def peek(bucket, identity, limit, window, now=None):
+    """What ``hit`` would report for one more request, without counting it."""
+    current_key, previous_key, offset = _window(bucket, identity, window, now)
+    counts = cache.get_many([current_key, previous_key])
+    return _result(counts.get(current_key, 0) + 1, counts.get(previous_key, 0), offset, limit, window)
+
+
+async def ahit(bucket, identity, limit, window, now=None):
+    current_key, previous_key, offset = _window(bucket, identity, window, now)
+    current = await aincr_counter(current_key, window * 2)
+    previous = await cache.aget(previous_key, 0) if current <= limit else 0
+    result = _result(current, previous, offset, limit, window)
+    if not result.allowed:
+        await _auncount(current_key)
+    return result
@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+from . import sharding, snapshot
+from .models import Link
+from .routers import PRIMARY_DB
+
+RESOLVE_CACHE_PREFIX = 'resolve:'
+
+
+def resolve_cache_key(code):
+    return f'{RESOLVE_CACHE_PREFIX}{code}'
+
+
+def link_entry(link):
+    """The resolver's ``{'id', 'original_url', 'click_sample_rate'}`` for a Link."""
+    return {'id': link.pk, 'original_url': link.original_url, 'click_sample_rate': link.click_sample_rate}
+
+
+def _active_link(code, primary=False):
+    # Cache fills read the primary: a miss or old URL read from a lagging
+    # replica would otherwise be served for the whole cache timeout.
+    db = sharding.shard_for_code(code) or (PRIMARY_DB if primary else None)
+    return (
+        Link.objects.using(db)
+        .filter(Q(short_code=code) | Q(custom_slug=code), is_active=True)
+        .values('id', 'original_url', 'click_sample_rate')
+    )
+
+
+def resolve_link(code):
+    """
+    Return ``{'id', 'original_url', 'click_sample_rate'}`` for an active short
+    code or slug, or None. Checks the shared snapshot (core.snapshot), then
+    the resolve cache, before the database; the cache is only filled from
+    the primary.
+    """
+    link = snapshot.lookup(code)
+    if link is not snapshot.MISS:
+        return link
+    if not settings.LINK_RESOLVE_CACHE_TIMEOUT:
+        return _active_link(code).first()
+    key = resolve_cache_key(code)
+    link = cache.get(key)
+    if link is None:
+        # Unknown codes are cached too ({}), so scans don't reach the database.
+        link = _active_link(code, primary=True).first() or {}
+        cache.set(key, link, settings.LINK_RESOLVE_CACHE_TIMEOUT)
+    return link or None
+
+
+async def aresolve_link(code):
+    link = await snapshot.alookup(code)
+    if link is not snapshot.MISS:
+        return link
+    if not settings.LINK_RESOLVE_CACHE_TIMEOUT:
+        return await _active_link(code).afirst()
+    key = resolve_cache_key(code)
+    link = await cache.aget(key)
+    if link is None:
+        link = await _active_link(code, primary=True).afirst() or {}
+        await cache.aset(key, link, settings.LINK_RESOLVE_CACHE_TIMEOUT)
+    return link or None
+
+
+def forget_link(link, using=None):
+    """Drop ``link``'s codes (current and as loaded) from the resolve cache after commit."""
+    codes = {link.short_code, link.custom_slug} | getattr(link, '_loaded_codes', set())
+    keys = [resolve_cache_key(code) for code in codes - {None, ''}]
+    transaction.on_commit(lambda: cache.delete_many(keys), using=using)
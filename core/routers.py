@@ -0,0 +1,133 @@
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from . import sharding
+
+REPLICA_DB = 'replica'
+PRIMARY_DB = 'default'
+
+# Apps whose tables must never be read from a lagging replica.
+PRIMARY_ONLY_APPS = {'django_cache'}
+
+# Per-request routing state, installed by ReplicaPinMiddleware. It is a
+# mutable dict so writes made in sync_to_async threads are still seen.
+_routing_state = ContextVar('db_routing_state', default=None)
+
+
+def begin_request(pinned):
+    return _routing_state.set({'pinned': pinned, 'wrote': False, 'replica': False})
+
+
+def end_request(token):
+    state = _routing_state.get()
+    _routing_state.reset(token)
+    return bool(state and state['wrote'])
+
+
+def pin_primary():
+    """Send the rest of this request's reads to the primary."""
+    state = _routing_state.get()
+    if state is not None:
+        state['pinned'] = True
+
+
+def allow_replica():
+    """Let the rest of this request's reads go to the replica."""
+    state = _routing_state.get()
+    if state is not None:
+        state['replica'] = True
+
+
+def replica_reads(view):
+    """Send ``view``'s reads to the replica; for redirects and analytics, which tolerate a little lag."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            allow_replica()
+            return await view(request, *args, **kwargs)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        allow_replica()
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    """
+    Route reads of ``replica_reads`` views to the ``replica`` alias; all
+    other reads and every write go to ``default``.
+
+    Even those reads stay on the primary when the request is pinned (see
+    ReplicaPinMiddleware), after the request has written anything, inside
+    a transaction on the primary, and outside requests altogether
+    (management commands, background writers).
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return PRIMARY_DB
+        state = _routing_state.get()
+        if state is None or not state['replica'] or state['pinned'] or state['wrote']:
+            return PRIMARY_DB
+        if connections[PRIMARY_DB].in_atomic_block:
+            return PRIMARY_DB
+        return REPLICA_DB
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            state['wrote'] = True
+        return PRIMARY_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY_DB
+
+
+class LinkShardRouter:
+    """
+    Keep links, clicks and click rollups on their shard (see core.sharding).
+
+    Querysets for those models name their shard with ``using()``; this router
+    places new instances and follows instance hints for everything else.
+    Shards get the full schema, so migrations apply to them unchanged.
+    """
+
+    SHARDED_MODELS = {'core.link', 'core.click', 'core.clickrollup'}
+
+    def _shard(self, model, hints):
+        instance = hints.get('instance')
+        if instance is None or model._meta.label_lower not in self.SHARDED_MODELS:
+            return None
+        link_id = getattr(instance, 'link_id', None) or instance.pk
+        if link_id is None:
+            return sharding.shard_for_code(instance.get_display_code())
+        return sharding.shard_for_link_id(link_id)
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Links on a shard still point at users on the default database.
+        labels = {obj1._meta.label_lower, obj2._meta.label_lower}
+        if labels & self.SHARDED_MODELS:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.LINK_SHARDS:
+            return True
+        return None
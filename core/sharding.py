@@ -0,0 +1,219 @@
+"""
+Optional hash sharding of links and clicks across ``settings.LINK_SHARDS``.
+
+A link lives on the shard picked by hashing its display code (custom slug or
+short code). Links with a slug get a short code that hashes to the same
+shard, so either code resolves with exactly one query. Link ids encode
+their shard (``id % MAX_SHARDS``), so pk lookups are single-shard too.
+Clicks live on their link's shard. Click ids come from blocks reserved on
+the default database, so they stay unique across shards.
+
+When no shards are configured, every helper here falls back to the plain
+single-database behaviour (an alias of ``None`` means "let the routers
+decide").
+"""
+import hashlib
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from operator import attrgetter, itemgetter
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+MAX_SHARDS = 1024
+LINK_ID_BLOCK = 100
+CLICK_ID_BLOCK = 1000
+
+_fan_out_pool = None
+_id_blocks = {}
+_id_lock = threading.Lock()
+
+
+def is_sharded():
+    return bool(settings.LINK_SHARDS)
+
+
+def shard_aliases():
+    return list(settings.LINK_SHARDS)
+
+
+def shard_for_code(code):
+    shards = settings.LINK_SHARDS
+    if not shards:
+        return None
+    digest = hashlib.blake2b(code.encode('utf-8'), digest_size=8).digest()
+    return shards[int.from_bytes(digest, 'big') % len(shards)]
+
+
+def shard_for_link_id(pk):
+    """
+    The shard holding link ``pk``; None when unsharded, or when sharded and
+    ``pk`` names a slot with no configured shard (no such link exists).
+    """
+    shards = settings.LINK_SHARDS
+    if not shards or pk is None:
+        return None
+    slot = int(pk) % MAX_SHARDS
+    return shards[slot] if slot < len(shards) else None
+
+
+def code_fits_link(code, link_id):
+    """Whether ``code`` hashes to the shard the link already lives on."""
+    return shard_for_code(code) == shard_for_link_id(link_id)
+
+
+def group_link_ids(ids):
+    """Map each shard alias to the link ids stored on it; ids no shard can hold are left out."""
+    sharded = is_sharded()
+    groups = {}
+    for pk in ids:
+        shard = shard_for_link_id(pk)
+        if shard is None and sharded:
+            continue
+        groups.setdefault(shard, []).append(pk)
+    return groups
+
+
+def links_in_bulk(ids, **filters):
+    """``{pk: link}`` for ``ids``, querying only the shards that hold them."""
+    from .models import Link
+
+    groups = group_link_ids(ids)
+    if not groups:
+        return {}
+    found = {}
+    for part in fan_out(
+        lambda db: Link.objects.using(db).filter(pk__in=groups[db], **filters).in_bulk(),
+        aliases=list(groups),
+    ):
+        found.update(part)
+    return found
+
+
+# -- id allocation --
+
+def _allocate_block(name, size):
+    from .models import SiteCounter
+
+    counters = SiteCounter.objects.using('default')
+    counters.get_or_create(name=name)
+    with transaction.atomic(using='default'):
+        # Update before reading so the row lock is taken first on every backend.
+        counters.filter(name=name).update(value=F('value') + size)
+        end = counters.get(name=name).value
+    return end - size + 1, end + 1
+
+
+def allocate_id(name, block_size):
+    """Next id from a per-process block reserved from the ``name`` counter."""
+    with _id_lock:
+        start, end = _id_blocks.get(name, (0, 0))
+        if start >= end:
+            start, end = _allocate_block(f'ids:{name}', block_size)
+        _id_blocks[name] = (start + 1, end)
+        return start
+
+
+def prepare_new_link(link):
+    """Place an unsaved link on its shard: align its short code and assign its id."""
+    from .models import generate_short_code
+
+    shard = shard_for_code(link.get_display_code())
+    if link.custom_slug:
+        while shard_for_code(link.short_code) != shard:
+            link.short_code = generate_short_code()
+    if link.pk is None:
+        index = settings.LINK_SHARDS.index(shard)
+        link.pk = allocate_id('link', LINK_ID_BLOCK) * MAX_SHARDS + index
+
+
+def prepare_new_click(click):
+    if click.pk is None:
+        click.pk = allocate_id('click', CLICK_ID_BLOCK)
+
+
+# -- fan-out --
+
+def _get_fan_out_pool():
+    global _fan_out_pool
+    if _fan_out_pool is None:
+        _fan_out_pool = ThreadPoolExecutor(
+            max_workers=max(1, len(settings.LINK_SHARDS)), thread_name_prefix='shard-fan-out',
+        )
+    return _fan_out_pool
+
+
+def _run_on_shard(fn, alias):
+    try:
+        return fn(alias)
+    finally:
+        close_old_connections()
+
+
+def fan_out(fn, aliases=None):
+    """Call ``fn(alias)`` for every shard in parallel and return the results in shard order."""
+    if not is_sharded():
+        return [fn(None)]
+    aliases = settings.LINK_SHARDS if aliases is None else aliases
+    if len(aliases) == 1:
+        return [fn(aliases[0])]
+    return list(_get_fan_out_pool().map(lambda alias: _run_on_shard(fn, alias), aliases))
+
+
+def sharded_queryset(build, ordering, values=False):
+    """
+    ``build(alias)`` on one database, or merged across all shards.
+
+    Unsharded, this is just the queryset. Sharded, it is a MergedResults,
+    which supports the ``count()``/slicing/iteration that pagination and
+    exports use. Pass ``values=True`` when ``build`` returns a ``values()``
+    queryset (which must include ``id`` and the ordering field).
+    """
+    if not is_sharded():
+        return build(None).order_by(ordering)
+    return MergedResults(build, ordering, values)
+
+
+class MergedResults:
+    """Read-only view over one query run on every shard and merged by ``ordering``."""
+
+    ordered = True
+
+    def __init__(self, build, ordering, values=False):
+        self.build = build
+        self.ordering = ordering
+        self.descending = ordering.startswith('-')
+        field = ordering.lstrip('-')
+        self._key = itemgetter(field, 'id') if values else attrgetter(field, 'pk')
+        self._order_by = (ordering, '-pk' if self.descending else 'pk')
+        self._count = None
+
+    def _queryset(self, alias):
+        return self.build(alias).order_by(*self._order_by)
+
+    def count(self):
+        if self._count is None:
+            self._count = sum(fan_out(lambda alias: self.build(alias).count()))
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return heapq.merge(
+            *(self._queryset(alias).iterator() for alias in settings.LINK_SHARDS),
+            key=self._key, reverse=self.descending,
+        )
+
+    def __getitem__(self, k):
+        if isinstance(k, int):
+            return self[k:k + 1][0]
+        start = k.start or 0
+        stop = k.stop if k.stop is not None else self.count()
+        # Every shard contributes at most ``stop`` rows to the merged prefix.
+        parts = fan_out(lambda alias: list(self._queryset(alias)[:stop]))
+        merged = heapq.merge(*parts, key=self._key, reverse=self.descending)
+        return list(islice(merged, start, stop))
@@ -1,7 +1,46 @@
 from allauth.account.signals import user_signed_up
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from . import counters, purge, resolver, sharding, snapshot
 from .models import Link
+from .pending import pop_pending_link_ids
+
+
+@receiver(post_save, sender=Link)
+def count_created_link(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.record_links_created(instance.created_at)
+
+
+@receiver(post_delete, sender=Link)
+def count_deleted_link(sender, instance, **kwargs):
+    counters.record_links_deleted(instance.created_at)
+
+
+@receiver(post_save, sender=Link)
+def purge_changed_link(sender, instance, created, raw=False, using=None, **kwargs):
+    # New links were never cached; edits and deactivation change the redirect.
+    if not created and not raw:
+        purge.purge_link(instance.pk, using=using)
+
+
+@receiver(post_delete, sender=Link)
+def purge_deleted_link(sender, instance, using=None, **kwargs):
+    purge.purge_link(instance.pk, using=using)
+
+
+@receiver(post_save, sender=Link)
+def update_snapshot_overlay(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        snapshot.record_link(instance, using=using)
+        resolver.forget_link(instance, using=using)
+
+
+@receiver(post_delete, sender=Link)
+def retire_snapshot_codes(sender, instance, using=None, **kwargs):
+    snapshot.record_link(instance, using=using, deleted=True)
+    resolver.forget_link(instance, using=using)
 
 
 @receiver(user_signed_up)
@@ -9,23 +48,12 @@ def claim_pending_links(request, user, **kwargs):
     if request is None:
         return
 
-    pending_link_ids = request.session.get('pending_link_ids', [])
-    request.session.pop('pending_link_ids', None)
-
-    if not isinstance(pending_link_ids, list):
-        return
-
-    valid_ids = []
-    for link_id in pending_link_ids:
-        try:
-            valid_ids.append(int(link_id))
-        except (TypeError, ValueError):
-            continue
-
+    valid_ids = pop_pending_link_ids(request)
     if not valid_ids:
         return
 
-    Link.objects.filter(
-        id__in=valid_ids,
-        user__isnull=True,
-    ).update(user=user)
+    for db, ids in sharding.group_link_ids(valid_ids).items():
+        Link.objects.using(db).filter(
+            id__in=ids,
+            user__isnull=True,
+        ).update(user=user)
@@ -0,0 +1,319 @@
+"""
+Immutable code -> link snapshot shared by all workers through mmap.
+
+The snapshot holds every active link's codes and lives at LINK_SNAPSHOT_PATH.
+Every worker maps the same file, so the table lives once in the page cache
+however many processes read it, and lookups need no database. Links saved
+or deleted since the last build are kept in a small overlay in the shared
+cache (written after commit by core.signals); an overlay entry is either
+the link or a tombstone for a code that no longer redirects.
+
+The overlay is what keeps a stale snapshot from resurrecting a disabled
+link, so the snapshot is only used with a shared cache and only while it
+can be trusted:
+
+- it is younger than LINK_SNAPSHOT_DELTA_TIMEOUT, so every overlay entry
+  written since it was built is still alive;
+- its build marker is in the cache, so the cache was not flushed or
+  restarted since (the marker is read on every lookup and stays hot).
+
+Anything else is a MISS and resolves from the database. Workers rebuild
+the file in the background when it is missing or older than
+LINK_SNAPSHOT_MAX_AGE, one process per host at a time; ``manage.py
+build_link_snapshot`` does the same on demand.
+
+File layout (little-endian), entries sorted by code::
+
+    header          MAGIC, count n, built_at (unix seconds)
+    code_offsets    uint64[n + 1] into the code blob
+    link_ids        uint64[n]
+    url_offsets     uint64[n + 1] into the URL blob
+    sample_rates    uint32[n]
+    code blob, URL blob (UTF-8)
+
+Each URL is stored once per entry; a link with a custom slug has two
+entries.
+"""
+import hashlib
+import logging
+import mmap
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+
+from . import sharding
+from .cache import is_shared
+from .models import Link
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'FURLSNP1'
+HEADER = struct.Struct('<8sQQ')
+OVERLAY_PREFIX = 'linksnap:'
+MARKER_PREFIX = 'linksnap-built:'
+REBUILD_LOCK_PREFIX = 'linksnap-rebuild:'
+REBUILD_LOCK_TIMEOUT = 600
+GONE = {}
+
+# Returned by lookup() when neither the overlay nor the snapshot knows a code.
+MISS = object()
+
+
+def is_enabled():
+    # Without a shared cache, other workers never see the overlay (core.checks).
+    return bool(settings.LINK_SNAPSHOT_PATH) and is_shared()
+
+
+def _marker_key(built_at):
+    return f'{MARKER_PREFIX}{int(built_at)}'
+
+
+# -- building --
+
+def _little_endian(values):
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_snapshot(path, links, built_at=None):
+    """
+    Write ``links`` (``(id, short_code, custom_slug, original_url,
+    click_sample_rate)`` rows) to ``path`` atomically. Returns the entry count.
+    """
+    entries = []
+    for link_id, short_code, custom_slug, url, sample_rate in links:
+        url = url.encode('utf-8')
+        for code in (short_code, custom_slug):
+            if code:
+                entries.append((code.encode('utf-8'), link_id, url, sample_rate))
+    entries.sort(key=lambda entry: entry[0])
+
+    code_offsets = array('Q', [0])
+    url_offsets = array('Q', [0])
+    for code, _, url, _ in entries:
+        code_offsets.append(code_offsets[-1] + len(code))
+        url_offsets.append(url_offsets[-1] + len(url))
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, len(entries), int(built_at or time.time())))
+        out.write(_little_endian(code_offsets))
+        out.write(_little_endian(array('Q', [entry[1] for entry in entries])))
+        out.write(_little_endian(url_offsets))
+        out.write(_little_endian(array('I', [entry[3] for entry in entries])))
+        for entry in entries:
+            out.write(entry[0])
+        for entry in entries:
+            out.write(entry[2])
+        out.flush()
+        os.fsync(out.fileno())
+    os.replace(tmp_path, path)
+    return len(entries)
+
+
+def build_snapshot(path=None):
+    """Rebuild the snapshot from the database and publish it. Returns the entry count."""
+    path = path or settings.LINK_SNAPSHOT_PATH
+    # Taken before reading: links changed during the read keep their overlay entries.
+    built_at = int(time.time())
+    cache.set(_marker_key(built_at), True, settings.LINK_SNAPSHOT_DELTA_TIMEOUT)
+    return write_snapshot(path, active_links(), built_at)
+
+
+def active_links():
+    """Rows for write_snapshot from every shard."""
+    def shard_links(db):
+        return list(
+            Link.objects.using(db).filter(is_active=True)
+            .values_list('id', 'short_code', 'custom_slug', 'original_url', 'click_sample_rate')
+            .iterator(chunk_size=5000)
+        )
+
+    for rows in sharding.fan_out(shard_links):
+        yield from rows
+
+
+# -- reading --
+
+class Snapshot:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n, self.built_at = HEADER.unpack_from(self.mm)
+        if magic != MAGIC or sys.byteorder != 'little':
+            raise ValueError(f'{path} is not a link snapshot readable on this host')
+        self.count = n
+        view = memoryview(self.mm)
+        pos = HEADER.size
+
+        def take(typecode, length):
+            nonlocal pos
+            size = array(typecode).itemsize * length
+            section = view[pos:pos + size].cast(typecode)
+            pos += size
+            return section
+
+        self.code_offsets = take('Q', n + 1)
+        self.link_ids = take('Q', n)
+        self.url_offsets = take('Q', n + 1)
+        self.sample_rates = take('I', n)
+        self.codes_start = pos
+        self.urls_start = pos + self.code_offsets[n]
+
+    def _code(self, i):
+        start = self.codes_start
+        return self.mm[start + self.code_offsets[i]:start + self.code_offsets[i + 1]]
+
+    def lookup(self, code):
+        key = code.encode('utf-8')
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._code(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == self.count or self._code(lo) != key:
+            return None
+        start = self.urls_start
+        return {
+            'id': self.link_ids[lo],
+            'original_url': self.mm[start + self.url_offsets[lo]:start + self.url_offsets[lo + 1]].decode('utf-8'),
+            'click_sample_rate': self.sample_rates[lo],
+        }
+
+
+_lock = threading.Lock()
+_snapshot = None
+_loaded = (None, None)  # (path, (inode, mtime)) of _snapshot
+_next_check = 0.0
+
+
+def get_snapshot():
+    """This process's mapping of the current snapshot file, or None."""
+    global _snapshot, _loaded, _next_check
+    path = settings.LINK_SNAPSHOT_PATH
+    if not path:
+        return None
+    now = time.monotonic()
+    if _loaded[0] == path and now < _next_check:
+        return _snapshot
+    with _lock:
+        if _loaded[0] == path and now < _next_check:
+            return _snapshot
+        _next_check = now + settings.LINK_SNAPSHOT_CHECK_INTERVAL
+        try:
+            st = os.stat(path)
+            version = (st.st_ino, st.st_mtime_ns)
+            if _loaded != (path, version):
+                # The old mapping is unmapped once no lookup still uses it.
+                _snapshot = Snapshot(path)
+                _loaded = (path, version)
+        except (OSError, ValueError):
+            if _loaded[0] != path:
+                _snapshot = None
+                _loaded = (path, None)
+        if is_enabled() and (_snapshot is None or time.time() - _snapshot.built_at > settings.LINK_SNAPSHOT_MAX_AGE):
+            _start_rebuild(path)
+    return _snapshot
+
+
+def _start_rebuild(path):
+    """Rebuild ``path`` in a background thread unless another process on this host is."""
+    lock_key = f'{REBUILD_LOCK_PREFIX}{socket.gethostname()}:{hashlib.blake2b(path.encode(), digest_size=8).hexdigest()}'
+    # Never released early: after a failure the next attempt waits for the timeout.
+    if not cache.add(lock_key, True, REBUILD_LOCK_TIMEOUT):
+        return
+
+    def rebuild():
+        try:
+            count = build_snapshot(path)
+            logger.info('Rebuilt link snapshot %s with %d codes', path, count)
+        except Exception:
+            logger.exception('Rebuilding link snapshot %s failed', path)
+        finally:
+            close_old_connections()
+
+    threading.Thread(target=rebuild, name='link-snapshot-rebuild', daemon=True).start()
+
+
+# -- overlay --
+
+def _overlay_key(code):
+    return f'{OVERLAY_PREFIX}{code}'
+
+
+def _from_overlay(value):
+    if value is None:
+        return MISS
+    return value or None
+
+
+def _keys(snapshot, code):
+    keys = [_overlay_key(code)]
+    if snapshot is not None:
+        keys.append(_marker_key(snapshot.built_at))
+    return keys
+
+
+def _resolve(snapshot, code, found):
+    link = _from_overlay(found.get(_overlay_key(code)))
+    if link is not MISS:
+        return link
+    if (
+        snapshot is None
+        or _marker_key(snapshot.built_at) not in found
+        or time.time() - snapshot.built_at >= settings.LINK_SNAPSHOT_DELTA_TIMEOUT
+    ):
+        # Overlay entries for changes since the build may be gone.
+        return MISS
+    link = snapshot.lookup(code)
+    return MISS if link is None else link
+
+
+def lookup(code):
+    """
+    ``{'id', 'original_url', 'click_sample_rate'}`` for an active code, None
+    for a code known to be gone, or MISS when only the database can tell.
+    """
+    if not is_enabled():
+        return MISS
+    snapshot = get_snapshot()
+    return _resolve(snapshot, code, cache.get_many(_keys(snapshot, code)))
+
+
+async def alookup(code):
+    if not is_enabled():
+        return MISS
+    snapshot = get_snapshot()
+    return _resolve(snapshot, code, await cache.aget_many(_keys(snapshot, code)))
+
+
+def _write_overlay(entries):
+    cache.set_many(
+        {_overlay_key(code): value for code, value in entries.items()},
+        settings.LINK_SNAPSHOT_DELTA_TIMEOUT,
+    )
+
+
+def record_link(link, using=None, deleted=False):
+    """Put ``link``'s current state in the overlay once the transaction commits."""
+    if not is_enabled():
+        return
+    current = {link.short_code, link.custom_slug} - {None, ''}
+    value = GONE if deleted or not link.is_active else {
+        'id': link.pk, 'original_url': link.original_url, 'click_sample_rate': link.click_sample_rate,
+    }
+    entries = {code: value for code in current}
+    # Codes the link no longer has (a changed or cleared slug).
+    entries.update((code, GONE) for code in getattr(link, '_loaded_codes', set()) - current)
+    transaction.on_commit(lambda: _write_overlay(entries), using=using)
@@ -0,0 +1,22 @@
+from .cache import aget_or_compute, get_or_compute
+from .counters import read_link_counts
+
+SITE_STATS_KEY = 'site_stats'
+SITE_STATS_TIMEOUT = 300
+
+
+def compute_site_stats():
+    total_links, links_today = read_link_counts()
+    return {
+        'total_links': total_links,
+        'links_today': links_today,
+    }
+
+
+def get_site_stats():
+    """Site-wide link counts, shared by templates and the public stats API."""
+    return get_or_compute(SITE_STATS_KEY, compute_site_stats, SITE_STATS_TIMEOUT)
+
+
+async def aget_site_stats():
+    return await aget_or_compute(SITE_STATS_KEY, compute_site_stats, SITE_STATS_TIMEOUT)
@@ -0,0 +1,26 @@
+# Templates use {% static %}; the manifest storage only works after collectstatic.
+PLAIN_STATIC_STORAGES = {
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+def add_database(testcase, alias, *models):
+    """
+    Open an extra in-memory SQLite ``alias`` with tables for ``models`` for
+    the rest of ``testcase``. It is created on the fly, so tests may query it
+    without listing it in ``databases``, and it is not wrapped in the test's
+    transaction.
+    """
+    from django.db import connections
+
+    primary = connections['default']
+    connections[alias] = type(primary)({**primary.settings_dict, 'NAME': ':memory:'}, alias)
+
+    def drop():
+        connections[alias].close()
+        del connections[alias]
+
+    testcase.addCleanup(drop)
+    with connections[alias].schema_editor() as editor:
+        for model in models:
+            editor.create_model(model)
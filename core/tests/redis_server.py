@@ -0,0 +1,159 @@
+"""
+In-process stand-in for a Redis server, enough for Django's RedisCache.
+
+Speaks RESP2 (clients need ``protocol=2``) and implements the commands
+RedisCache and redis-py's connection setup send: GET/SET/MGET/MSET/DEL/
+EXISTS/INCRBY/EXPIRE/PERSIST/FLUSHDB and MULTI/EXEC pipelines.
+"""
+import socketserver
+import threading
+import time
+
+
+class RedisState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}  # key -> (value, expires_at or None)
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.time():
+            del self.data[key]
+            return None
+        return entry
+
+    def run(self, name, args):
+        with self.lock:
+            return getattr(self, f'cmd_{name}', self.cmd_unknown)(*args)
+
+    def cmd_unknown(self, *args):
+        return Exception('ERR unknown command')
+
+    def cmd_ping(self):
+        return 'PONG'
+
+    def cmd_client(self, *args):
+        return 'OK'
+
+    def cmd_select(self, db):
+        return 'OK'
+
+    def cmd_get(self, key):
+        entry = self._live(key)
+        return None if entry is None else entry[0]
+
+    def cmd_mget(self, *keys):
+        return [self.cmd_get(key) for key in keys]
+
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        entry = self._live(key)
+        if b'NX' in options and entry is not None or b'XX' in options and entry is None:
+            return None
+        expires = None
+        if b'EX' in options:
+            expires = time.time() + int(options[options.index(b'EX') + 1])
+        elif b'PX' in options:
+            expires = time.time() + int(options[options.index(b'PX') + 1]) / 1000
+        self.data[key] = (value, expires)
+        return 'OK'
+
+    def cmd_mset(self, *pairs):
+        for key, value in zip(pairs[::2], pairs[1::2]):
+            self.data[key] = (value, None)
+        return 'OK'
+
+    def cmd_del(self, *keys):
+        return sum(self._live(key) is not None and self.data.pop(key) is not None for key in keys)
+
+    def cmd_exists(self, *keys):
+        return sum(self._live(key) is not None for key in keys)
+
+    def cmd_incrby(self, key, delta):
+        entry = self._live(key)
+        value = int(entry[0] if entry else 0) + int(delta)
+        self.data[key] = (str(value).encode(), entry[1] if entry else None)
+        return value
+
+    def cmd_expire(self, key, seconds):
+        entry = self._live(key)
+        if entry is None:
+            return 0
+        if int(seconds) <= 0:
+            del self.data[key]
+        else:
+            self.data[key] = (entry[0], time.time() + int(seconds))
+        return 1
+
+    def cmd_persist(self, key):
+        entry = self._live(key)
+        if entry is None or entry[1] is None:
+            return 0
+        self.data[key] = (entry[0], None)
+        return 1
+
+    def cmd_flushdb(self, *args):
+        self.data.clear()
+        return 'OK'
+
+
+class RedisHandler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def encode(self, reply):
+        if reply is None:
+            return b'$-1\r\n'
+        if isinstance(reply, Exception):
+            return f'-{reply}\r\n'.encode()
+        if isinstance(reply, str):
+            return f'+{reply}\r\n'.encode()
+        if isinstance(reply, int):
+            return f':{reply}\r\n'.encode()
+        if isinstance(reply, list):
+            return f'*{len(reply)}\r\n'.encode() + b''.join(self.encode(item) for item in reply)
+        return b'$%d\r\n%s\r\n' % (len(reply), reply)
+
+    def handle(self):
+        state = self.server.state
+        queued = None
+        while (args := self.read_command()) is not None:
+            name = args[0].decode().lower()
+            if name == 'multi':
+                queued, reply = [], 'OK'
+            elif name == 'exec':
+                reply = [state.run(n, a) for n, a in queued or []]
+                queued = None
+            elif queued is not None:
+                queued.append((name, args[1:]))
+                reply = 'QUEUED'
+            else:
+                reply = state.run(name, args[1:])
+            self.wfile.write(self.encode(reply))
+
+
+class RedisServer(socketserver.ThreadingTCPServer):
+    """``with RedisServer() as server: ... server.url``"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), RedisHandler)
+        self.state = RedisState()
+        self.url = f'redis://127.0.0.1:{self.server_address[1]}/0'
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
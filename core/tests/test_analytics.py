@@ -0,0 +1,144 @@
+import json
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from core import analytics, dimensions
+from core.models import Click, Dimension, Link
+from core.views import BEACON_MAX_EVENTS
+
+
+class EnqueueClickTests(TestCase):
+    def setUp(self):
+        self.link = Link.objects.create(original_url='https://example.com/')
+        analytics._get_click_executor()
+
+    def test_full_queue_writes_inline(self):
+        before = analytics.click_log_metrics()['inline']
+        with mock.patch.object(analytics, '_click_slots', threading.Semaphore(0)):
+            analytics.enqueue_click(self.link.pk, referrer='a.example')
+        self.assertEqual(analytics.click_log_metrics()['inline'], before + 1)
+        self.assertEqual(Click.objects.filter(link=self.link).count(), 1)
+
+    def test_failed_job_is_logged_and_frees_its_slot(self):
+        slots = threading.BoundedSemaphore(1)
+        slots.acquire()
+        with (
+            mock.patch.object(analytics, '_click_slots', slots),
+            mock.patch('core.analytics.record_click', side_effect=RuntimeError('db down')),
+            self.assertLogs('core.analytics', 'ERROR') as logs,
+        ):
+            analytics._record_click_job(self.link.pk, 0, {})
+        self.assertIn('db down', logs.output[0])
+        self.assertTrue(slots.acquire(blocking=False))
+
+
+class HealthCheckTests(TestCase):
+    def test_metrics_are_staff_only(self):
+        data = self.client.get('/api/health').json()
+        self.assertEqual(data['status'], 'ok')
+        self.assertNotIn('db_connections', data)
+
+        staff = get_user_model().objects.create_user('staff', 'staff@example.com', 'pw-12345-x', is_staff=True)
+        self.client.force_login(staff)
+        data = self.client.get('/api/health').json()
+        self.assertIn('db_connections', data)
+        self.assertIn('click_log', data)
+
+
+@override_settings(CLICK_DEDUP_WINDOW=0)
+@mock.patch('core.views.enqueue_click', analytics.record_click)
+class BeaconIngestTests(TestCase):
+    def setUp(self):
+        # The rows are rolled back after each test; their cached ids must go too.
+        self.addCleanup(dimensions._values.clear)
+        self.addCleanup(dimensions._ids.clear)
+        self.link = Link.objects.create(original_url='https://example.com/')
+
+    def beacon(self, body):
+        return self.client.post('/push-analytics/', body, content_type='text/plain')
+
+    def test_text_plain_batch(self):
+        events = [{'postcode': self.link.short_code, 'referrer': 'a.example'}, {'postcode': self.link.short_code}]
+        response = self.beacon(json.dumps({'events': events}))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(Click.objects.filter(link=self.link).count(), 2)
+        self.link.refresh_from_db()
+        self.assertEqual(self.link.click_count, 2)
+
+    def test_unknown_codes_still_get_204(self):
+        response = self.beacon(json.dumps({'events': [{'postcode': 'nope'}]}))
+        self.assertEqual(response.status_code, 204)
+
+    def test_null_fields_are_not_stored_as_none(self):
+        event = {'postcode': self.link.short_code, 'referrer': None, 'data': {'country': None, 'city': 7}}
+        self.assertEqual(self.beacon(json.dumps({'events': [event]})).status_code, 204)
+        self.assertEqual(Click.objects.filter(link=self.link).count(), 1)
+        self.assertFalse(Dimension.objects.filter(value__in=['None', '7']).exists())
+
+    def test_null_postcode_is_rejected(self):
+        self.assertEqual(self.beacon(json.dumps({'events': [{'postcode': None}]})).status_code, 400)
+
+    def test_batch_size_is_capped(self):
+        events = [{'postcode': self.link.short_code}] * (BEACON_MAX_EVENTS + 1)
+        self.assertEqual(self.beacon(json.dumps({'events': events})).status_code, 400)
+        self.assertEqual(self.beacon(json.dumps({'events': []})).status_code, 400)
+        self.assertFalse(Click.objects.exists())
+
+    def test_invalid_json(self):
+        self.assertEqual(self.beacon('{not json').status_code, 400)
+        self.assertEqual(self.beacon('[1, 2]').status_code, 400)
+
+    def test_single_json_event_gets_a_json_reply(self):
+        response = self.client.post(
+            '/push-analytics/', {'postcode': self.link.short_code}, content_type='application/json',
+        )
+        self.assertEqual(response.json(), {'status': 'ok'})
+
+
+@override_settings(CLICK_DEDUP_WINDOW=30)
+@mock.patch('core.views.enqueue_click', analytics.record_click)
+class ClickDedupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.addCleanup(dimensions._values.clear)
+        self.addCleanup(dimensions._ids.clear)
+        self.link = Link.objects.create(original_url='https://example.com/')
+
+    def push(self, **extra):
+        return self.client.post(
+            '/push-analytics/', {'postcode': self.link.short_code}, content_type='application/json',
+            HTTP_USER_AGENT='Mozilla/5.0 test', **extra,
+        ).json()['status']
+
+    def click_count(self):
+        self.link.refresh_from_db()
+        return self.link.click_count
+
+    def test_repeat_click_within_the_window_is_dropped(self):
+        suppressed = analytics.dedup_metrics()['suppressed']
+        self.assertEqual(self.push(), 'ok')
+        self.assertEqual(self.push(), 'duplicate')
+        self.assertEqual(self.click_count(), 1)
+        self.assertEqual(Click.objects.filter(link=self.link).count(), 1)
+        self.assertEqual(analytics.dedup_metrics()['suppressed'], suppressed + 1)
+
+    def test_other_visitors_are_counted(self):
+        self.assertEqual(self.push(REMOTE_ADDR='203.0.113.1'), 'ok')
+        self.assertEqual(self.push(REMOTE_ADDR='203.0.113.2'), 'ok')
+        self.assertEqual(self.click_count(), 2)
+
+    def test_click_after_the_window_is_stored(self):
+        self.assertEqual(self.push(), 'ok')
+        # The cache's clock only: the window has passed.
+        later = mock.Mock(time=mock.Mock(return_value=time.time() + 31))
+        with mock.patch('django.core.cache.backends.locmem.time', later):
+            self.assertEqual(self.push(), 'ok')
+        self.assertEqual(self.click_count(), 2)
+        self.assertEqual(Click.objects.filter(link=self.link).count(), 2)
@@ -0,0 +1,95 @@
+import gzip
+import json
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import archive, dimensions, partitions
+from core.dimensions import encode_click
+from core.models import Click, ClickRollup, Link
+
+from . import PLAIN_STATIC_STORAGES
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES, CLICK_RETENTION_DAYS=0)
+class ArchiveClicksTests(TestCase):
+    def setUp(self):
+        # The rows are rolled back after each test; their cached ids must go too.
+        self.addCleanup(dimensions._values.clear)
+        self.addCleanup(dimensions._ids.clear)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+        self.user = get_user_model().objects.create_user('owner', 'owner@example.com', 'pw-12345-x')
+        self.link = Link.objects.create(original_url='https://example.com/', user=self.user)
+        self.now = timezone.now()
+        self.old = self.now - timedelta(days=200)
+        self.click(self.old, 'US', 'a' * 64)
+        self.click(self.old, 'US', 'b' * 64)
+        self.click(self.old + timedelta(days=1), 'DE', 'a' * 64)
+        self.click(self.now, 'US', 'c' * 64)
+
+    def click(self, when, country, ip_hash):
+        fields = {'country': country, 'browser': 'Firefox', 'ip_hash': ip_hash}
+        click = Click.objects.create(link=self.link, weight=1, **encode_click('default', fields))
+        Click.objects.filter(pk=click.pk).update(clicked_at=when)
+
+    def archive(self, *args):
+        out = StringIO()
+        call_command('archive_clicks', *args, retention_days=90, output_dir=str(self.directory), stdout=out)
+        return out.getvalue()
+
+    def test_old_month_is_archived_to_a_file_and_rollups(self):
+        self.archive()
+        self.assertEqual(list(Click.objects.values_list('clicked_at', flat=True)), [self.now])
+
+        month = partitions.month_start(timezone.localdate(self.old))
+        path = archive.archive_path(self.directory, 'default', month)
+        rows = [json.loads(line) for line in gzip.decompress(path.read_bytes()).splitlines()]
+        self.assertEqual(sorted(row['country'] for row in rows), ['DE', 'US', 'US'])
+
+        rollups = ClickRollup.objects.filter(link=self.link)
+        totals = rollups.filter(dimension='').order_by('day')
+        self.assertEqual([(r.clicks, r.visitors) for r in totals], [(2, 2), (1, 1)])
+        countries = {r.value: r.clicks for r in rollups.filter(dimension='country', day=timezone.localdate(self.old))}
+        self.assertEqual(countries, {'US': 2})
+        self.assertEqual(sum(r.clicks for r in rollups.filter(dimension='browser')), 3)
+
+    def test_rerun_keeps_rollups(self):
+        self.archive()
+        before = sorted(ClickRollup.objects.values_list('day', 'dimension', 'value', 'clicks'))
+        self.archive()
+        self.assertEqual(sorted(ClickRollup.objects.values_list('day', 'dimension', 'value', 'clicks')), before)
+
+    def test_dry_run_moves_nothing(self):
+        output = self.archive('--dry-run')
+        self.assertIn('3 clicks would be archived', output)
+        self.assertEqual(Click.objects.count(), 4)
+        self.assertFalse(ClickRollup.objects.exists())
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+    def test_retention_off(self):
+        with self.assertRaises(CommandError):
+            call_command('archive_clicks', stdout=StringIO())
+
+    def test_link_analytics_merges_rollups_with_hot_clicks(self):
+        self.archive()
+        self.client.force_login(self.user)
+        context = self.client.get(f'/dashboard/link/{self.link.pk}/?days=365').context
+        self.assertEqual(context['total_clicks'], 4)
+        self.assertEqual(context['top_countries'], [{'country': 'US', 'count': 3}, {'country': 'DE', 'count': 1}])
+        self.assertEqual(sum(json.loads(context['chart_data'])), 4)
+
+    def test_short_range_leaves_archived_days_out(self):
+        self.archive()
+        self.client.force_login(self.user)
+        context = self.client.get(f'/dashboard/link/{self.link.pk}/?days=30').context
+        self.assertEqual(context['total_clicks'], 1)
+        self.assertEqual(context['top_countries'], [{'country': 'US', 'count': 1}])
@@ -0,0 +1,131 @@
+import importlib.util
+import time
+from unittest import mock, skipUnless
+
+from django.core.cache import cache, caches
+from django.test import SimpleTestCase, override_settings
+
+from core import cache as core_cache
+from core.cache import TieredCache, get_or_compute, is_shared
+
+from .redis_server import RedisServer
+
+
+@skipUnless(importlib.util.find_spec('redis'), 'needs the "redis" extra')
+class TieredCacheTests(SimpleTestCase):
+    """Two TieredCache "processes" sharing a Redis L2 (an in-process stand-in server)."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = RedisServer().__enter__()
+        cls.addClassCleanup(cls.server.__exit__, None, None, None)
+
+    def setUp(self):
+        tiered = {
+            'BACKEND': 'core.cache.TieredCache',
+            'OPTIONS': {'L2': 'shared', 'L1_TIMEOUT': 60, 'POLL_INTERVAL': 0},
+        }
+        settings = override_settings(CACHES={
+            'default': tiered,
+            'shared': {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                'LOCATION': self.server.url,
+                'OPTIONS': {'protocol': 2},
+            },
+        })
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # Separate locations give each peer its own L1 and log position.
+        self.a = TieredCache('peer-a', tiered)
+        self.b = TieredCache('peer-b', tiered)
+        self.a.clear()
+        self.b.clear()
+        self.a._l1.clear()
+        self.b._l1.clear()
+        # Peers start following the log before the writes under test.
+        self.a.set('warm', 1)
+        self.a.get('warm')
+        self.b.get('warm')
+
+    def test_reads_fill_l1(self):
+        self.a.set('key', 'v1')
+        self.assertEqual(self.b.get('key'), 'v1')
+        caches['shared'].set('key', 'behind-l1')
+        self.assertEqual(self.b.get('key'), 'v1')
+
+    def test_set_invalidates_peers(self):
+        self.a.set('key', 'v1')
+        self.assertEqual(self.b.get('key'), 'v1')
+        self.a.set('key', 'v2')
+        self.assertEqual(self.b.get('key'), 'v2')
+
+    def test_set_many_and_delete_invalidate_peers(self):
+        self.a.set_many({'x': 1, 'y': 2})
+        self.assertEqual(self.b.get_many(['x', 'y']), {'x': 1, 'y': 2})
+        self.a.set_many({'x': 10})
+        self.a.delete('y')
+        self.assertEqual(self.b.get_many(['x', 'y']), {'x': 10})
+
+    def test_touch_invalidates_peers(self):
+        self.a.set('key', 'v1')
+        self.assertEqual(self.b.get('key'), 'v1')
+        self.assertTrue(self.a.touch('key', 0))
+        self.assertIsNone(self.b.get('key'))
+
+    def test_peer_too_far_behind_drops_l1(self):
+        self.b.set('key', 'v1')
+        self.assertEqual(self.b.get('key'), 'v1')
+        caches['shared'].set('key', 'v2')
+        for i in range(TieredCache.MAX_REPLAY + 1):
+            self.a.delete(f'other-{i}')
+        self.assertEqual(self.b.get('key'), 'v2')
+
+    def test_reset_log_drops_l1(self):
+        self.b.set('key', 'v1')
+        self.assertEqual(self.b.get('key'), 'v1')
+        # A flushed or restarted L2 starts the sequence again below b's position.
+        caches['shared'].clear()
+        caches['shared'].set('key', 'v2')
+        self.a.delete('other')
+        self.assertEqual(self.b.get('key'), 'v2')
+
+    def test_counters_and_add_go_to_l2(self):
+        self.assertTrue(self.a.add('n', 1))
+        self.assertFalse(self.b.add('n', 1))
+        self.assertEqual(self.b.incr('n'), 2)
+        self.assertEqual(self.a.incr('n'), 3)
+        self.assertEqual(caches['shared'].get('n'), 3)
+
+    def test_is_shared(self):
+        self.assertTrue(is_shared())
+
+
+class IsSharedTests(SimpleTestCase):
+    def test_locmem_is_not_shared(self):
+        self.assertFalse(is_shared())
+
+
+class GetOrComputeTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_computes_and_caches(self):
+        self.assertEqual(get_or_compute('k', lambda: 1, 60), 1)
+        self.assertEqual(get_or_compute('k', lambda: 2, 60), 1)
+
+    def test_cold_miss_behind_a_lock_returns_the_last_value(self):
+        get_or_compute('k', lambda: 'old', 60)
+        cache.delete('k')
+        cache.add('k:lock', 1, 30)
+        started = time.monotonic()
+        self.assertEqual(get_or_compute('k', lambda: 'new', 60), 'old')
+        self.assertLess(time.monotonic() - started, 1)
+
+    @mock.patch.object(core_cache, 'COLD_WAIT', 0.1)
+    def test_cold_miss_behind_a_lock_computes_without_history(self):
+        cache.add('k:lock', 1, 30)
+        started = time.monotonic()
+        self.assertEqual(get_or_compute('k', lambda: 'new', 60), 'new')
+        self.assertLess(time.monotonic() - started, 1)
@@ -0,0 +1,22 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.checks import run_checks
+from django.test import SimpleTestCase, override_settings
+
+
+class ASGIConnectionsCheckTests(SimpleTestCase):
+    def check_ids(self):
+        return [message.id for message in run_checks()]
+
+    @override_settings(SERVER_PROFILE='asgi')
+    def test_persistent_connections_under_asgi_warn(self):
+        with mock.patch.dict(settings.DATABASES['default'], CONN_MAX_AGE=60):
+            self.assertIn('core.W001', self.check_ids())
+        with mock.patch.dict(settings.DATABASES['default'], CONN_MAX_AGE=0):
+            self.assertNotIn('core.W001', self.check_ids())
+
+    @override_settings(SERVER_PROFILE='wsgi')
+    def test_wsgi_keeps_persistent_connections(self):
+        with mock.patch.dict(settings.DATABASES['default'], CONN_MAX_AGE=60):
+            self.assertNotIn('core.W001', self.check_ids())
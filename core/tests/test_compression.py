@@ -0,0 +1,24 @@
+from django.http import HttpResponse, JsonResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.middleware import CompressionMiddleware
+
+
+@override_settings(COMPRESS_MIN_SIZE=100)
+class CompressionMiddlewareTests(SimpleTestCase):
+    def respond(self, response):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_json_uses_brotli(self):
+        response = self.respond(JsonResponse({'links': ['https://example.com/'] * 50}))
+        self.assertEqual(response['Content-Encoding'], 'br')
+
+    def test_html_uses_padded_gzip(self):
+        html = '<form><input name="csrfmiddlewaretoken" value="secret"></form>' * 20
+        response = self.respond(HttpResponse(html))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_small_responses_are_left_alone(self):
+        response = self.respond(JsonResponse({'ok': True}))
+        self.assertFalse(response.has_header('Content-Encoding'))
@@ -0,0 +1,102 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from core import analytics, dimensions
+from core.models import Link
+
+from . import PLAIN_STATIC_STORAGES
+
+
+class ConditionalAPITests(TestCase):
+    def setUp(self):
+        # The rows are rolled back after each test; their cached ids must go too.
+        self.addCleanup(dimensions._values.clear)
+        self.addCleanup(dimensions._ids.clear)
+        self.user = get_user_model().objects.create_user('owner', 'owner@example.com', 'pw-12345-x')
+        self.client.force_login(self.user)
+        self.link = Link.objects.create(original_url='https://example.com/', user=self.user)
+
+    def test_list_links_revalidates(self):
+        response = self.client.get('/api/v1/links')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/v1/links', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Link.objects.create(original_url='https://example.com/2', user=self.user)
+        self.assertEqual(self.client.get('/api/v1/links', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_links_etag_depends_on_the_query(self):
+        etag = self.client.get('/api/v1/links')['ETag']
+        self.assertEqual(self.client.get('/api/v1/links?page=2', HTTP_IF_NONE_MATCH=etag).status_code, 404)
+        response = self.client.get('/api/v1/links?q=nothing', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.json()['count']), (200, 0))
+
+    def test_link_detail_changes_with_clicks(self):
+        url = f'/api/v1/links/{self.link.pk}'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        analytics.record_click(self.link.pk, 1, referrer='a.example')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_stale_if_match_is_refused(self):
+        url = f'/api/v1/links/{self.link.pk}'
+        etag = self.client.get(url)['ETag']
+        analytics.record_click(self.link.pk, 1, referrer='a.example')
+        response = self.client.patch(url, {'title': 'new'}, content_type='application/json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.link.refresh_from_db()
+        self.assertEqual(self.link.title, '')
+
+        etag = self.client.get(url)['ETag']
+        response = self.client.patch(url, {'title': 'new'}, content_type='application/json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_click_log_validators(self):
+        url = f'/api/v1/links/{self.link.pk}/clicks'
+        self.assertNotIn('Last-Modified', self.client.get(url))
+        analytics.record_click(self.link.pk, 1, referrer='a.example')
+
+        response = self.client.get(url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.assertEqual(self.client.get(f'{url}?page=2', HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+        analytics.record_click(self.link.pk, 1, referrer='b.example')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_click_log_validators_cost_one_query(self):
+        url = f'/api/v1/links/{self.link.pk}/clicks'
+        etag = self.client.get(url)['ETag']
+        # Session and user, then the validators.
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_other_users_links_have_no_validators(self):
+        other = get_user_model().objects.create_user('other', 'other@example.com', 'pw-12345-x')
+        self.client.force_login(other)
+        response = self.client.get(f'/api/v1/links/{self.link.pk}/clicks', HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class DashboardETagTests(TestCase):
+    def setUp(self):
+        self.addCleanup(dimensions._values.clear)
+        self.addCleanup(dimensions._ids.clear)
+        self.user = get_user_model().objects.create_user('owner', 'owner@example.com', 'pw-12345-x')
+        self.client.force_login(self.user)
+        self.link = Link.objects.create(original_url='https://example.com/', user=self.user)
+
+    def test_dashboard_revalidates(self):
+        # The first page sets the CSRF cookie, which is part of the tag.
+        self.client.get('/dashboard/')
+        response = self.client.get('/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/dashboard/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get('/dashboard/?q=example', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        analytics.record_click(self.link.pk, 1, referrer='a.example')
+        self.assertEqual(self.client.get('/dashboard/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
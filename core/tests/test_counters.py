@@ -0,0 +1,60 @@
+from datetime import date, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core import counters
+from core.models import Link, SiteCounter
+
+
+class BumpTests(TestCase):
+    def value(self, name):
+        return SiteCounter.objects.get(name=name).value
+
+    def test_creates_then_adds(self):
+        counters.bump('test:n')
+        self.assertEqual(self.value('test:n'), 1)
+        counters.bump('test:n', 5)
+        counters.bump('test:n', -2)
+        self.assertEqual(self.value('test:n'), 4)
+        self.assertEqual(SiteCounter.objects.filter(name='test:n').count(), 1)
+
+
+class LinkCounterTests(TestCase):
+    def create(self, n):
+        return [Link.objects.create(original_url=f'https://example.com/{i}') for i in range(n)]
+
+    def test_created_and_deleted_links_are_counted(self):
+        links = self.create(7)
+        self.assertEqual(counters.read_link_counts(), (7, 7))
+        links[0].delete()
+        self.assertEqual(counters.read_link_counts(), (6, 6))
+        yesterday = timezone.localdate() - timedelta(days=1)
+        self.assertEqual(counters.read_link_counts(yesterday), (6, 0))
+
+    def test_reconcile_corrects_drift(self):
+        self.create(3)
+        today = timezone.localdate()
+        stale_day = date(2020, 1, 1)
+        SiteCounter.objects.filter(name=counters.LINKS_TOTAL).update(value=10)
+        SiteCounter.objects.filter(name=counters.links_day_key(today)).update(value=1)
+        SiteCounter.objects.create(name=counters.links_day_key(stale_day), value=4)
+        SiteCounter.objects.create(name='ids:link', value=99)
+
+        self.assertEqual(counters.reconcile_link_counters(), 3)
+        self.assertEqual(counters.read_link_counts(), (3, 3))
+        self.assertEqual(counters.read_link_counts(stale_day), (3, 0))
+        self.assertEqual(SiteCounter.objects.get(name='ids:link').value, 99)
+        self.assertEqual(counters.reconcile_link_counters(), 0)
+
+    def test_reconcile_fills_missing_days(self):
+        link, = self.create(1)
+        # Bulk updates bypass the signals.
+        Link.objects.filter(pk=link.pk).update(created_at=timezone.now() - timedelta(days=3))
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('2 corrected', out.getvalue())
+        self.assertEqual(counters.read_link_counts(), (1, 0))
+        self.assertEqual(counters.read_link_counts(timezone.localdate() - timedelta(days=3)), (1, 1))
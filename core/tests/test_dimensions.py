@@ -0,0 +1,25 @@
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.test import TestCase
+
+from core import dimensions
+
+
+class DimensionIdsTests(TestCase):
+    def setUp(self):
+        # The rows are rolled back after each test; their cached ids must go too.
+        self.addCleanup(dimensions._values.clear)
+        self.addCleanup(dimensions._ids.clear)
+
+    def test_ids_are_cached_only_after_commit(self):
+        key = (DEFAULT_DB_ALIAS, 'referrer', 'rolled-back.example')
+        try:
+            with transaction.atomic():
+                dimensions.dimension_ids(DEFAULT_DB_ALIAS, [key[1:]])
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertNotIn(key, dimensions._ids)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ids = dimensions.dimension_ids(DEFAULT_DB_ALIAS, [key[1:]])
+        self.assertEqual(dimensions._ids[key], ids[key[1:]])
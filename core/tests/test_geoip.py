@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from core import geoip
+
+SAMPLE = Path(__file__).resolve().parent.parent / 'data' / 'geoip-sample.csv'
+
+
+class GeoIndexTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.index = geoip.load(SAMPLE)
+
+    def test_range_boundaries(self):
+        self.assertEqual(self.index.lookup('81.2.69.0'), {'country': 'GB', 'city': 'London'})
+        self.assertEqual(self.index.lookup('81.2.69.255'), {'country': 'GB', 'city': 'London'})
+        self.assertIsNone(self.index.lookup('81.2.68.255'))
+        self.assertIsNone(self.index.lookup('81.2.70.0'))
+        self.assertEqual(self.index.lookup('1.0.0.0')['city'], 'Brisbane')
+        self.assertIsNone(self.index.lookup('0.255.255.255'))
+        self.assertIsNone(self.index.lookup('255.255.255.255'))
+
+    def test_gap_between_ranges(self):
+        self.assertIsNone(self.index.lookup('8.8.5.0'))
+
+    def test_ipv6(self):
+        self.assertEqual(self.index.lookup('2001:db8::'), {'country': 'FR', 'city': 'Paris'})
+        self.assertEqual(self.index.lookup('2001:db8:ffff:ffff:ffff:ffff:ffff:ffff')['city'], 'Paris')
+        self.assertIsNone(self.index.lookup('2001:db9::'))
+        self.assertIsNone(self.index.lookup('::1'))
+
+    def test_ipv4_mapped_ipv6(self):
+        self.assertEqual(self.index.lookup('::ffff:203.0.113.7'), {'country': 'JP', 'city': 'Tokyo'})
+
+    def test_invalid_input(self):
+        for ip in ['', 'not-an-ip', '300.1.1.1', '1.2.3', '2001:db8::g']:
+            self.assertIsNone(self.index.lookup(ip), ip)
+
+    def test_locations_are_shared(self):
+        self.assertEqual(len(self.index), 8)
+        self.assertEqual(len(self.index.locations), 7)
+
+    def test_cidr_rows(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('network,country,city\n10.1.0.0/16,CA,Toronto\n')
+        self.addCleanup(os.unlink, f.name)
+        index = geoip.load(f.name)
+        self.assertEqual(index.lookup('10.1.255.255')['city'], 'Toronto')
+        self.assertIsNone(index.lookup('10.2.0.0'))
+
+
+class GeoIPReloadTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'geoip.csv')
+        shutil.copy(SAMPLE, self.path)
+        settings = override_settings(GEOIP_DATABASE=self.path, GEOIP_RELOAD_INTERVAL=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def replace(self, content):
+        tmp = f'{self.path}.new'
+        with open(tmp, 'w') as f:
+            f.write(content)
+        # A different mtime even on coarse-grained filesystems.
+        stat = os.stat(self.path)
+        os.utime(tmp, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        os.replace(tmp, self.path)
+
+    def wait_for_reload(self):
+        thread = geoip._reloader
+        if thread is not None:
+            thread.join()
+
+    def test_reloads_when_the_file_changes(self):
+        self.assertEqual(geoip.locate_ip('81.2.69.1')['city'], 'London')
+        self.replace('start,end,country,city\n81.2.69.0,81.2.69.255,GB,Manchester\n')
+        geoip.locate_ip('81.2.69.1')
+        self.wait_for_reload()
+        self.assertEqual(geoip.locate_ip('81.2.69.1')['city'], 'Manchester')
+        self.assertIsNone(geoip.locate_ip('8.8.8.8'))
+
+    def test_old_index_is_served_during_a_reload(self):
+        self.assertEqual(geoip.locate_ip('81.2.69.1')['city'], 'London')
+        self.replace('start,end,country,city\n81.2.69.0,81.2.69.255,GB,Manchester\n')
+        parsing, done = threading.Event(), threading.Event()
+        load = geoip.load
+
+        def slow_load(path):
+            parsing.set()
+            done.wait(5)
+            return load(path)
+
+        with mock.patch.object(geoip, 'load', slow_load):
+            self.assertEqual(geoip.locate_ip('81.2.69.1')['city'], 'London')
+            self.assertTrue(parsing.wait(5))
+            self.assertEqual(geoip.locate_ip('81.2.69.1')['city'], 'London')
+            done.set()
+            self.wait_for_reload()
+        self.assertEqual(geoip.locate_ip('81.2.69.1')['city'], 'Manchester')
+
+    def test_keeps_the_last_good_index_on_a_bad_file(self):
+        self.assertEqual(geoip.locate_ip('81.2.69.1')['city'], 'London')
+        self.replace('start,end,country,city\nnot-an-ip,1.2.3.4,XX,Nowhere\n')
+        with self.assertLogs('core.geoip', 'ERROR'):
+            geoip.locate_ip('81.2.69.1')
+            self.wait_for_reload()
+        self.assertEqual(geoip.locate_ip('81.2.69.1')['city'], 'London')
+        # Not parsed again until it changes.
+        self.assertIsNone(geoip._reloader)
+
+    @override_settings(GEOIP_DATABASE='')
+    def test_disabled(self):
+        self.assertFalse(geoip.is_enabled())
+        self.assertIsNone(geoip.locate_ip('81.2.69.1'))
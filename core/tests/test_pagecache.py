@@ -0,0 +1,82 @@
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core import pagecache
+from core.pagecache import cache_anonymous_page
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=300)
+class CacheAnonymousPageTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.factory = RequestFactory()
+        self.renders = 0
+
+        @cache_anonymous_page
+        def view(request):
+            self.renders += 1
+            return HttpResponse(f'render {self.renders}')
+
+        self.view = view
+
+    def get(self, path='/about/', cookies=None, **extra):
+        request = self.factory.get(path, **extra)
+        request.COOKIES.update(cookies or {})
+        return self.view(request)
+
+    def test_anonymous_pages_are_cached(self):
+        self.assertEqual(self.get().content, b'render 1')
+        response = self.get('/about/?utm_source=mail&ref=x')
+        self.assertEqual(response.content, b'render 1')
+        self.assertIn('Cookie', response['Vary'])
+        self.assertEqual(self.get('/contact/').content, b'render 2')
+
+    def test_other_query_strings_bypass(self):
+        self.get()
+        self.assertEqual(self.get('/about/?page=2').content, b'render 2')
+
+    def test_signed_in_users_bypass(self):
+        self.get()
+        response = self.get(cookies={settings.SESSION_COOKIE_NAME: 'abc'})
+        self.assertEqual(response.content, b'render 2')
+        self.assertEqual(self.get(HTTP_AUTHORIZATION='Bearer key').content, b'render 3')
+
+    def test_pending_messages_bypass(self):
+        self.get()
+        self.assertEqual(self.get(cookies={CookieStorage.cookie_name: 'msg'}).content, b'render 2')
+
+    def test_responses_setting_cookies_are_not_stored(self):
+        @cache_anonymous_page
+        def view(request):
+            self.renders += 1
+            response = HttpResponse(f'render {self.renders}')
+            response.set_cookie('pending_links', '1')
+            return response
+
+        self.view = view
+        self.get()
+        self.assertEqual(self.get().content, b'render 2')
+
+    def test_template_change_misses(self):
+        self.get()
+        with mock.patch.object(pagecache, '_version', 'new-templates'):
+            self.assertEqual(self.get().content, b'render 2')
+
+    def test_clear_page_cache_misses(self):
+        self.get()
+        call_command('clear_page_cache', stdout=StringIO())
+        self.assertEqual(self.get().content, b'render 2')
+        self.assertEqual(self.get().content, b'render 2')
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        self.get()
+        self.assertEqual(self.get().content, b'render 2')
@@ -0,0 +1,28 @@
+from django.test import TestCase, override_settings
+
+from core.models import Link
+from core.pending import PENDING_LINKS_COOKIE
+
+from . import PLAIN_STATIC_STORAGES
+
+
+@override_settings(STORAGES=PLAIN_STATIC_STORAGES)
+class ClaimPendingLinksTests(TestCase):
+    def test_signup_claims_links_and_deletes_the_cookie(self):
+        self.client.post('/shorten/', {'url': 'https://example.com/'})
+        self.assertTrue(self.client.cookies[PENDING_LINKS_COOKIE].value)
+
+        response = self.client.post('/accounts/signup/', {
+            'email': 'new@example.com', 'password1': 'pw-12345-xyz', 'password2': 'pw-12345-xyz',
+        })
+        self.assertEqual(response.status_code, 302)
+        link = Link.objects.get()
+        self.assertEqual(link.user.email, 'new@example.com')
+        cookie = response.cookies[PENDING_LINKS_COOKIE]
+        self.assertEqual(cookie.value, '')
+        self.assertEqual(cookie['max-age'], 0)
+
+    def test_other_responses_leave_the_cookie_alone(self):
+        self.client.post('/shorten/', {'url': 'https://example.com/'})
+        response = self.client.get('/')
+        self.assertNotIn(PENDING_LINKS_COOKIE, response.cookies)
@@ -0,0 +1,72 @@
+import threading
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from core import purge
+from core.management.commands.purge_server import PurgeServer
+from core.models import Link
+
+
+class HTTPPurgeBackendTests(TestCase):
+    """Purges sent to the ``manage.py purge_server`` stand-in."""
+
+    def setUp(self):
+        self.server = PurgeServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        settings = override_settings(
+            CDN_PURGE_BACKEND='core.purge.HTTPPurgeBackend', CDN_PURGE_URL=self.server.url,
+            CDN_PURGE_TOKEN='secret',
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(setattr, purge, '_backend', None)
+        purge._backend = None
+
+    def run_purges(self):
+        # Wait for the background purge thread to drain.
+        purge._get_executor().submit(lambda: None).result(timeout=5)
+
+    def test_editing_a_link_purges_its_key_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            link = Link.objects.create(original_url='https://example.com/')
+        with self.captureOnCommitCallbacks(execute=True):
+            link.is_active = False
+            link.save()
+        self.run_purges()
+        self.assertEqual(self.server.purged, [f'link-{link.pk}'])
+        self.assertEqual(self.server.requests[0]['Fastly-Key'], 'secret')
+
+    def test_deleting_a_link_purges_its_key(self):
+        link = Link.objects.create(original_url='https://example.com/')
+        key = purge.link_surrogate_key(link.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            link.delete()
+        self.run_purges()
+        self.assertEqual(self.server.purged, [key])
+
+    def test_purge_runs_off_the_request_thread(self):
+        link = Link.objects.create(original_url='https://example.com/')
+        callers = []
+        with mock.patch('core.purge.purge_keys', side_effect=lambda keys: callers.append(threading.current_thread())):
+            with self.captureOnCommitCallbacks(execute=True):
+                link.delete()
+            self.run_purges()
+        self.assertEqual(len(callers), 1)
+        self.assertNotEqual(callers[0], threading.current_thread())
+
+    def test_failures_are_logged(self):
+        self.server.shutdown()
+        self.server.server_close()
+        with self.assertLogs('core.purge', 'ERROR'):
+            purge.purge_keys(['link-1'])
+
+
+class RedirectCacheHeadersTests(TestCase):
+    def test_browsers_do_not_cache_redirect_pages(self):
+        link = Link.objects.create(original_url='https://example.com/')
+        response = self.client.get(f'/{link.short_code}/')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=0')
+        self.assertEqual(response['Surrogate-Key'], f'link-{link.pk}')
@@ -0,0 +1,73 @@
+import io
+import os
+import tempfile
+import zipfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core import qr
+
+
+class RenderManyTests(SimpleTestCase):
+    def setUp(self):
+        caches[qr.QR_CACHE_ALIAS].clear()
+
+    def test_renders_in_process_without_a_pool(self):
+        urls = ['https://example.com/a', 'https://example.com/b', 'https://example.com/a']
+        with mock.patch('core.qr.ProcessPoolExecutor') as pool_class:
+            rendered = list(qr.render_many(urls))
+        pool_class.assert_not_called()
+        self.assertEqual(rendered, [qr.render_qr(url) for url in urls])
+
+    @override_settings(QR_RENDER_WORKERS=1)
+    def test_single_worker_means_no_pool(self):
+        self.assertIsNone(qr.render_pool())
+
+
+@override_settings(QR_RENDER_WORKERS=2)
+class GenerateQRBatchTests(SimpleTestCase):
+    def test_batch_renders_on_a_pool(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'codes.zip')
+            call_command(
+                'generate_qr_batch', url=['https://example.com/a', 'https://example.com/b'],
+                fmt='svg', output=output, stdout=StringIO(),
+            )
+            with zipfile.ZipFile(output) as archive:
+                self.assertEqual(archive.namelist(), ['qr-1.svg', 'qr-2.svg'])
+                self.assertEqual(archive.read('qr-2.svg'), qr.render_qr('https://example.com/b', fmt='svg'))
+
+
+class QRBatchAPITests(TestCase):
+    def setUp(self):
+        caches[qr.QR_CACHE_ALIAS].clear()
+        user = get_user_model().objects.create_user('owner', 'owner@example.com', 'pw-12345-x')
+        self.client.force_login(user)
+
+    def post(self, urls):
+        return self.client.post('/api/v1/qr/batch', {'urls': urls, 'format': 'svg'}, content_type='application/json')
+
+    @override_settings(QR_WEB_RENDER_WORKERS=1)
+    def test_renders_on_the_web_pool(self):
+        self.addCleanup(setattr, qr, '_web_pool', None)
+        pool = qr.web_render_pool()
+        self.addCleanup(pool.shutdown)
+        self.assertIs(qr.web_render_pool(), pool)
+
+        with mock.patch('core.qr.render_qr', side_effect=AssertionError('rendered in the request')):
+            response = self.post(['https://example.com/a'])
+            archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.read('qr-1.svg'), qr.render_qr('https://example.com/a', fmt='svg'))
+
+    @override_settings(QR_WEB_RENDER_WORKERS=0)
+    def test_no_web_pool(self):
+        self.assertIsNone(qr.web_render_pool())
+
+    def test_batch_size_is_capped(self):
+        urls = [f'https://example.com/{i}' for i in range(qr.QR_BATCH_MAX + 1)]
+        self.assertEqual(self.post(urls).status_code, 400)
@@ -0,0 +1,33 @@
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from core import ratelimit
+
+
+class SlidingWindowTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def hits(self, hit, count, now):
+        return [hit('test', 'ip:1', 2, 60, now=now).allowed for _ in range(count)]
+
+    def test_limit_is_enforced(self):
+        self.assertEqual(self.hits(ratelimit.hit, 3, now=10), [True, True, False])
+
+    def test_rejected_requests_are_not_counted(self):
+        self.assertEqual(self.hits(ratelimit.hit, 10, now=10), [True, True] + [False] * 8)
+        self.assertEqual(cache.get('ratelimit:test:ip:1:0'), 2)
+        # 2 * 1/6 of the previous window still overlaps: room for one more.
+        self.assertEqual(self.hits(ratelimit.hit, 2, now=110), [True, False])
+
+    def test_async_rejected_requests_are_not_counted(self):
+        async_hit = async_to_sync(ratelimit.ahit)
+        self.assertEqual(self.hits(async_hit, 10, now=10), [True, True] + [False] * 8)
+        self.assertEqual(self.hits(async_hit, 2, now=110), [True, False])
+
+    def test_peek_does_not_count(self):
+        for _ in range(5):
+            self.assertTrue(ratelimit.peek('test', 'ip:1', 2, 60, now=10).allowed)
+        self.assertEqual(self.hits(ratelimit.hit, 3, now=10), [True, True, False])
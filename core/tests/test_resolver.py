@@ -0,0 +1,43 @@
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+
+from core import routers
+from core.models import Link
+from core.resolver import resolve_link
+
+from . import add_database
+
+
+@override_settings(DATABASE_ROUTERS=['core.routers.PrimaryReplicaRouter'])
+class StaleReplicaTests(TransactionTestCase):
+    """
+    A replica that is lagging behind: it has the schema but none of the rows.
+    (Not a TestCase: reads inside a transaction on the primary never go to
+    the replica.)
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        add_database(self, routers.REPLICA_DB, Link)
+        self.link = Link.objects.create(original_url='https://example.com/old')
+
+    def resolve(self):
+        token = routers.begin_request(pinned=False)
+        try:
+            routers.allow_replica()
+            return resolve_link(self.link.short_code)
+        finally:
+            routers.end_request(token)
+
+    @override_settings(LINK_RESOLVE_CACHE_TIMEOUT=0)
+    def test_uncached_reads_go_to_the_replica(self):
+        self.assertIsNone(self.resolve())
+
+    @override_settings(LINK_RESOLVE_CACHE_TIMEOUT=300)
+    def test_cache_is_filled_from_the_primary(self):
+        self.assertEqual(self.resolve()['original_url'], 'https://example.com/old')
+
+        self.link.original_url = 'https://example.com/new'
+        self.link.save()
+        self.assertEqual(self.resolve()['original_url'], 'https://example.com/new')
@@ -0,0 +1,90 @@
+import time
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core import routers
+from core.middleware import ReplicaPinMiddleware
+from core.models import Link
+from core.routers import PrimaryReplicaRouter, replica_reads
+
+
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        token = routers.begin_request(pinned=False)
+        self.addCleanup(routers.end_request, token)
+
+    def test_reads_outside_requests_use_the_primary(self):
+        token = routers._routing_state.set(None)
+        self.addCleanup(routers._routing_state.reset, token)
+        self.assertEqual(self.router.db_for_read(Link), routers.PRIMARY_DB)
+
+    def test_unmarked_views_read_the_primary(self):
+        self.assertEqual(self.router.db_for_read(Link), routers.PRIMARY_DB)
+
+    def test_marked_views_read_the_replica(self):
+        routers.allow_replica()
+        self.assertEqual(self.router.db_for_read(Link), routers.REPLICA_DB)
+
+    def test_a_write_moves_later_reads_to_the_primary(self):
+        routers.allow_replica()
+        self.assertEqual(self.router.db_for_write(Link), routers.PRIMARY_DB)
+        self.assertEqual(self.router.db_for_read(Link), routers.PRIMARY_DB)
+
+    def test_pinned_requests_read_the_primary(self):
+        token = routers.begin_request(pinned=True)
+        self.addCleanup(routers.end_request, token)
+        routers.allow_replica()
+        self.assertEqual(self.router.db_for_read(Link), routers.PRIMARY_DB)
+
+
+@override_settings(REPLICA_PIN_SECONDS=10)
+class ReplicaPinMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = PrimaryReplicaRouter()
+
+    def run_view(self, view, cookie=None):
+        request = self.factory.get('/')
+        if cookie is not None:
+            request.COOKIES[ReplicaPinMiddleware.COOKIE_NAME] = cookie
+        return ReplicaPinMiddleware(view)(request)
+
+    def reading_view(self, seen):
+        @replica_reads
+        def view(request):
+            seen.append(self.router.db_for_read(Link))
+            return HttpResponse()
+        return view
+
+    def test_write_sets_the_pin_cookie(self):
+        def view(request):
+            self.router.db_for_write(Link)
+            return HttpResponse()
+
+        response = self.run_view(view)
+        cookie = response.cookies[ReplicaPinMiddleware.COOKIE_NAME]
+        self.assertEqual(cookie['max-age'], 10)
+        self.assertTrue(cookie['httponly'])
+        self.assertGreater(float(cookie.value), time.time())
+
+    def test_reads_do_not_set_the_pin_cookie(self):
+        response = self.run_view(self.reading_view([]))
+        self.assertNotIn(ReplicaPinMiddleware.COOKIE_NAME, response.cookies)
+
+    def test_pin_cookie_keeps_reads_on_the_primary(self):
+        seen = []
+        self.run_view(self.reading_view(seen), cookie=str(time.time() + 5))
+        self.run_view(self.reading_view(seen))
+        self.assertEqual(seen, [routers.PRIMARY_DB, routers.REPLICA_DB])
+
+    def test_expired_or_invalid_pin_cookie_is_ignored(self):
+        seen = []
+        self.run_view(self.reading_view(seen), cookie=str(time.time() - 5))
+        self.run_view(self.reading_view(seen), cookie='not-a-time')
+        self.assertEqual(seen, [routers.REPLICA_DB, routers.REPLICA_DB])
+
+    def test_state_is_reset_after_the_request(self):
+        self.run_view(self.reading_view([]))
+        self.assertIsNone(routers._routing_state.get())
@@ -0,0 +1,37 @@
+from unittest import mock
+
+from django.core.checks import run_checks
+from django.test import SimpleTestCase, override_settings
+
+from core.analytics import _weight
+
+
+@override_settings(CLICK_SAMPLING_THRESHOLD=100, CLICK_SAMPLE_RATE=10)
+class ClickWeightTests(SimpleTestCase):
+    def test_fixed_rate_keeps_one_in_n(self):
+        with mock.patch('random.randrange', return_value=0):
+            self.assertEqual(_weight(4), 4)
+        with mock.patch('random.randrange', return_value=3):
+            self.assertEqual(_weight(4), 0)
+        self.assertEqual(_weight(1), 1)
+
+    def test_auto_mode_stores_everything_under_the_threshold(self):
+        self.assertEqual(_weight(0, seen=100), 1)
+        self.assertEqual(_weight(0), 1)
+
+    def test_auto_mode_samples_randomly_over_the_threshold(self):
+        with mock.patch('random.randrange', side_effect=[0, 5]) as randrange:
+            self.assertEqual([_weight(0, seen=101), _weight(0, seen=102)], [10, 0])
+        randrange.assert_called_with(10)
+
+    def test_auto_mode_totals_are_unbiased(self):
+        # 15 clicks over the threshold: weights must add up to ~15 on average,
+        # not to 10 (one stored click for the first 10, none for the last 5).
+        totals = [sum(_weight(0, seen=100 + i) for i in range(1, 16)) for _ in range(2000)]
+        self.assertAlmostEqual(sum(totals) / len(totals), 15, delta=1)
+
+
+class ClickSampleRateCheckTests(SimpleTestCase):
+    @override_settings(CLICK_SAMPLE_RATE=0)
+    def test_rate_below_one_is_an_error(self):
+        self.assertIn('core.E003', [error.id for error in run_checks()])
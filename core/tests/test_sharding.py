@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core import sharding
+from core.models import Click, Link
+
+from . import PLAIN_STATIC_STORAGES, add_database
+
+TWO_SHARDS = ['default', 'default']
+
+
+@override_settings(LINK_SHARDS=TWO_SHARDS)
+class ShardForLinkIdTests(SimpleTestCase):
+    def test_ids_map_to_their_slot(self):
+        self.assertEqual(sharding.shard_for_link_id(sharding.MAX_SHARDS * 7), 'default')
+        self.assertEqual(sharding.shard_for_link_id(sharding.MAX_SHARDS * 7 + 1), 'default')
+
+    def test_out_of_range_slot_has_no_shard(self):
+        self.assertIsNone(sharding.shard_for_link_id(5))
+        self.assertIsNone(sharding.shard_for_link_id(1000))
+        self.assertIsNone(sharding.shard_for_link_id(sharding.MAX_SHARDS * 3 + 2))
+
+    def test_group_link_ids_skips_out_of_range_ids(self):
+        self.assertEqual(sharding.group_link_ids([sharding.MAX_SHARDS, 5, 1000]), {'default': [sharding.MAX_SHARDS]})
+
+    def test_managers_return_nothing_for_out_of_range_ids(self):
+        self.assertEqual(list(Link.objects.for_id(5)), [])
+        self.assertEqual(list(Click.objects.for_link(1000)), [])
+
+
+class ShardForLinkIdUnshardedTests(SimpleTestCase):
+    def test_unsharded_ids_are_left_to_the_routers(self):
+        self.assertIsNone(sharding.shard_for_link_id(5))
+        self.assertEqual(sharding.group_link_ids([5, 1000]), {None: [5, 1000]})
+
+    def test_links_in_bulk_without_ids(self):
+        self.assertEqual(sharding.links_in_bulk([]), {})
+
+
+@override_settings(LINK_SHARDS=TWO_SHARDS, STORAGES=PLAIN_STATIC_STORAGES)
+class OutOfRangeLinkViewTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('owner', 'owner@example.com', 'pw-12345-x')
+        self.client.force_login(self.user)
+
+    def test_dashboard_views_404(self):
+        for pk in (5, 1000):
+            self.assertEqual(self.client.get(f'/dashboard/link/{pk}/').status_code, 404)
+            self.assertEqual(self.client.post(f'/dashboard/link/{pk}/edit/').status_code, 404)
+
+    def test_api_views_404(self):
+        for pk in (5, 1000):
+            self.assertEqual(self.client.get(f'/api/v1/links/{pk}').status_code, 404)
+            self.assertEqual(self.client.get(f'/api/v1/links/{pk}/clicks').status_code, 404)
+            self.assertEqual(self.client.get(f'/api/v1/clicks/export?link={pk}').status_code, 404)
+
+
+@override_settings(LINK_SHARDS=['default', 'shard_1'], DATABASE_ROUTERS=['core.routers.LinkShardRouter'])
+class CreateLinkTests(TestCase):
+    def setUp(self):
+        add_database(self, 'shard_1', Link)
+        self.addCleanup(sharding._id_blocks.clear)
+        self.slug = next(f'slug-{i}' for i in range(100) if sharding.shard_for_code(f'slug-{i}') == 'shard_1')
+
+    def test_create_places_the_link_on_its_shard(self):
+        link = Link.objects.create(custom_slug=self.slug, original_url='https://example.com/')
+        self.assertEqual(sharding.shard_for_link_id(link.pk), 'shard_1')
+        self.assertTrue(Link.objects.using('shard_1').filter(pk=link.pk).exists())
+        self.assertFalse(Link.objects.using('default').filter(pk=link.pk).exists())
+
+    def test_unplaced_bulk_writes_are_refused(self):
+        with self.assertRaises(TypeError):
+            Link.objects.get_or_create(custom_slug=self.slug, defaults={'original_url': 'https://example.com/'})
+        with self.assertRaises(TypeError):
+            Link.objects.bulk_create([Link(original_url='https://example.com/')])
+
+    def test_get_or_create_on_a_shard(self):
+        link, created = Link.objects.for_code(self.slug).get_or_create(
+            custom_slug=self.slug, defaults={'original_url': 'https://example.com/'},
+        )
+        self.assertTrue(created)
+        self.assertEqual(Link.objects.for_code(self.slug).get(custom_slug=self.slug).pk, link.pk)
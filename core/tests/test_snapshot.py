@@ -0,0 +1,74 @@
+import os
+import tempfile
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from core import snapshot
+
+LINK = (7, 'abc123', 'promo', 'https://example.com/', 1)
+FOUND = {'id': 7, 'original_url': 'https://example.com/', 'click_sample_rate': 1}
+
+
+@mock.patch('core.snapshot.is_shared', return_value=True)
+class SnapshotLookupTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'links.snapshot')
+        settings = override_settings(LINK_SNAPSHOT_PATH=self.path, LINK_SNAPSHOT_DELTA_TIMEOUT=600)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def write(self, built_at, marker=True):
+        snapshot.write_snapshot(self.path, [LINK], built_at)
+        if marker:
+            cache.set(snapshot._marker_key(built_at), True)
+
+    def test_fresh_snapshot_resolves_codes(self, is_shared):
+        self.write(int(time.time()))
+        self.assertEqual(snapshot.lookup('abc123'), FOUND)
+        self.assertEqual(snapshot.lookup('promo'), FOUND)
+        self.assertIs(snapshot.lookup('nope'), snapshot.MISS)
+
+    def test_overlay_wins_over_snapshot(self, is_shared):
+        self.write(int(time.time()))
+        cache.set(snapshot._overlay_key('abc123'), snapshot.GONE)
+        self.assertIsNone(snapshot.lookup('abc123'))
+
+    def test_snapshot_without_marker_is_ignored(self, is_shared):
+        # e.g. the cache was flushed, taking the overlay with it.
+        self.write(int(time.time()), marker=False)
+        self.assertIs(snapshot.lookup('abc123'), snapshot.MISS)
+
+    def test_snapshot_older_than_overlay_is_ignored(self, is_shared):
+        self.write(int(time.time()) - 600)
+        with mock.patch('core.snapshot._start_rebuild'):
+            self.assertIs(snapshot.lookup('abc123'), snapshot.MISS)
+
+    @override_settings(LINK_SNAPSHOT_MAX_AGE=60)
+    def test_stale_snapshot_triggers_rebuild(self, is_shared):
+        self.write(int(time.time()) - 120)
+        with mock.patch('core.snapshot._start_rebuild') as start_rebuild:
+            self.assertEqual(snapshot.lookup('abc123'), FOUND)
+        start_rebuild.assert_called_once_with(self.path)
+
+    def test_build_snapshot_publishes_marker(self, is_shared):
+        with mock.patch('core.snapshot.active_links', return_value=[LINK]):
+            self.assertEqual(snapshot.build_snapshot(), 2)
+        self.assertEqual(snapshot.lookup('promo'), FOUND)
+
+    def test_alookup(self, is_shared):
+        self.write(int(time.time()))
+        self.assertEqual(async_to_sync(snapshot.alookup)('promo'), FOUND)
+
+
+class SnapshotSharedCacheTests(SimpleTestCase):
+    @override_settings(LINK_SNAPSHOT_PATH='/nonexistent/links.snapshot')
+    def test_disabled_without_shared_cache(self):
+        self.assertFalse(snapshot.is_enabled())
+        self.assertIs(snapshot.lookup('abc123'), snapshot.MISS)
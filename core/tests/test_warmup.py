@@ -0,0 +1,38 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from core.models import Link
+from core.resolver import resolve_cache_key
+from core.warmup import warm_link_cache
+
+
+class ResolveCacheDefaultTests(TestCase):
+    def test_off_with_a_per_process_cache(self):
+        self.assertEqual(settings.LINK_RESOLVE_CACHE_TIMEOUT, 0)
+
+
+@override_settings(LINK_RESOLVE_CACHE_TIMEOUT=300)
+@mock.patch('core.warmup.is_shared', return_value=True)
+class WarmLinkCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.link = Link.objects.create(original_url='https://example.com/', click_count=5)
+
+    def test_first_worker_warms_the_shared_cache(self, is_shared):
+        report = warm_link_cache()
+        self.assertEqual(report['links'], 1)
+        self.assertEqual(cache.get(resolve_cache_key(self.link.short_code))['id'], self.link.pk)
+
+    def test_later_workers_skip_a_warm_shared_cache(self, is_shared):
+        warm_link_cache()
+        cache.delete(resolve_cache_key(self.link.short_code))
+        report = warm_link_cache()
+        self.assertEqual((report['links'], report['stopped']), (0, 'warm'))
+        self.assertIsNone(cache.get(resolve_cache_key(self.link.short_code)))
+
+    def test_force_warms_anyway(self, is_shared):
+        warm_link_cache()
+        self.assertEqual(warm_link_cache(force=True)['links'], 1)
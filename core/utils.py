@@ -10,7 +10,7 @@ RESERVED_SLUGS = {
     'bitly-alternative', 'tinyurl-alternative', 'pricing', 'help', 'docs',
     'support', 'blog', 'login', 'signup', 'logout', 'settings', 'static', 'media',
     'robots', 'favicon', 'favicon.ico', 'sitemap', 'home', 'push-analytics',
-    'api-stats', 'api-health', 'api-v1',
+    'api-stats', 'api-health', 'api-v1', 'csrf',
 }
 
 SLUG_PATTERN = re.compile(r'^[a-zA-Z0-9][a-zA-Z0-9-]*[a-zA-Z0-9]$')
@@ -1,27 +1,41 @@
 import csv
 import io
 import json
-import threading
 from datetime import timedelta
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.cache import cache
 from django.core.paginator import Paginator
 from django.db import connection
-from django.db.models import Count, F, Q
-from django.db.models.functions import TruncDate
+from django.db.models import Count, Q, Sum
 from django.http import HttpResponse, Http404, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
 from django.contrib.sites.shortcuts import get_current_site
 from django.urls import reverse
+from django.middleware.csrf import get_token
+from django.views.decorators.cache import never_cache
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST, require_GET
 
+from . import archive, geoip, purge, qr, sharding
+from .analytics import (
+    ais_duplicate_click, arecord_click, click_log_metrics, dedup_metrics, enqueue_click, is_duplicate_click,
+)
+from .conditional import dashboard_etag, revalidated
+from .db import connection_metrics
 from .forms import ShortenerForm, LinkEditForm
-from .models import Link, Click
+from .models import Link, Click, ClickRollup
+from .pagecache import cache_anonymous_page
+from .pending import add_pending_link
+from .resolver import aresolve_link, resolve_link
+from .routers import replica_reads
+from .stats import aget_site_stats, get_site_stats
 from .utils import (
-    parse_user_agent, hash_ip, get_client_ip,
+    parse_user_agent, hash_ip, get_client_ip, get_geo_from_request,
     validate_slug,
 )
 
@@ -30,6 +44,7 @@ from .utils import (
 # Homepage & Shortening
 # ---------------------
 
+@cache_anonymous_page
 def home(request):
     form = ShortenerForm()
     return render(request, 'home.html', {'form': form})
@@ -47,17 +62,13 @@ def shorten_url(request):
         if custom_slug:
             link.custom_slug = custom_slug
         link.save()
-        if not request.user.is_authenticated:
-            pending_link_ids = request.session.get('pending_link_ids', [])
-            if not isinstance(pending_link_ids, list):
-                pending_link_ids = []
-            if link.id not in pending_link_ids:
-                pending_link_ids.append(link.id)
-                request.session['pending_link_ids'] = pending_link_ids
-        return render(request, 'partials/shorten_result.html', {
+        response = render(request, 'partials/shorten_result.html', {
             'link': link,
             'is_authenticated': request.user.is_authenticated,
         })
+        if not request.user.is_authenticated:
+            add_pending_link(request, response, link.id)
+        return response
     return render(request, 'partials/shorten_result.html', {
         'form': form,
         'errors': form.errors,
@@ -76,7 +87,7 @@ def check_slug(request):
             'status': 'invalid', 'message': error,
         })
 
-    taken = Link.objects.filter(
+    taken = Link.objects.for_code(slug).filter(
         Q(short_code=slug) | Q(custom_slug=slug)
     ).exists()
 
@@ -94,75 +105,152 @@ def check_slug(request):
 # Redirect Engine
 # ---------------------
 
+def _redirect_page(link, code):
+    # Rendered without a request: the page needs no context processors, and
+    # that keeps it safe to render from the async view. It is the same for
+    # every visitor (the referrer is read in the browser), so a CDN can cache
+    # it; edits purge it by surrogate key (core.purge).
+    response = HttpResponse(render_to_string('redirect_loading.html', {
+        'redirect_url': link['original_url'],
+        'postcode': code,
+    }))
+    if settings.REDIRECT_CACHE_CONTROL:
+        response['Cache-Control'] = settings.REDIRECT_CACHE_CONTROL
+        if settings.REDIRECT_SURROGATE_CONTROL:
+            response['Surrogate-Control'] = settings.REDIRECT_SURROGATE_CONTROL
+        response['Surrogate-Key'] = purge.link_surrogate_key(link['id'])
+    return response
+
+
+@replica_reads
 def redirect_short_url(request, code):
-    try:
-        link = Link.objects.get(
-            Q(short_code=code) | Q(custom_slug=code),
-            is_active=True,
-        )
-    except Link.DoesNotExist:
+    link = resolve_link(code)
+    if link is None:
         raise Http404
+    return _redirect_page(link, code)
 
-    referrer = request.META.get('HTTP_REFERER', '')[:2048]
 
-    return render(request, 'redirect_loading.html', {
-        'redirect_url': link.original_url,
-        'referrer': referrer,
-        'postcode': code,
-    })
+@replica_reads
+async def redirect_short_url_async(request, code):
+    link = await aresolve_link(code)
+    if link is None:
+        raise Http404
+    return _redirect_page(link, code)
 
 
-@csrf_exempt
-@require_POST
-def push_analytics(request):
-    """Receive client-side analytics data and log click."""
-    try:
-        body = json.loads(request.body)
-    except (json.JSONDecodeError, ValueError):
-        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+BEACON_MAX_EVENTS = 20
+
 
-    postcode = body.get('postcode', '').strip()
-    data = body.get('data') or {}
+def _text(value, max_length):
+    # JSON nulls, numbers and objects are dropped rather than stored as 'None' etc.
+    return value[:max_length] if isinstance(value, str) else ''
 
-    if not postcode:
-        return JsonResponse({'error': 'postcode is required'}, status=400)
 
+def _parse_clicks(request):
+    """
+    Parse a push-analytics request into ``(clicks, is_beacon, error response)``.
+
+    The body is one JSON event ``{postcode, referrer, data}`` or a batch
+    ``{"events": [...]}``. Beacons (``navigator.sendBeacon``) post the batch
+    form as text/plain, which needs no CORS preflight or CSRF token.
+    ``clicks`` is a list of ``(postcode, click fields)``.
+    """
+    beacon = request.content_type == 'text/plain'
     try:
-        link = Link.objects.get(
-            Q(short_code=postcode) | Q(custom_slug=postcode),
-            is_active=True,
-        )
-    except Link.DoesNotExist:
-        return JsonResponse({'error': 'Link not found'}, status=404)
+        body = json.loads(request.body)
+    except (json.JSONDecodeError, ValueError):
+        return None, beacon, JsonResponse({'error': 'Invalid JSON'}, status=400)
+    if not isinstance(body, dict):
+        return None, beacon, JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    if 'events' in body:
+        beacon = True
+        events = body['events']
+        if not isinstance(events, list) or not 0 < len(events) <= BEACON_MAX_EVENTS:
+            return None, beacon, JsonResponse(
+                {'error': f'events must be a list of 1 to {BEACON_MAX_EVENTS} events'}, status=400,
+            )
+    else:
+        events = [body]
 
-    # Parse UA from the request itself (the browser making the call)
+    # UA, IP and geo come from the request itself (the browser making the call)
     ua_string = request.META.get('HTTP_USER_AGENT', '')[:500]
     ua_data = parse_user_agent(ua_string)
     ip = get_client_ip(request)
-    referrer = body.get('referrer', '')[:2048]
-
-    # Geo data from ipapi.co response sent by client
-    country = str(data.get('country', ''))[:100]
-    city = str(data.get('city', ''))[:100]
-
-    def log_click():
-        Click.objects.create(
-            link=link,
-            referrer=referrer,
-            user_agent=ua_string,
-            country=country,
-            city=city,
-            device_type=ua_data['device_type'],
-            browser=ua_data['browser'],
-            os=ua_data['os'],
-            ip_hash=hash_ip(ip),
-        )
-        Link.objects.filter(pk=link.pk).update(click_count=F('click_count') + 1)
+    ip_hash = hash_ip(ip)
+    # Geo from the local database or CDN headers, looked up before the IP is
+    # hashed; older clients may still send a browser lookup in ``data``.
+    geo = geoip.locate_ip(ip) or get_geo_from_request(request)
+
+    clicks = []
+    for event in events:
+        postcode = event.get('postcode') if isinstance(event, dict) else None
+        if not isinstance(postcode, str) or not postcode.strip():
+            return None, beacon, JsonResponse({'error': 'postcode is required'}, status=400)
+        data = event.get('data') or {}
+        click_geo = geo if geo['country'] or not isinstance(data, dict) else data
+        clicks.append((postcode.strip(), {
+            'referrer': _text(event.get('referrer'), 2048),
+            'user_agent': ua_string,
+            'country': _text(click_geo.get('country'), 100),
+            'city': _text(click_geo.get('city'), 100),
+            'device_type': ua_data['device_type'],
+            'browser': ua_data['browser'],
+            'os': ua_data['os'],
+            'ip_hash': ip_hash,
+        }))
+    return clicks, beacon, None
+
+
+def _push_response(beacon, status):
+    # Nobody reads a beacon's response, so it gets the smallest one possible.
+    if beacon:
+        return HttpResponse(status=204)
+    if status is None:
+        return JsonResponse({'error': 'Link not found'}, status=404)
+    return JsonResponse({'status': status})
 
-    t = threading.Thread(target=log_click, daemon=True)
-    t.start()
 
-    return JsonResponse({'status': 'ok'})
+@replica_reads
+@csrf_exempt
+@require_POST
+def push_analytics(request):
+    """Receive client-side analytics (a JSON event or a beacon batch) and log clicks."""
+    clicks, beacon, error = _parse_clicks(request)
+    if error is not None:
+        return error
+
+    status = 'ok'
+    for postcode, fields in clicks:
+        link = resolve_link(postcode)
+        if link is None:
+            status = None
+        elif is_duplicate_click(link['id'], fields):
+            status = 'duplicate'
+        else:
+            enqueue_click(link['id'], link['click_sample_rate'], **fields)
+    return _push_response(beacon, status)
+
+
+@replica_reads
+@csrf_exempt
+@require_POST
+async def push_analytics_async(request):
+    """Async push_analytics: clicks are written inline without blocking the worker."""
+    clicks, beacon, error = _parse_clicks(request)
+    if error is not None:
+        return error
+
+    status = 'ok'
+    for postcode, fields in clicks:
+        link = await aresolve_link(postcode)
+        if link is None:
+            status = None
+        elif await ais_duplicate_click(link['id'], fields):
+            status = 'duplicate'
+        else:
+            await arecord_click(link['id'], link['click_sample_rate'], **fields)
+    return _push_response(beacon, status)
 
 
 # ---------------------
@@ -170,31 +258,38 @@ def push_analytics(request):
 # ---------------------
 
 @login_required
+@revalidated(etag_func=dashboard_etag)
 def dashboard(request):
-    links = Link.objects.filter(user=request.user)
-
-    # Search
     q = request.GET.get('q', '').strip()
-    if q:
-        links = links.filter(
-            Q(original_url__icontains=q) |
-            Q(custom_slug__icontains=q) |
-            Q(title__icontains=q) |
-            Q(short_code__icontains=q)
-        )
+
+    def build(db):
+        links = Link.objects.using(db).filter(user=request.user)
+        # Search
+        if q:
+            links = links.filter(
+                Q(original_url__icontains=q) |
+                Q(custom_slug__icontains=q) |
+                Q(title__icontains=q) |
+                Q(short_code__icontains=q)
+            )
+        return links
 
     # Sort
     sort = request.GET.get('sort', '-created_at')
     valid_sorts = {'-created_at', 'created_at', '-click_count', 'click_count'}
     if sort not in valid_sorts:
         sort = '-created_at'
-    links = links.order_by(sort)
+    links = sharding.sharded_queryset(build, sort)
 
-    # Stats
-    total_links = Link.objects.filter(user=request.user).count()
-    total_clicks = Link.objects.filter(user=request.user).aggregate(
-        total=Count('clicks')
-    )['total'] or 0
+    # Stats (click_count is exact even when raw clicks are sampled or archived)
+    def shard_stats(db):
+        return Link.objects.using(db).filter(user=request.user).aggregate(
+            links=Count('id'), clicks=Sum('click_count'),
+        )
+
+    shard_totals = sharding.fan_out(shard_stats)
+    total_links = sum(totals['links'] for totals in shard_totals)
+    total_clicks = sum(totals['clicks'] or 0 for totals in shard_totals)
     avg_clicks = round(total_clicks / total_links, 1) if total_links > 0 else 0
 
     # Pagination
@@ -216,79 +311,38 @@ def dashboard(request):
 # Link Analytics
 # ---------------------
 
+@replica_reads
 @login_required
 def link_analytics(request, pk):
-    link = get_object_or_404(Link, pk=pk, user=request.user)
+    link = get_object_or_404(Link.objects.for_id(pk), pk=pk, user=request.user)
 
     days = int(request.GET.get('days', 30))
     if days not in (7, 30, 90, 365):
         days = 30
 
     since = timezone.now() - timedelta(days=days)
-    clicks = Click.objects.filter(link=link, clicked_at__gte=since)
+    clicks = Click.objects.for_link(link).filter(clicked_at__gte=since)
+    # Days past the click retention window only survive as daily rollups.
+    rollups = ClickRollup.objects.for_link(link).filter(day__gte=timezone.localdate(since))
+    archived = rollups.exists()
 
     # Clicks over time
-    clicks_by_date = list(
-        clicks.annotate(date=TruncDate('clicked_at'))
-        .values('date')
-        .annotate(count=Count('id'))
-        .order_by('date')
-    )
+    clicks_by_date = archive.daily_counts(clicks, rollups)
 
     # Chart data
-    chart_labels = [entry['date'].strftime('%Y-%m-%d') for entry in clicks_by_date]
-    chart_data = [entry['count'] for entry in clicks_by_date]
-
-    # Top countries
-    top_countries = list(
-        clicks.exclude(country='')
-        .values('country')
-        .annotate(count=Count('id'))
-        .order_by('-count')[:10]
-    )
+    chart_labels = [date.strftime('%Y-%m-%d') for date in clicks_by_date]
+    chart_data = list(clicks_by_date.values())
 
-    # Top cities
-    top_cities = list(
-        clicks.exclude(city='')
-        .values('city')
-        .annotate(count=Count('id'))
-        .order_by('-count')[:10]
-    )
+    # Top countries, cities, devices, browsers, OSes and referrers
+    top_countries = archive.breakdown(clicks, rollups, 'country', 10, archived)
+    top_cities = archive.breakdown(clicks, rollups, 'city', 10, archived)
+    device_breakdown = archive.breakdown(clicks, rollups, 'device_type', None, archived)
+    browser_breakdown = archive.breakdown(clicks, rollups, 'browser', 10, archived)
+    os_breakdown = archive.breakdown(clicks, rollups, 'os', 10, archived)
+    top_referrers = archive.breakdown(clicks, rollups, 'referrer', 10, archived)
 
-    # Device breakdown
-    device_breakdown = list(
-        clicks.exclude(device_type='')
-        .values('device_type')
-        .annotate(count=Count('id'))
-        .order_by('-count')
-    )
-
-    # Browser breakdown
-    browser_breakdown = list(
-        clicks.exclude(browser='')
-        .values('browser')
-        .annotate(count=Count('id'))
-        .order_by('-count')[:10]
-    )
-
-    # OS breakdown
-    os_breakdown = list(
-        clicks.exclude(os='')
-        .values('os')
-        .annotate(count=Count('id'))
-        .order_by('-count')[:10]
-    )
-
-    # Top referrers
-    top_referrers = list(
-        clicks.exclude(referrer='')
-        .values('referrer')
-        .annotate(count=Count('id'))
-        .order_by('-count')[:10]
-    )
-
-    # Unique visitors
-    unique_visitors = clicks.values('ip_hash').distinct().count()
+    # Totals and unique visitors
+    total_clicks, unique_visitors = archive.totals(clicks, rollups)
 
     edit_form = LinkEditForm(initial={
         'original_url': link.original_url,
@@ -297,7 +351,7 @@ def link_analytics(request, pk):
 
     return render(request, 'dashboard/link_detail.html', {
         'link': link,
-        'total_clicks': clicks.count(),
+        'total_clicks': total_clicks,
         'unique_visitors': unique_visitors,
         'days': days,
         'chart_labels': json.dumps(chart_labels),
@@ -319,7 +373,7 @@ def link_analytics(request, pk):
 @login_required
 @require_POST
 def edit_link(request, pk):
-    link = get_object_or_404(Link, pk=pk, user=request.user)
+    link = get_object_or_404(Link.objects.for_id(pk), pk=pk, user=request.user)
     form = LinkEditForm(request.POST)
     if form.is_valid():
         link.original_url = form.cleaned_data['original_url']
@@ -331,7 +385,7 @@ def edit_link(request, pk):
 @login_required
 @require_POST
 def delete_link(request, pk):
-    link = get_object_or_404(Link, pk=pk, user=request.user)
+    link = get_object_or_404(Link.objects.for_id(pk), pk=pk, user=request.user)
     link.is_active = False
     link.save()
     return redirect('dashboard')
@@ -341,62 +395,36 @@ def delete_link(request, pk):
 # QR Code Generator
 # ---------------------
 
+@cache_anonymous_page
 def qr_generator(request):
     return render(request, 'qr/generator.html')
 
 
 def generate_qr(request):
-    import qrcode
-    from qrcode.image.svg import SvgPathImage
-
     url = request.GET.get('url', '')
     if not url:
         return HttpResponse('URL is required', status=400)
 
-    fg = request.GET.get('fg', '#000000')
-    bg = request.GET.get('bg', '#FFFFFF')
-    fmt = request.GET.get('format', 'png')
-
-    def normalize_hex_color(value: str, fallback: str) -> str:
-        color = (value or '').strip().lower()
-        if not color:
-            return fallback
-        if color.startswith('#'):
-            color = color[1:]
-        if len(color) == 3:
-            if all(c in '0123456789abcdef' for c in color):
-                color = ''.join(ch + ch for ch in color)
-            else:
-                return fallback
-        elif len(color) != 6:
-            return fallback
-        elif not all(c in '0123456789abcdef' for c in color):
-            return fallback
-        return f'#{color}'
-
-    fg = normalize_hex_color(fg, '#000000')
-    bg = normalize_hex_color(bg, '#FFFFFF')
-
-    if fmt == 'svg':
-        qr = qrcode.QRCode(box_size=10, border=4)
-        qr.add_data(url)
-        qr.make(fit=True)
-        img = qr.make_image(image_factory=SvgPathImage)
-        response = HttpResponse(content_type='image/svg+xml')
-        response['Content-Disposition'] = 'attachment; filename="qr-code.svg"'
-        img.save(response)
-        return response
+    fmt = 'svg' if request.GET.get('format', 'png') == 'svg' else 'png'
+    fg = qr.normalize_hex_color(request.GET.get('fg', qr.DEFAULT_FG), qr.DEFAULT_FG)
+    bg = qr.normalize_hex_color(request.GET.get('bg', qr.DEFAULT_BG), qr.DEFAULT_BG)
+    box_size = qr.normalize_box_size(request.GET.get('box_size', qr.DEFAULT_BOX_SIZE))
+
+    # The key is a hash of every render input, so it is a strong validator that
+    # can be checked before touching the cache or the renderer.
+    etag = f'"{qr.qr_cache_key(url, fg, bg, fmt, box_size)}"'
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponse(status=304)
     else:
-        qr = qrcode.QRCode(box_size=10, border=4)
-        qr.add_data(url)
-        qr.make(fit=True)
-        img = qr.make_image(fill_color=fg, back_color=bg)
-        response = HttpResponse(content_type='image/png')
-        response['Content-Disposition'] = 'attachment; filename="qr-code.png"'
-        img.save(response)
-        return response
+        _, content = qr.get_qr(url, fg, bg, fmt, box_size)
+        response = HttpResponse(content, content_type=qr.QR_CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = f'attachment; filename="qr-code.{fmt}"'
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=qr.QR_CACHE_TIMEOUT, immutable=True)
+    return response
 
 
+@cache_anonymous_page
 def robots_txt(request):
     site = getattr(request, 'site', None) or get_current_site(request)
     sitemap_url = f"https://{site.domain.rstrip('/')}{reverse('sitemap')}"
@@ -423,26 +451,32 @@ def robots_txt(request):
 # SEO & Marketing Pages
 # ---------------------
 
+@cache_anonymous_page
 def bitly_alternative(request):
     return render(request, 'pages/bitly_alternative.html')
 
 
+@cache_anonymous_page
 def promise_page(request):
     return render(request, 'pages/promise.html')
 
 
+@cache_anonymous_page
 def about_page(request):
     return render(request, 'pages/about.html')
 
 
+@cache_anonymous_page
 def privacy_page(request):
     return render(request, 'pages/privacy.html')
 
 
+@cache_anonymous_page
 def terms_page(request):
     return render(request, 'pages/terms.html')
 
 
+@cache_anonymous_page
 def contact_page(request):
     return render(request, 'pages/contact.html')
 
@@ -476,7 +510,7 @@ def migrate_page(request):
                     )
                     if slug:
                         valid, err = validate_slug(slug)
-                        if valid and not Link.objects.filter(
+                        if valid and not Link.objects.for_code(slug).filter(
                             Q(short_code=slug) | Q(custom_slug=slug)
                         ).exists():
                             link.custom_slug = slug
@@ -498,22 +532,28 @@ def migrate_page(request):
 # Utility Endpoints
 # ---------------------
 
+def _public_stats_response(stats):
+    return JsonResponse({
+        'totalLinks': stats.get('total_links', 0),
+        'linksToday': stats.get('links_today', 0),
+    })
+
+
+@replica_reads
 def public_stats(request):
-    stats = cache.get('site_stats')
-    if stats is None:
-        from django.utils import timezone
-        today = timezone.now().date()
-        stats = {
-            'totalLinks': Link.objects.count(),
-            'linksToday': Link.objects.filter(created_at__date=today).count(),
-        }
-        cache.set('site_stats', stats, 300)
-    else:
-        stats = {
-            'totalLinks': stats.get('total_links', 0),
-            'linksToday': stats.get('links_today', 0),
-        }
-    return JsonResponse(stats)
+    return _public_stats_response(get_site_stats())
+
+
+@replica_reads
+async def public_stats_async(request):
+    return _public_stats_response(await aget_site_stats())
+
+
+@require_GET
+@never_cache
+def csrf_token(request):
+    """CSRF token for pages served from the page cache, which don't embed one."""
+    return JsonResponse({'token': get_token(request)})
 
 
 def health_check(request):
@@ -523,11 +563,19 @@ def health_check(request):
     except Exception:
         db_status = 'error'
 
-    return JsonResponse({
+    data = {
         'status': 'ok' if db_status == 'ok' else 'error',
         'db': db_status,
         'version': '1.0.0',
-    })
+    }
+    # Process internals are for staff only.
+    if request.user.is_staff:
+        data.update(
+            db_connections=connection_metrics(),
+            click_dedup=dedup_metrics(),
+            click_log=click_log_metrics(),
+        )
+    return JsonResponse(data)
 
 
 # ---------------------
@@ -544,7 +592,7 @@ def custom_404(request, exception):
 
 @login_required
 def export_links_csv(request):
-    links = Link.objects.filter(user=request.user)
+    links = sharding.sharded_queryset(lambda db: Link.objects.using(db).filter(user=request.user), '-created_at')
     response = HttpResponse(content_type='text/csv')
     response['Content-Disposition'] = 'attachment; filename="fattyurl-links.csv"'
 
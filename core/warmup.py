@@ -0,0 +1,115 @@
+"""
+Preload the resolve cache with the links most likely to be clicked.
+
+Run in each worker before it takes traffic (gunicorn ``post_worker_init``)
+or by hand with ``manage.py warm_link_cache``. Links are ranked by weighted
+clicks in the last LINK_WARMUP_WINDOW seconds, then by ``click_count``.
+The work stops at LINK_WARMUP_COUNT links, LINK_WARMUP_MAX_BYTES of codes
+and URLs, or LINK_WARMUP_SECONDS, whichever comes first. With a shared
+cache only the first worker to boot in half a resolve-cache lifetime
+loads the links; the others find them already there.
+"""
+import heapq
+import time
+from datetime import timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+
+from . import sharding, snapshot
+from .cache import get_or_compute, is_shared
+from .models import Click, Link
+from .resolver import link_entry, resolve_cache_key
+
+HOT_LINKS_KEY = 'warmup:hot-links'
+WARMED_KEY = 'warmup:warmed'
+BATCH_SIZE = 200
+
+
+def _top(rows, limit):
+    return heapq.nlargest(limit, chain.from_iterable(rows), key=lambda row: row[1])
+
+
+def hot_link_ids(limit, window):
+    """Up to ``limit`` link ids, hottest first, merged across shards."""
+    since = timezone.now() - timedelta(seconds=window)
+
+    def recent(db):
+        return list(
+            Click.objects.using(db).filter(clicked_at__gte=since)
+            .values('link_id').annotate(clicks=Sum('weight')).order_by('-clicks')
+            .values_list('link_id', 'clicks')[:limit]
+        )
+
+    def popular(db):
+        return list(
+            Link.objects.using(db).filter(is_active=True)
+            .order_by('-click_count').values_list('id', 'click_count')[:limit]
+        )
+
+    ids = [link_id for link_id, _ in _top(sharding.fan_out(recent), limit)]
+    if len(ids) < limit:
+        seen = set(ids)
+        ids += [link_id for link_id, _ in _top(sharding.fan_out(popular), limit) if link_id not in seen]
+    return ids[:limit]
+
+
+def _already_warm():
+    """Whether another worker warmed the shared cache recently (and claim it otherwise)."""
+    if not is_shared():
+        return False
+    return not cache.add(WARMED_KEY, True, max(1, settings.LINK_RESOLVE_CACHE_TIMEOUT // 2))
+
+
+def warm_link_cache(limit=None, seconds=None, max_bytes=None, force=False):
+    """
+    Load hot links into the resolve cache and return a report of what was
+    loaded. Unless ``force``, skips a shared cache another worker warmed.
+    """
+    limit = settings.LINK_WARMUP_COUNT if limit is None else limit
+    seconds = settings.LINK_WARMUP_SECONDS if seconds is None else seconds
+    max_bytes = settings.LINK_WARMUP_MAX_BYTES if max_bytes is None else max_bytes
+    started = time.monotonic()
+    deadline = started + seconds
+    report = {'links': 0, 'codes': 0, 'bytes': 0, 'stopped': None, 'snapshot_codes': None}
+
+    if snapshot.is_enabled():
+        # Map the shared snapshot now rather than on the first redirect.
+        mapped = snapshot.get_snapshot()
+        report['snapshot_codes'] = mapped.count if mapped is not None else 0
+
+    if limit and settings.LINK_RESOLVE_CACHE_TIMEOUT and not force and _already_warm():
+        report['stopped'] = 'warm'
+    elif limit and settings.LINK_RESOLVE_CACHE_TIMEOUT:
+        # Workers booting together share one ranking query.
+        ids = get_or_compute(
+            f'{HOT_LINKS_KEY}:{limit}', lambda: hot_link_ids(limit, settings.LINK_WARMUP_WINDOW),
+            timeout=60, lock_timeout=seconds,
+        )
+        for start in range(0, len(ids), BATCH_SIZE):
+            if time.monotonic() >= deadline:
+                report['stopped'] = 'time'
+                break
+            batch = ids[start:start + BATCH_SIZE]
+            found = sharding.links_in_bulk(batch, is_active=True)
+            entries = {}
+            for link in (found[link_id] for link_id in batch if link_id in found):
+                codes = {link.short_code, link.custom_slug} - {None, ''}
+                size = sum(len(code) + len(link.original_url) for code in codes)
+                if report['bytes'] + size > max_bytes:
+                    report['stopped'] = 'memory'
+                    break
+                entry = link_entry(link)
+                entries.update((resolve_cache_key(code), entry) for code in codes)
+                report['links'] += 1
+                report['codes'] += len(codes)
+                report['bytes'] += size
+            cache.set_many(entries, settings.LINK_RESOLVE_CACHE_TIMEOUT)
+            if report['stopped']:
+                break
+
+    report['seconds'] = round(time.monotonic() - started, 3)
+    return report
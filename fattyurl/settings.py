@@ -68,6 +68,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.contrib.sites.middleware.CurrentSiteMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,12 +77,17 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
+    'core.middleware.PendingLinksMiddleware',
     'core.middleware.RateLimitMiddleware',
 ]
 
 if DEBUG:
     INSTALLED_APPS = INSTALLED_APPS + ['debug_toolbar']
-    MIDDLEWARE = ['debug_toolbar.middleware.DebugToolbarMiddleware'] + MIDDLEWARE
+    # Inside CompressionMiddleware, which would hide the page from the toolbar.
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('core.middleware.CompressionMiddleware') + 1,
+        'debug_toolbar.middleware.DebugToolbarMiddleware',
+    )
     INTERNAL_IPS = ['127.0.0.1', 'localhost']
 
 ROOT_URLCONF = 'fattyurl.urls'
@@ -104,10 +110,138 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'fattyurl.wsgi.application'
+ASGI_APPLICATION = 'fattyurl.asgi.application'
+
+# SERVER_PROFILE=asgi runs fattyurl.asgi under uvicorn workers (see
+# gunicorn.conf.py) and routes redirects, analytics and public stats to
+# their async views. ASYNC_VIEWS can override the view choice on its own.
+SERVER_PROFILE = env('SERVER_PROFILE', default='wsgi')
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', default=SERVER_PROFILE == 'asgi')
 
 DATABASES = {
     'default': env.db(default='sqlite:///db.sqlite3')
 }
+DATABASE_ROUTERS = []
+
+# Optional sharding of links and clicks across LINK_SHARD_URLS (one database
+# URL per shard, e.g. sqlite:///shard0.sqlite3,sqlite:///shard1.sqlite3).
+# Each shard needs `manage.py migrate --database=shard_N`. Placement hashes
+# over the shard count, so set this up before any links exist and do not
+# change it afterwards (core.sharding).
+LINK_SHARDS = []
+for _i, _url in enumerate(env.list('LINK_SHARD_URLS', default=[])):
+    LINK_SHARDS.append(f'shard_{_i}')
+    DATABASES[f'shard_{_i}'] = env.db_url_config(_url)
+if LINK_SHARDS:
+    DATABASE_ROUTERS.append('core.routers.LinkShardRouter')
+
+# Optional read replica. Redirect and analytics reads go to it, everything
+# else to the primary, and a client keeps reading from the primary for
+# REPLICA_PIN_SECONDS after it writes (core.routers / core.middleware.ReplicaPinMiddleware). Locally,
+# point it at a second SQLite file and run `manage.py refresh_replica`.
+REPLICA_DATABASE_URL = env('REPLICA_DATABASE_URL', default='')
+REPLICA_PIN_SECONDS = env.int('REPLICA_PIN_SECONDS', default=10)
+if REPLICA_DATABASE_URL:
+    DATABASES['replica'] = env.db_url_config(REPLICA_DATABASE_URL)
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+    DATABASE_ROUTERS.append('core.routers.PrimaryReplicaRouter')
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('django.contrib.sessions.middleware.SessionMiddleware'),
+        'core.middleware.ReplicaPinMiddleware',
+    )
+
+# Connection reuse. On PostgreSQL, DATABASE_POOL=True uses psycopg's
+# connection pool (needs the "pool" extra); otherwise connections persist
+# for CONN_MAX_AGE seconds. Both verify connections before reuse. Under
+# SERVER_PROFILE=asgi every sync_to_async thread would keep its own
+# persistent connection, so CONN_MAX_AGE defaults to 0 there; use the pool.
+DATABASE_POOL = env.bool('DATABASE_POOL', default=False)
+for _db in DATABASES.values():
+    _db['CONN_HEALTH_CHECKS'] = True
+    if DATABASE_POOL and _db['ENGINE'] == 'django.db.backends.postgresql':
+        _db['CONN_MAX_AGE'] = 0
+        _db.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': env.int('DATABASE_POOL_MIN_SIZE', default=2),
+            'max_size': env.int('DATABASE_POOL_MAX_SIZE', default=10),
+            'timeout': env.float('DATABASE_POOL_TIMEOUT', default=10.0),
+        }
+    else:
+        _db['CONN_MAX_AGE'] = env.int('CONN_MAX_AGE', default=0 if DEBUG or SERVER_PROFILE == 'asgi' else 60)
+
+# Background threads that write click analytics. Each holds at most one
+# database connection, so this bounds connections opened outside requests.
+# Once CLICK_LOG_QUEUE_SIZE clicks are waiting, redirects write inline.
+CLICK_LOG_WORKERS = env.int('CLICK_LOG_WORKERS', default=2)
+CLICK_LOG_QUEUE_SIZE = env.int('CLICK_LOG_QUEUE_SIZE', default=1000)
+
+# Cache headers on redirect pages. The page is identical for every visitor,
+# so a CDN can serve it (for REDIRECT_SURROGATE_CONTROL); Surrogate-Key:
+# link-<id> lets core.purge evict it when the link is edited, deactivated or
+# deleted. Browsers cannot be purged, so Cache-Control keeps them at
+# max-age=0. Empty = not cacheable.
+REDIRECT_CACHE_CONTROL = env('REDIRECT_CACHE_CONTROL', default='public, max-age=0')
+REDIRECT_SURROGATE_CONTROL = env('REDIRECT_SURROGATE_CONTROL', default='max-age=86400')
+CDN_PURGE_BACKEND = env('CDN_PURGE_BACKEND', default='core.purge.NullPurgeBackend')
+# For core.purge.HTTPPurgeBackend (`manage.py purge_server` is a local stand-in)
+CDN_PURGE_URL = env('CDN_PURGE_URL', default='')
+CDN_PURGE_TOKEN = env('CDN_PURGE_TOKEN', default='')
+CDN_PURGE_TIMEOUT = env.float('CDN_PURGE_TIMEOUT', default=2.0)
+
+# Snapshot of active links mmapped by every worker (core.snapshot). Needs a
+# shared cache that does not evict the linksnap* keys. Workers rebuild it in
+# the background once it is LINK_SNAPSHOT_MAX_AGE seconds old (or run
+# `manage.py build_link_snapshot`); links changed since the last build are
+# kept in the cache for LINK_SNAPSHOT_DELTA_TIMEOUT seconds, and an older
+# snapshot is ignored. Empty = always resolve from the database.
+LINK_SNAPSHOT_PATH = env('LINK_SNAPSHOT_PATH', default='')
+LINK_SNAPSHOT_CHECK_INTERVAL = env.int('LINK_SNAPSHOT_CHECK_INTERVAL', default=5)
+LINK_SNAPSHOT_MAX_AGE = env.int('LINK_SNAPSHOT_MAX_AGE', default=60 * 60)
+LINK_SNAPSHOT_DELTA_TIMEOUT = env.int('LINK_SNAPSHOT_DELTA_TIMEOUT', default=60 * 60 * 24)
+
+# Resolved codes (and unknown ones) are cached for this many seconds;
+# link edits invalidate them. 0 = query the database on every resolve.
+# Defaults to 300 with a shared cache and 0 without (see CACHES below):
+# edits only invalidate the worker that made them in a per-process cache.
+LINK_RESOLVE_CACHE_TIMEOUT = env.int('LINK_RESOLVE_CACHE_TIMEOUT', default=None)
+
+# Each gunicorn worker preloads the resolve cache with the hottest links
+# before taking traffic (core.warmup), within these bounds.
+LINK_WARMUP_COUNT = env.int('LINK_WARMUP_COUNT', default=1000)
+LINK_WARMUP_WINDOW = env.int('LINK_WARMUP_WINDOW', default=3600)
+LINK_WARMUP_SECONDS = env.float('LINK_WARMUP_SECONDS', default=5.0)
+LINK_WARMUP_MAX_BYTES = env.int('LINK_WARMUP_MAX_BYTES', default=8 * 1024 * 1024)
+
+# Responses of at least this many bytes are compressed (Brotli for JSON with the
+# "brotli" extra, else gzip) when the client accepts it.
+COMPRESS_MIN_SIZE = env.int('COMPRESS_MIN_SIZE', default=1024)
+
+# Anonymous visitors get the marketing pages, robots.txt and the sitemap
+# from the cache (core.pagecache) for this many seconds; run
+# `manage.py clear_page_cache` after a deploy. 0 = render every request.
+PAGE_CACHE_TIMEOUT = env.int('PAGE_CACHE_TIMEOUT', default=300)
+
+# Local IP-range CSV used to geolocate clicks on the server (core.geoip);
+# empty = geo only from CDN headers (see core.utils.get_geo_from_request).
+# core/data/geoip-sample.csv is a tiny sample for development.
+GEOIP_DATABASE = env('GEOIP_DATABASE', default='')
+GEOIP_RELOAD_INTERVAL = env.int('GEOIP_RELOAD_INTERVAL', default=60)
+
+# Repeat clicks on a link from the same ip_hash and user agent within this
+# many seconds (refreshes, prefetchers, double-fired beacons) are dropped.
+CLICK_DEDUP_WINDOW = env.int('CLICK_DEDUP_WINDOW', default=30)
+
+# Links with click_sample_rate=0 that get more than CLICK_SAMPLING_THRESHOLD
+# clicks in a second (0 = never) store a random one raw click in
+# CLICK_SAMPLE_RATE (>= 1) for the rest of that second, weighted to keep
+# analytics totals.
+CLICK_SAMPLING_THRESHOLD = env.int('CLICK_SAMPLING_THRESHOLD', default=0)
+CLICK_SAMPLE_RATE = env.int('CLICK_SAMPLE_RATE', default=10)
+
+# Raw clicks older than CLICK_RETENTION_DAYS (0 = keep forever) are moved by
+# `manage.py archive_clicks` into monthly gzip files under CLICK_ARCHIVE_DIR,
+# leaving daily rollups for analytics (core.archive).
+CLICK_RETENTION_DAYS = env.int('CLICK_RETENTION_DAYS', default=0)
+CLICK_ARCHIVE_DIR = env('CLICK_ARCHIVE_DIR', default=str(BASE_DIR / 'archive'))
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -182,13 +316,48 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20,
 }
 
-# Cache (in-memory for dev, switch to Redis in production)
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Cache. CACHE_URL selects the backend shared by all workers, e.g.
+# redis://host:6379/0 (needs the "redis" extra) or, on a single host,
+# dbcache://fattyurl_cache after `manage.py createcachetable` (its incr is
+# not atomic, so rate limits there are approximate under bursts). The default
+# locmemcache:// is per process and only suitable for development.
+# A shared backend gets a small per-process L1 in front of it (core.cache)
+# unless CACHE_L1_TIMEOUT is 0.
+_shared_cache = env.cache('CACHE_URL', default='locmemcache://')
+CACHE_L1_TIMEOUT = env.int('CACHE_L1_TIMEOUT', default=5)
+if CACHE_L1_TIMEOUT and not _shared_cache['BACKEND'].endswith('.LocMemCache'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.TieredCache',
+            'OPTIONS': {
+                'L2': 'shared',
+                'L1_TIMEOUT': CACHE_L1_TIMEOUT,
+                'L1_MAX_ENTRIES': env.int('CACHE_L1_MAX_ENTRIES', default=1000),
+            },
+        },
+        'shared': _shared_cache,
     }
+else:
+    CACHES = {'default': _shared_cache}
+if LINK_RESOLVE_CACHE_TIMEOUT is None:
+    _per_process = _shared_cache['BACKEND'].endswith(('.LocMemCache', '.DummyCache'))
+    LINK_RESOLVE_CACHE_TIMEOUT = 0 if _per_process else 300
+
+# Rendered QR codes, keyed by a hash of their inputs (see core.qr). Kept per
+# process: entries are immutable and cheap to re-render on another worker.
+CACHES['qr'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'qr',
+    'OPTIONS': {'MAX_ENTRIES': env.int('QR_CACHE_MAX_ENTRIES', default=1000)},
 }
 
+# Processes `manage.py generate_qr_batch` renders QR codes on, at most one
+# per CPU (0 or 1 = in-process).
+QR_RENDER_WORKERS = env.int('QR_RENDER_WORKERS', default=4)
+# Processes each web worker keeps for the batch QR API, at most one per CPU
+# (0 = render in the request). Single QR codes always render in-process.
+QR_WEB_RENDER_WORKERS = env.int('QR_WEB_RENDER_WORKERS', default=1)
+
 # Email (console for dev)
 if DEBUG:
     EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
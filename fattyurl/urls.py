@@ -5,6 +5,7 @@ from django.conf import settings
 from django.http import Http404, HttpResponse
 from django.contrib.staticfiles.storage import staticfiles_storage
 from core import views
+from core.pagecache import cache_anonymous_page
 from core.sitemaps import StaticViewSitemap
 
 handler404 = 'core.views.custom_404'
@@ -23,7 +24,7 @@ urlpatterns = [
     path('robots.txt', views.robots_txt, name='robots_txt'),
     path(
         'sitemap.xml',
-        sitemap,
+        cache_anonymous_page(sitemap),
         {'sitemaps': {'static': StaticViewSitemap}},
         name='sitemap',
     ),
@@ -63,15 +64,28 @@ urlpatterns = [
     path('migrate/', views.migrate_page, name='migrate_page'),
 
     # API
-    path('api/stats', views.public_stats, name='public_stats'),
+    path(
+        'api/stats',
+        views.public_stats_async if settings.ASYNC_VIEWS else views.public_stats,
+        name='public_stats',
+    ),
     path('api/health', views.health_check, name='health_check'),
+    path('csrf/', views.csrf_token, name='csrf_token'),
     path('api/v1/', include('api.urls')),
 
     # Client-side analytics push
-    path('push-analytics/', views.push_analytics, name='push_analytics'),
+    path(
+        'push-analytics/',
+        views.push_analytics_async if settings.ASYNC_VIEWS else views.push_analytics,
+        name='push_analytics',
+    ),
 
     # MUST BE LAST — catch-all redirect
-    path('<str:code>/', views.redirect_short_url, name='redirect_short_url'),
+    path(
+        '<str:code>/',
+        views.redirect_short_url_async if settings.ASYNC_VIEWS else views.redirect_short_url,
+        name='redirect_short_url',
+    ),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,37 @@
+"""
+Gunicorn settings.
+
+SERVER_PROFILE=asgi serves fattyurl.asgi with uvicorn workers (needs the
+"asgi" extra); anything else serves fattyurl.wsgi with sync workers. Like
+fattyurl.settings, the environment is read from .env first, so both agree
+on the profile.
+"""
+from pathlib import Path
+
+import environ
+
+env = environ.Env()
+environ.Env.read_env(Path(__file__).resolve().parent / '.env')
+
+if env('SERVER_PROFILE', default='wsgi') == 'asgi':
+    wsgi_app = 'fattyurl.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'fattyurl.wsgi:application'
+
+
+def post_worker_init(worker):
+    # Runs in each worker once the app (and Django) is loaded, before it
+    # accepts connections, so a fresh worker starts with hot links cached
+    # and its batch QR render processes running.
+    from core import qr
+    from core.warmup import warm_link_cache
+
+    qr.web_render_pool()
+
+    try:
+        report = warm_link_cache()
+    except Exception:
+        worker.log.exception("Link cache warm-up failed")
+    else:
+        worker.log.info("Link cache warm-up: %s", report)
@@ -30,3 +30,42 @@ function copyToClipboard(text, button) {
         }, 2000);
     });
 }
+
+// Pages served from the page cache (core.pagecache) don't embed a CSRF
+// token; fetch one and hold back htmx POSTs until it has arrived.
+(function() {
+    var csrfUrl = document.body.dataset.csrfUrl;
+    if (!csrfUrl) {
+        return;
+    }
+    var csrfToken = null;
+    var csrfReady = null;
+
+    function loadToken() {
+        if (!csrfReady) {
+            csrfReady = fetch(csrfUrl, { credentials: 'same-origin' })
+                .then(function(response) { return response.json(); })
+                .then(function(data) { csrfToken = data.token; })
+                .catch(function() { csrfReady = null; });
+        }
+        return csrfReady;
+    }
+
+    if (document.querySelector('[hx-post], [hx-put], [hx-patch], [hx-delete]')) {
+        loadToken();
+    }
+
+    document.body.addEventListener('htmx:confirm', function(event) {
+        if (csrfToken || event.detail.verb === 'get') {
+            return;
+        }
+        event.preventDefault();
+        loadToken().then(function() { event.detail.issueRequest(true); });
+    });
+
+    document.body.addEventListener('htmx:configRequest', function(event) {
+        if (csrfToken && event.detail.verb !== 'get') {
+            event.detail.headers['X-CSRFToken'] = csrfToken;
+        }
+    });
+})();